@@ -0,0 +1,163 @@
+"""Streaming export of a tenant's users for operators.
+
+``GET /admin/users/export`` writes the users of the caller's tenant as
+NDJSON or CSV.  The caller must be an admin of that tenant, and the
+tenant comes from the token; an ``x-api-key`` for another tenant is
+refused.  Items are read one page at a time with a
+``ProjectionExpression`` limited to ``user_store.PUBLIC_ATTRIBUTES``, so
+password hashes are never loaded, and each page is written out before
+the next is read, so memory stays constant however many users the tenant
+has.
+
+Every export is a ``Query``.  With ``email`` it reads the
+``email-index`` GSI, filtered on the tenant's ``user_id`` prefix.
+Otherwise it reads the ``client-index`` GSI (``client_id``, ``user_id``)
+with ``begins_with`` on the prefix, so only the tenant's users are read
+and they come back in ``user_id`` order.
+
+An export stops after ``limit`` users.  Pass the ``user_id`` of the last
+user received as ``after`` to continue; NDJSON exports that stop early
+end with a ``{"next": "<user_id>"}`` line carrying that value.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from ..aiodb import users_table
+from ..auth.dependencies import get_tenant, get_tenant_admin
+from ..auth.user_store import PUBLIC_ATTRIBUTES, public_projection
+from ..encoding import dumps
+
+router = APIRouter()
+
+_PAGE_SIZE = 500
+_MAX_LIMIT = 50000
+
+
+async def _pages(
+    tenant: dict, email: Optional[str], after: Optional[str]
+) -> AsyncIterator[list]:
+    """Yield pages of the tenant's users, projected to public attributes."""
+    prefix = f"{tenant['client_id']}#{tenant['site_id']}#"
+    projection, names = public_projection()
+    names["#uid"] = "user_id"
+    params: Dict = {
+        "ProjectionExpression": projection,
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": {":prefix": prefix},
+        "Limit": _PAGE_SIZE,
+    }
+    if email:
+        names["#email"] = "email"
+        params["IndexName"] = "email-index"
+        params["KeyConditionExpression"] = "#email = :email"
+        params["FilterExpression"] = "begins_with(#uid, :prefix)"
+        params["ExpressionAttributeValues"][":email"] = email.lower()
+    else:
+        names["#client"] = "client_id"
+        params["IndexName"] = "client-index"
+        params["KeyConditionExpression"] = "#client = :client AND begins_with(#uid, :prefix)"
+        params["ExpressionAttributeValues"][":client"] = tenant["client_id"]
+    if after:
+        # A Query resumes from the position of any key in its index.
+        params["ExclusiveStartKey"] = {"user_id": after}
+        if email:
+            params["ExclusiveStartKey"]["email"] = email.lower()
+        else:
+            params["ExclusiveStartKey"]["client_id"] = tenant["client_id"]
+
+    while True:
+        response = await users_table().query(**params)
+        yield response.get("Items", [])
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        params["ExclusiveStartKey"] = last_key
+
+
+async def _users(
+    tenant: dict, email: Optional[str], after: Optional[str], limit: int
+) -> AsyncIterator[Optional[dict]]:
+    """Yield up to ``limit`` users, then ``None`` if more remain."""
+    sent = 0
+    async for page in _pages(tenant, email, after):
+        for item in page:
+            if sent == limit:
+                yield None
+                return
+            sent += 1
+            yield item
+
+
+async def _ndjson(users: AsyncIterator[Optional[dict]]) -> AsyncIterator[bytes]:
+    last = None
+    async for item in users:
+        if item is None:
+            yield dumps({"next": last}) + b"\n"
+            return
+        last = item["user_id"]
+        yield dumps(item) + b"\n"
+
+
+async def _csv(users: AsyncIterator[Optional[dict]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=PUBLIC_ATTRIBUTES, extrasaction="ignore")
+    writer.writeheader()
+    async for item in users:
+        if item is None:
+            break
+        writer.writerow(item)
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+@router.get("/users/export")
+async def export_users(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    email: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(10000, ge=1, le=_MAX_LIMIT),
+    tenant: dict = Depends(get_tenant),
+    user: dict = Depends(get_tenant_admin),
+) -> StreamingResponse:
+    """Stream the caller's tenant's users as NDJSON or CSV.
+
+    Args:
+        fmt: ``format`` query parameter, ``ndjson`` (default) or ``csv``.
+        email: Export only this email, via the ``email-index`` GSI.
+        after: ``user_id`` of the last user already received.
+        limit: Maximum users in this response.
+        tenant: Tenant context resolved from the ``x-api-key`` header.
+        user: Decoded JWT payload of a tenant admin; names the tenant.
+
+    Returns:
+        A streaming response of public user attributes.
+
+    Raises:
+        HTTPException: 403 if the caller is not a tenant admin or the API
+            key belongs to another tenant.  400 if ``after`` belongs to
+            another tenant.
+    """
+    own = {"client_id": user.get("client_id"), "site_id": user.get("site_id")}
+    if own["client_id"] != tenant["client_id"] or own["site_id"] != tenant["site_id"]:
+        raise HTTPException(status_code=403, detail="API key does not match token")
+    prefix = f"{own['client_id']}#{own['site_id']}#"
+    if after and not after.startswith(prefix):
+        raise HTTPException(status_code=400, detail="Invalid export cursor")
+    users = _users(own, email, after, limit)
+    if fmt == "csv":
+        return StreamingResponse(
+            _csv(users),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+        )
+    return StreamingResponse(_ndjson(users), media_type="application/x-ndjson")
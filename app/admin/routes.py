@@ -1,24 +1,39 @@
-"""Admin SSR form routes using Jinja2 templates."""
+"""Admin SSR form routes using Jinja2 templates.
+
+The pages accept a bearer token or the cookie session started by
+``POST /admin/login`` (see ``app.auth.cookie_session``).  Forms rendered
+for a cookie session carry its CSRF token, so they are rendered per
+request; bearer clients still get the cached renders.
+"""
 
 from __future__ import annotations
 
-from pathlib import Path
+from datetime import datetime, timezone
 from typing import Any, Dict
 
-from fastapi import APIRouter, Depends, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from pydantic import EmailStr
 
-from ..auth.dependencies import get_current_user, resolve_tenant
+from ..auth import cookie_session, sessions
+from ..auth.dependencies import get_admin_form_user, get_admin_user, resolve_tenant
+from ..auth.login import authenticate
+from ..auth.logout import logout as logout_handler
 from ..auth.models import PasswordResetRequest, RegisterRequest
 from ..auth.pw_reset import password_reset as password_reset_handler
 from ..auth.register_user import register as register_handler
+from ..auth.user_store import record_login
+from ..templating import render_cached, templates
+from .export import router as export_router
 
-TEMPLATES_DIR = Path(__file__).resolve().parents[2] / "templates"
-
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 router = APIRouter()
+router.include_router(export_router)
+
+
+def _csrf_token(user: dict) -> str:
+    if user.get("typ") == cookie_session.SESSION_TYPE:
+        return user["csrf"]
+    return ""
 
 
 def _base_context(request: Request, user: dict) -> Dict[str, Any]:
@@ -26,35 +41,120 @@ def _base_context(request: Request, user: dict) -> Dict[str, Any]:
         "request": request,
         "title": "Admin",
         "user_email": user.get("email"),
+        "csrf_token": _csrf_token(user),
     }
 
 
+def _cached_form(name: str) -> HTMLResponse:
+    """Render a static admin form from the render cache."""
+    return HTMLResponse(render_cached(name, {"title": "Admin"}))
+
+
+def _form(request: Request, name: str, user: dict) -> Response:
+    """Render an admin form, with the CSRF token for cookie sessions."""
+    csrf_token = _csrf_token(user)
+    if not csrf_token:
+        return _cached_form(name)
+    return templates.TemplateResponse(
+        name, {"request": request, "title": "Admin", "csrf_token": csrf_token}
+    )
+
+
+@router.get("/login", response_class=HTMLResponse)
+def login_form() -> HTMLResponse:
+    """Render the admin sign-in form.
+
+    Returns:
+        An HTML response containing the sign-in form.
+    """
+    return HTMLResponse(render_cached("admin/login.html", {"title": "Admin Sign In"}))
+
+
+@router.post("/login", response_class=HTMLResponse)
+async def submit_login_form(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    email: EmailStr = Form(...),
+    password: str = Form(...),
+    api_key: str = Form(...),
+) -> Response:
+    """Check the credentials and start a cookie session.
+
+    Args:
+        request: The incoming HTTP request object.
+        background_tasks: Used to schedule a password hash upgrade.
+        email: Email address submitted from the form.
+        password: Plaintext password submitted from the form.
+        api_key: Tenant API key for resolving the user's tenant.
+
+    Returns:
+        A redirect to the user form with the session cookie set, or the
+        sign-in form again with the error.
+    """
+    try:
+        tenant = await resolve_tenant(api_key)
+        user = await authenticate(tenant, email, password, request, background_tasks)
+    except HTTPException as exc:
+        return templates.TemplateResponse(
+            "admin/login.html",
+            {"request": request, "title": "Admin Sign In", "error": exc.detail, "email": email},
+            status_code=exc.status_code,
+        )
+
+    epoch = int(user.get("token_epoch", 0))
+    sessions.remember_epoch(user["user_id"], epoch)
+    await record_login(user["user_id"], datetime.now(timezone.utc))
+
+    response = RedirectResponse(request.url_for("users_form"), status_code=303)
+    cookie_session.set_cookie(response, cookie_session.issue(user, epoch))
+    return response
+
+
+@router.post("/logout")
+async def submit_logout_form(
+    request: Request,
+    user: dict = Depends(get_admin_form_user),
+) -> Response:
+    """Revoke the current session and clear its cookie.
+
+    Args:
+        request: The incoming HTTP request object.
+        user: Decoded payload injected by ``get_admin_form_user``.
+
+    Returns:
+        A redirect to the sign-in form.
+    """
+    await logout_handler(user)
+    response = RedirectResponse(request.url_for("login_form"), status_code=303)
+    cookie_session.clear_cookie(response)
+    return response
+
+
 @router.get("/users", response_class=HTMLResponse)
 def users_form(
     request: Request,
-    user: dict = Depends(get_current_user),
-) -> HTMLResponse:
+    user: dict = Depends(get_admin_user),
+) -> Response:
     """Render the basic user management form.
 
     Args:
         request: The incoming HTTP request object.
-        user: Decoded JWT payload injected by ``get_current_user``.
+        user: Decoded payload injected by ``get_admin_user``.
 
     Returns:
         An HTML response containing the user management form.
     """
-    context = _base_context(request, user)
-    return templates.TemplateResponse("admin/users_form.html", context)
+    return _form(request, "admin/users_form.html", user)
 
 
 @router.post("/users", response_class=HTMLResponse)
-def submit_user_form(
+async def submit_user_form(
     request: Request,
     email: EmailStr = Form(...),
     api_key: str = Form(...),
     password: str = Form(...),
     name: str = Form(""),
-    user: dict = Depends(get_current_user),
+    user: dict = Depends(get_admin_form_user),
 ) -> HTMLResponse:
     """Handle the user management form submission.
 
@@ -64,15 +164,15 @@ def submit_user_form(
         api_key: Tenant API key for resolving the target tenant.
         password: Plaintext password for the new user.
         name: Optional display name.
-        user: Decoded JWT payload injected by ``get_current_user``.
+        user: Decoded payload injected by ``get_admin_form_user``.
 
     Returns:
         An HTML response showing the submitted values.
     """
     context = _base_context(request, user)
     try:
-        tenant = resolve_tenant(api_key)
-        result = register_handler(RegisterRequest(
+        tenant = await resolve_tenant(api_key)
+        result = await register_handler(RegisterRequest(
             email=email,
             password=password,
             name=name,
@@ -105,27 +205,26 @@ def submit_user_form(
 @router.get("/password-reset", response_class=HTMLResponse)
 def password_reset_form(
     request: Request,
-    user: dict = Depends(get_current_user),
-) -> HTMLResponse:
+    user: dict = Depends(get_admin_user),
+) -> Response:
     """Render the password reset request form.
 
     Args:
         request: The incoming HTTP request object.
-        user: Decoded JWT payload injected by ``get_current_user``.
+        user: Decoded payload injected by ``get_admin_user``.
 
     Returns:
         An HTML response containing the reset request form.
     """
-    context = _base_context(request, user)
-    return templates.TemplateResponse("admin/password_reset_form.html", context)
+    return _form(request, "admin/password_reset_form.html", user)
 
 
 @router.post("/password-reset", response_class=HTMLResponse)
-def submit_password_reset_form(
+async def submit_password_reset_form(
     request: Request,
     email: EmailStr = Form(...),
     api_key: str = Form(...),
-    user: dict = Depends(get_current_user),
+    user: dict = Depends(get_admin_form_user),
 ) -> HTMLResponse:
     """Handle password reset request submissions.
 
@@ -133,15 +232,15 @@ def submit_password_reset_form(
         request: The incoming HTTP request object.
         email: Email address submitted from the form.
         api_key: Tenant API key for resolving the target tenant.
-        user: Decoded JWT payload injected by ``get_current_user``.
+        user: Decoded payload injected by ``get_admin_form_user``.
 
     Returns:
         An HTML response showing the submitted values.
     """
     context = _base_context(request, user)
     try:
-        tenant = resolve_tenant(api_key)
-        result = password_reset_handler(PasswordResetRequest(email=email), tenant)
+        tenant = await resolve_tenant(api_key)
+        result = await password_reset_handler(PasswordResetRequest(email=email), tenant)
         summary = result.get("message", "Password reset request received.")
         fields = {
             "email": email,
@@ -0,0 +1,549 @@
+"""Async DynamoDB table accessors.
+
+Route handlers use this module instead of the boto3 resources in
+``app.db`` so that concurrent requests in one container overlap their
+DynamoDB I/O instead of each holding a threadpool thread (or, in async
+routes, blocking the event loop).
+
+``AsyncTable`` mirrors the subset of the boto3 ``Table`` API the app
+uses (``get_item``, ``put_item``, ``update_item``, ``delete_item``,
+``query``, ``scan``) with the same high-level arguments and return
+shapes, so expressions and ``Key``/``Item`` dicts carry over unchanged.
+Every call is awaitable and goes through a pluggable backend:
+
+* ``HttpBackend`` talks to the DynamoDB JSON API over a pooled,
+  keep-alive ``httpx.AsyncClient`` and signs requests with botocore's
+  SigV4 signer.  Values are (de)serialized with boto3's type
+  serializers, so numbers come back as ``Decimal`` as they do today.
+* ``devtools.dynamodb.MemoryBackend`` is an in-process stand-in for
+  tests, benchmarks and local development.  It is not deployed and is
+  imported only when selected.
+
+``DYNAMODB_BACKEND`` selects ``aws`` (default) or ``memory``;
+``set_backend`` swaps the backend at runtime.
+
+Calls made while ``app.metrics`` is recording a request are timed and
+request ``ConsumedCapacity``, which is reported per table and removed
+from the response again unless the caller asked for it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from . import config, metrics
+
+_RETRYABLE_ERRORS = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+    "ServiceUnavailable",
+}
+
+
+class DynamoDBError(Exception):
+    """A DynamoDB API error.
+
+    Attributes:
+        code: The short error code, e.g. ``ConditionalCheckFailedException``.
+        message: The error message returned by the service.
+    """
+
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(f"{code}: {message}" if message else code)
+        self.code = code
+        self.message = message
+
+
+class ConditionalCheckFailed(DynamoDBError):
+    """Raised when a ``ConditionExpression`` evaluates to false."""
+
+    def __init__(self, message: str = "The conditional request failed"):
+        super().__init__("ConditionalCheckFailedException", message)
+
+
+def _raise_for(code: str, message: str) -> None:
+    if code == "ConditionalCheckFailedException":
+        raise ConditionalCheckFailed(message)
+    raise DynamoDBError(code, message)
+
+
+# ---------------------------------------------------------------------------
+# Tables
+# ---------------------------------------------------------------------------
+
+
+class AsyncTable:
+    """Awaitable counterpart of a boto3 ``Table`` resource.
+
+    Args:
+        name: The DynamoDB table name.
+        backend: Backend that executes the calls; defaults to the
+            process-wide backend at call time.
+    """
+
+    def __init__(self, name: str, backend: Optional["Backend"] = None):
+        self.name = name
+        self._backend = backend
+
+    @property
+    def backend(self) -> "Backend":
+        return self._backend or get_backend()
+
+    async def _call(self, operation: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        params = dict(kwargs, TableName=self.name)
+        if not metrics.enabled():
+            return await self.backend.call(operation, params)
+        return await _measured(self.backend, operation, params, [self.name])
+
+    async def get_item(self, **kwargs: Any) -> Dict[str, Any]:
+        """``GetItem``; the response has ``Item`` only if the key exists."""
+        return await self._call("GetItem", kwargs)
+
+    async def put_item(self, **kwargs: Any) -> Dict[str, Any]:
+        """``PutItem``; raises ``ConditionalCheckFailed`` on a failed condition."""
+        return await self._call("PutItem", kwargs)
+
+    async def update_item(self, **kwargs: Any) -> Dict[str, Any]:
+        """``UpdateItem``; raises ``ConditionalCheckFailed`` on a failed condition."""
+        return await self._call("UpdateItem", kwargs)
+
+    async def delete_item(self, **kwargs: Any) -> Dict[str, Any]:
+        """``DeleteItem``; raises ``ConditionalCheckFailed`` on a failed condition."""
+        return await self._call("DeleteItem", kwargs)
+
+    async def query(self, **kwargs: Any) -> Dict[str, Any]:
+        """``Query``; one page of results."""
+        return await self._call("Query", kwargs)
+
+    async def scan(self, **kwargs: Any) -> Dict[str, Any]:
+        """``Scan``; one page of results."""
+        return await self._call("Scan", kwargs)
+
+
+async def _measured(
+    backend: "Backend", operation: str, params: Dict[str, Any], tables: List[str]
+) -> Dict[str, Any]:
+    """Run one call and record its latency and capacity against ``tables``."""
+    wanted = "ReturnConsumedCapacity" in params
+    if not wanted:
+        params = dict(params, ReturnConsumedCapacity="TOTAL")
+    capacity: Dict[str, float] = {}
+    start = time.perf_counter()
+    try:
+        response = await backend.call(operation, params)
+        if wanted:
+            consumed = response.get("ConsumedCapacity")
+        else:
+            consumed = response.pop("ConsumedCapacity", None)
+        capacity = metrics.capacity_by_table(consumed)
+        return response
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        for table in tables:
+            metrics.record_dynamodb(table, ms, capacity.get(table, 0.0))
+
+
+async def _batch_call(operation: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    if not metrics.enabled():
+        return await get_backend().call(operation, kwargs)
+    return await _measured(get_backend(), operation, kwargs, list(kwargs.get("RequestItems", {})))
+
+
+async def batch_get_item(**kwargs: Any) -> Dict[str, Any]:
+    """``BatchGetItem`` across tables (at most 100 keys per call)."""
+    return await _batch_call("BatchGetItem", kwargs)
+
+
+async def batch_write_item(**kwargs: Any) -> Dict[str, Any]:
+    """``BatchWriteItem`` across tables (at most 25 requests per call)."""
+    return await _batch_call("BatchWriteItem", kwargs)
+
+
+_BATCH_GET_SIZE = 100
+
+
+async def iter_batch_get(
+    table: str,
+    keys: List[Dict[str, Any]],
+    *,
+    concurrency: int = 4,
+    max_attempts: int = 8,
+    **params: Any,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Read many keys from one table with ``BatchGetItem``.
+
+    Duplicate keys are dropped and the rest are split into chunks of 100,
+    fetched concurrently.  ``UnprocessedKeys`` are retried with jittered
+    exponential backoff.  Items are yielded in pages as responses arrive,
+    so their order is unrelated to ``keys``; keys that do not exist are
+    simply absent.
+
+    Args:
+        table: Table name.
+        keys: Primary keys to read.
+        concurrency: Chunks in flight at once.
+        max_attempts: Calls per chunk before giving up on unprocessed keys.
+        **params: Extra per-table arguments, e.g. ``ProjectionExpression``,
+            ``ExpressionAttributeNames`` or ``ConsistentRead``.
+
+    Yields:
+        Lists of items.
+
+    Raises:
+        DynamoDBError: If a call fails or keys are still unprocessed after
+            ``max_attempts`` calls.
+    """
+    unique = list({tuple(sorted(key.items())): key for key in keys}.values())
+    if not unique:
+        return
+    queue: asyncio.Queue = asyncio.Queue()
+    gate = asyncio.Semaphore(concurrency)
+
+    async def fetch(chunk: List[Dict[str, Any]]) -> None:
+        request = {table: dict(params, Keys=chunk)}
+        async with gate:
+            for attempt in range(max_attempts):
+                response = await batch_get_item(RequestItems=request)
+                items = response.get("Responses", {}).get(table)
+                if items:
+                    await queue.put(items)
+                request = response.get("UnprocessedKeys") or {}
+                if not request:
+                    return
+                await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+        remaining = len(request[table]["Keys"])
+        raise DynamoDBError(
+            "ProvisionedThroughputExceededException",
+            f"{remaining} keys unprocessed after {max_attempts} attempts",
+        )
+
+    async def run(chunk: List[Dict[str, Any]]) -> None:
+        try:
+            await fetch(chunk)
+        except Exception as exc:
+            await queue.put(exc)
+        finally:
+            await queue.put(None)
+
+    tasks = [
+        asyncio.ensure_future(run(unique[start:start + _BATCH_GET_SIZE]))
+        for start in range(0, len(unique), _BATCH_GET_SIZE)
+    ]
+    try:
+        running = len(tasks)
+        while running:
+            page = await queue.get()
+            if page is None:
+                running -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield page
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def users_table() -> AsyncTable:
+    """Return the Users table.
+
+    Returns:
+        An ``AsyncTable`` for the Users table.
+    """
+    return AsyncTable(config.USERS_TABLE)
+
+
+def resume_table() -> AsyncTable:
+    """Return the Resume table.
+
+    Returns:
+        An ``AsyncTable`` for the Resume table.
+    """
+    return AsyncTable(config.RESUME_TABLE)
+
+
+def blacklist_table() -> AsyncTable:
+    """Return the TokenBlacklist table.
+
+    Returns:
+        An ``AsyncTable`` for revoked JWTs.
+    """
+    return AsyncTable(config.BLACKLIST_TABLE)
+
+
+def password_reset_table() -> AsyncTable:
+    """Return the PasswordResetTokens table.
+
+    Returns:
+        An ``AsyncTable`` for reset tokens.
+    """
+    return AsyncTable(config.PASSWORD_RESET_TABLE)
+
+
+def login_attempts_table() -> AsyncTable:
+    """Return the LoginAttempts table.
+
+    Returns:
+        An ``AsyncTable`` for rate-limiting data.
+    """
+    return AsyncTable(config.LOGIN_ATTEMPTS_TABLE)
+
+
+def api_keys_table() -> AsyncTable:
+    """Return the ApiKeys table.
+
+    Returns:
+        An ``AsyncTable`` for tenant API-key records.
+    """
+    return AsyncTable(config.API_KEYS_TABLE)
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+
+class Backend:
+    """Executes DynamoDB operations given high-level (boto3 resource) params."""
+
+    async def call(self, operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """Release any pooled resources."""
+
+
+class HttpBackend(Backend):
+    """DynamoDB over pooled keep-alive HTTP with SigV4 signing.
+
+    Args:
+        region: AWS region; defaults to the botocore session's region.
+        endpoint_url: Override the service endpoint (e.g. DynamoDB Local).
+        max_connections: Size of the connection pool.
+        timeout: Per-request timeout in seconds.
+        max_retries: Retries for throttling, 5xx errors and transport
+            errors (connection failures, timeouts).
+    """
+
+    def __init__(
+        self,
+        region: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        max_connections: int = 32,
+        timeout: float = 5.0,
+        max_retries: int = 3,
+    ):
+        import botocore.session
+        from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+        self._session = botocore.session.get_session()
+        self._region = region or self._session.get_config_variable("region") or "us-east-1"
+        self._url = endpoint_url or f"https://dynamodb.{self._region}.amazonaws.com/"
+        self._max_connections = max_connections
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+        self._client = None
+        self._client_loop = None
+        self._closer: Optional[asyncio.Task] = None
+        self._credentials = None
+
+    def _http(self):
+        """Return the pooled client for the running event loop.
+
+        ``httpx`` connections are bound to the loop that opened them, so a
+        new pool is created if the adapter runs us on a different loop.
+        Each pool is closed on its own loop: ``asyncio.run`` and anyio
+        cancel leftover tasks before closing a loop, which ends the pool's
+        ``_close_when_cancelled`` task, and a pool replaced while its loop
+        is still open is closed there.
+        """
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._discard_client()
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                    keepalive_expiry=60,
+                ),
+            )
+            self._client_loop = loop
+            self._closer = loop.create_task(_close_when_cancelled(self._client))
+        return self._client
+
+    def _discard_client(self) -> None:
+        """Close the pool of a previous loop on that loop."""
+        closer, old_loop = self._closer, self._client_loop
+        self._client = self._client_loop = self._closer = None
+        if closer is None or closer.done() or old_loop is None or old_loop.is_closed():
+            return
+        try:
+            old_loop.call_soon_threadsafe(closer.cancel)
+        except RuntimeError:
+            # Closed between the check and the call.
+            pass
+
+    def _sign(self, operation: str, body: bytes) -> Dict[str, str]:
+        from botocore.auth import SigV4Auth
+        from botocore.awsrequest import AWSRequest
+
+        if self._credentials is None:
+            self._credentials = self._session.get_credentials()
+        request = AWSRequest(
+            method="POST",
+            url=self._url,
+            data=body,
+            headers={
+                "Content-Type": "application/x-amz-json-1.0",
+                "X-Amz-Target": f"DynamoDB_20120810.{operation}",
+            },
+        )
+        frozen = self._credentials.get_frozen_credentials()
+        SigV4Auth(frozen, "dynamodb", self._region).add_auth(request)
+        return dict(request.headers.items())
+
+    def _ser_map(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: self._serializer.serialize(value) for key, value in values.items()}
+
+    def _de_map(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: self._deserializer.deserialize(value) for key, value in values.items()}
+
+    def _serialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        out = dict(params)
+        for field in ("Key", "Item", "ExclusiveStartKey", "ExpressionAttributeValues"):
+            if field in out:
+                out[field] = self._ser_map(out[field])
+        if "RequestItems" in out:
+            items = {}
+            for table, request in out["RequestItems"].items():
+                if isinstance(request, dict):
+                    request = dict(request, Keys=[self._ser_map(k) for k in request["Keys"]])
+                else:
+                    request = [self._ser_write(entry) for entry in request]
+                items[table] = request
+            out["RequestItems"] = items
+        return out
+
+    def _ser_write(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        if "PutRequest" in entry:
+            return {"PutRequest": {"Item": self._ser_map(entry["PutRequest"]["Item"])}}
+        return {"DeleteRequest": {"Key": self._ser_map(entry["DeleteRequest"]["Key"])}}
+
+    def _deserialize(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        for field in ("Item", "Attributes", "LastEvaluatedKey"):
+            if field in data:
+                data[field] = self._de_map(data[field])
+        if "Items" in data:
+            data["Items"] = [self._de_map(item) for item in data["Items"]]
+        if "Responses" in data:
+            data["Responses"] = {
+                table: [self._de_map(item) for item in items]
+                for table, items in data["Responses"].items()
+            }
+        if data.get("UnprocessedKeys"):
+            data["UnprocessedKeys"] = {
+                table: dict(request, Keys=[self._de_map(k) for k in request["Keys"]])
+                for table, request in data["UnprocessedKeys"].items()
+            }
+        if data.get("UnprocessedItems"):
+            data["UnprocessedItems"] = {
+                table: [
+                    {"PutRequest": {"Item": self._de_map(e["PutRequest"]["Item"])}}
+                    if "PutRequest" in e
+                    else {"DeleteRequest": {"Key": self._de_map(e["DeleteRequest"]["Key"])}}
+                    for e in entries
+                ]
+                for table, entries in data["UnprocessedItems"].items()
+            }
+        return data
+
+    async def call(self, operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        import httpx
+
+        body = json.dumps(self._serialize(params)).encode("utf-8")
+        attempt = 0
+        while True:
+            headers = self._sign(operation, body)
+            try:
+                response = await self._http().post(self._url, content=body, headers=headers)
+            except httpx.TransportError as exc:
+                if attempt >= self._max_retries:
+                    raise DynamoDBError(type(exc).__name__, str(exc)) from exc
+                attempt += 1
+                await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+                continue
+            if response.status_code == 200:
+                return self._deserialize(response.json())
+
+            try:
+                data = response.json() if response.content else {}
+            except ValueError:
+                # Gateways and load balancers answer 5xx with HTML or text.
+                data = {}
+            if not isinstance(data, dict):
+                data = {}
+            code = data.get("__type", f"HTTP{response.status_code}").rsplit("#", 1)[-1]
+            message = data.get("message") or data.get("Message") or ""
+            retryable = code in _RETRYABLE_ERRORS or response.status_code >= 500
+            if not retryable or attempt >= self._max_retries:
+                _raise_for(code, message)
+            attempt += 1
+            await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+    async def aclose(self) -> None:
+        if self._closer is not None:
+            self._closer.cancel()
+            self._closer = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+
+
+async def _close_when_cancelled(client) -> None:
+    """Close ``client`` when this task is cancelled."""
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await client.aclose()
+
+
+_backend: Optional[Backend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> Backend:
+    """Return the process-wide backend, creating it from config on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if config.DYNAMODB_BACKEND == "memory":
+                    from devtools.dynamodb import MemoryBackend
+
+                    _backend = MemoryBackend.for_app()
+                else:
+                    _backend = HttpBackend(
+                        endpoint_url=config.DYNAMODB_ENDPOINT_URL or None,
+                        max_connections=config.DYNAMODB_MAX_CONNECTIONS,
+                    )
+    return _backend
+
+
+def set_backend(backend: Optional[Backend]) -> None:
+    """Replace the process-wide backend (``None`` recreates it from config)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -1,13 +1,48 @@
 """FastAPI application setup for the Lambda handler."""
 
+import sys
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from .admin.routes import router as admin_router
-from .auth.routes import router as auth_router
-from .entity.routes import router as entity_router
-from .health.routes import router as health_router
+from . import config, write_behind
+from .coldstart import LazyRouterMount, timed_import
+from .metrics import MetricsMiddleware
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Run the write-behind and mail flushers and drain them on shutdown.
+
+    Mangum runs the lifespan around every invocation, so deferred writes
+    and queued mail are flushed before each Lambda invocation returns.
+    ``app.mail`` is only touched once a route has imported it, so routes
+    that send no mail do not load it.
+    """
+    write_behind.start()
+    mail = sys.modules.get(f"{__package__}.mail")
+    if mail is not None:
+        mail.start()
+    try:
+        yield
+    finally:
+        await write_behind.stop()
+        mail = sys.modules.get(f"{__package__}.mail")
+        if mail is not None:
+            await mail.stop()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# URL prefix -> module exposing a ``router``.  Module names are relative to
+# this package so they can be imported lazily by ``LazyRouterMount``.
+ROUTERS = {
+    "/auth": ".auth.routes",
+    "/admin": ".admin.routes",
+    "/user": ".users.routes",
+    "/health": ".health.routes",
+    "/resume": ".resume.routes",
+}
 
 
 @app.get("/")
@@ -20,20 +55,29 @@ def read_root() -> dict:
     return {"ok": True}
 
 
-def register_routes(target: FastAPI) -> None:
+def register_routes(target: FastAPI, lazy: bool = False) -> None:
     """Attach feature routers to the application.
 
     Each service package exposes a single ``router`` that is mounted
-    under its own URL prefix.
+    under its own URL prefix.  In lazy mode the routers are not imported
+    here; ``LazyRouterMount`` imports each one on the first request under
+    its prefix so cold starts only pay for what they serve.
 
     Args:
         target: The FastAPI application instance to register routes on.
+        lazy: Defer router imports until first use.
     """
-    target.include_router(auth_router, prefix="/auth")
-    target.include_router(admin_router, prefix="/admin")
-    target.include_router(users_router, prefix="/user")
-    target.include_router(health_router, prefix="/health")
-    target.include_router(resume_router, prefix="/resume")
+    if lazy:
+        target.add_middleware(
+            LazyRouterMount, target=target, routers=ROUTERS, package=__package__
+        )
+        return
+
+    for prefix, module in ROUTERS.items():
+        router = timed_import(module, __package__).router
+        target.include_router(router, prefix=prefix)
 
 
-register_routes(app)
+register_routes(app, lazy=config.LAZY_ROUTERS)
+# Added last so it is outermost and also times lazy router imports.
+app.add_middleware(MetricsMiddleware)
@@ -0,0 +1,113 @@
+"""Cookie sessions for the server-rendered admin pages.
+
+A browser form cannot send an ``Authorization`` header, so the admin
+pages also accept a session JWT in the ``ADMIN_SESSION_COOKIE`` cookie.
+The cookie is ``HttpOnly``, ``Secure`` (``ADMIN_COOKIE_SECURE``),
+``SameSite`` (``ADMIN_COOKIE_SAMESITE``) and scoped to ``Path=/admin``, so
+it is never sent to the API routes.
+
+The token is kept small because every admin request carries it in its
+``Cookie`` header.  Its claims are
+
+* ``typ``: ``"session"``, so it cannot pass as a bearer token;
+* ``sub``: the ``user_id``; ``email``, ``client_id`` and ``site_id`` are
+  parts of it and are restored by ``expand``;
+* ``jti`` and ``csrf``: 16 random bytes each, base64url;
+* ``ep`` and ``exp``, as on access tokens.
+
+CSRF protection is double submit: every rendered form repeats the
+``csrf`` claim in a hidden ``csrf_token`` field, and a cookie-authenticated
+``POST`` is accepted only if the field matches the claim of the cookie
+that came with it.  Another site can make the browser send the cookie but
+cannot read it, so it cannot fill in the field.  The claim is signed with
+the rest of the token and cached with the verified payload, so the check
+costs no extra HMAC.
+"""
+
+from __future__ import annotations
+
+import base64
+import hmac
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import Response
+
+from .. import config, keyring
+
+SESSION_TYPE = "session"
+COOKIE_PATH = "/admin"
+
+
+def _random_id() -> str:
+    return base64.urlsafe_b64encode(secrets.token_bytes(16)).rstrip(b"=").decode("ascii")
+
+
+def issue(user: dict, epoch: int = 0) -> str:
+    """Sign a session token for ``user``.
+
+    Args:
+        user: The user item; only ``user_id`` is used.
+        epoch: The user's current ``token_epoch``.
+
+    Returns:
+        The cookie value.
+    """
+    now = datetime.now(timezone.utc)
+    return keyring.encode({
+        "typ": SESSION_TYPE,
+        "sub": user["user_id"],
+        "jti": _random_id(),
+        "csrf": _random_id(),
+        "ep": epoch,
+        "exp": now + timedelta(minutes=config.ADMIN_SESSION_MINUTES),
+    })
+
+
+def expand(claims: dict) -> dict:
+    """Return ``claims`` with the fields ``get_current_user`` provides.
+
+    Args:
+        claims: A verified session token payload.
+
+    Returns:
+        A payload that also has ``user_id``, ``email``, ``client_id`` and
+        ``site_id``, taken from ``sub``.
+    """
+    client_id, site_id, email = claims["sub"].split("#", 2)
+    return dict(
+        claims, user_id=claims["sub"], email=email, client_id=client_id, site_id=site_id
+    )
+
+
+def csrf_matches(payload: dict, submitted: Optional[str]) -> bool:
+    """Return ``True`` if ``submitted`` is the session's CSRF token."""
+    expected = payload.get("csrf")
+    if not expected or not submitted:
+        return False
+    return hmac.compare_digest(expected.encode("ascii"), submitted.encode("ascii", "replace"))
+
+
+def set_cookie(response: Response, token: str) -> None:
+    """Attach the session cookie to ``response``."""
+    response.set_cookie(
+        config.ADMIN_SESSION_COOKIE,
+        token,
+        max_age=config.ADMIN_SESSION_MINUTES * 60,
+        path=COOKIE_PATH,
+        secure=config.ADMIN_COOKIE_SECURE,
+        httponly=True,
+        samesite=config.ADMIN_COOKIE_SAMESITE,
+    )
+
+
+def clear_cookie(response: Response) -> None:
+    """Expire the session cookie on ``response``."""
+    response.delete_cookie(
+        config.ADMIN_SESSION_COOKIE,
+        path=COOKIE_PATH,
+        secure=config.ADMIN_COOKIE_SECURE,
+        httponly=True,
+        samesite=config.ADMIN_COOKIE_SAMESITE,
+    )
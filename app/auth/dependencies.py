@@ -1,15 +1,22 @@
 """FastAPI dependencies for auth and tenant resolution."""
 
+from typing import Callable, Optional
+
 import jwt
-from fastapi import Header, HTTPException
+from fastapi import Depends, Form, Header, HTTPException, Request
 
-from ..config import API_KEYS, get_jwt_secret
-from ..db import blacklist_table
+from .. import config, keyring, tenants
+from ..aiodb import blacklist_table
+from . import cookie_session, revocation_filter, sessions, token_cache
+from .user_store import ADMIN_ROLE, get_role
 
 
-def resolve_tenant(api_key: str) -> dict:
+async def resolve_tenant(api_key: str) -> dict:
     """Validate an API key value and return the tenant context.
 
+    Keys are resolved through the hashed tenant registry in
+    ``app.tenants``.
+
     Args:
         api_key: The API key value to resolve.
 
@@ -19,12 +26,13 @@ def resolve_tenant(api_key: str) -> dict:
     Raises:
         HTTPException: 403 if the key is not in the allowed set.
     """
-    if api_key not in API_KEYS:
+    tenant = await tenants.lookup(api_key)
+    if tenant is None:
         raise HTTPException(status_code=403, detail="Invalid API key")
-    return API_KEYS[api_key]
+    return tenant
 
 
-def get_tenant(x_api_key: str = Header()) -> dict:
+async def get_tenant(x_api_key: str = Header()) -> dict:
     """Validate the API key header and return the tenant context.
 
     Args:
@@ -36,14 +44,97 @@ def get_tenant(x_api_key: str = Header()) -> dict:
     Raises:
         HTTPException: 403 if the key is not in the allowed set.
     """
-    return resolve_tenant(x_api_key)
+    return await resolve_tenant(x_api_key)
+
+
+async def verify_token(
+    token: str,
+    token_type: str = sessions.ACCESS_TYPE,
+    expand: Optional[Callable[[dict], dict]] = None,
+) -> dict:
+    """Verify a JWT and check it has not been revoked.
+
+    Verified payloads and blacklist verdicts are cached in
+    ``token_cache`` so repeat calls with the same token on a warm
+    container skip both the HMAC check and the DynamoDB read.  On a
+    verdict miss the ``revocation_filter`` is consulted first and the
+    blacklist table is only read when the filter cannot rule the JTI out.
+    Tokens from before the user's last ``sessions.revoke_all`` are
+    rejected when this container knows the newer epoch.
+
+    Args:
+        token: The encoded JWT.
+        token_type: Required ``typ`` claim.  Tokens without one count as
+            access tokens (``sessions.token_type``).
+        expand: Applied to the payload once after verification; the
+            result is what gets cached and returned.
+
+    Returns:
+        The (expanded) payload.
+
+    Raises:
+        HTTPException: 401 if the token is expired, invalid, of another
+            type, or has been revoked.
+    """
+    digest = token_cache.token_digest(token)
+
+    payload = token_cache.get(digest)
+    if payload is None:
+        try:
+            payload = await keyring.decode(token)
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expired")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        if sessions.token_type(payload) != token_type:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        if expand is not None:
+            try:
+                payload = expand(payload)
+            except (KeyError, ValueError):
+                raise HTTPException(status_code=401, detail="Invalid token")
+        token_cache.put(digest, payload)
+    elif sessions.token_type(payload) != token_type:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    if sessions.is_stale(payload):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    await check_not_revoked(digest, payload)
+    return payload
 
 
-def get_current_user(authorization: str = Header()) -> dict:
+async def check_not_revoked(digest: bytes, payload: dict) -> None:
+    """Reject a token whose JTI is on the blacklist.
+
+    Args:
+        digest: ``token_cache.token_digest`` of the token, for the cached
+            verdict.
+        payload: The verified payload.
+
+    Raises:
+        HTTPException: 401 if the token has been revoked.
+    """
+    jti = payload.get("jti")
+    if not jti:
+        return
+    revoked = token_cache.revocation_verdict(digest)
+    if revoked is None:
+        revoked = False
+        if await revocation_filter.might_be_revoked(jti):
+            table = blacklist_table()
+            result = await table.get_item(Key={"token_jti": jti})
+            revoked = "Item" in result
+        token_cache.record_revocation_verdict(digest, revoked)
+    if revoked:
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+
+async def get_current_user(authorization: str = Header()) -> dict:
     """Extract and verify the JWT from the Authorization header.
 
-    Decodes the token, checks the blacklist, and returns the full
-    decoded payload for downstream route functions.
+    Decodes the token through ``verify_token`` and returns the full
+    decoded payload for downstream route functions.  Refresh tokens and
+    admin session tokens are not accepted.
 
     Args:
         authorization: Raw ``Authorization`` header value (``Bearer <token>``).
@@ -59,20 +150,85 @@ def get_current_user(authorization: str = Header()) -> dict:
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="No token provided")
 
-    token = authorization.split(" ", 1)[1]
+    return await verify_token(authorization.split(" ", 1)[1])
 
-    try:
-        payload = jwt.decode(token, get_jwt_secret(), algorithms=["HS256"])
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
 
-    jti = payload.get("jti")
-    if jti:
-        table = blacklist_table()
-        result = table.get_item(Key={"token_jti": jti})
-        if "Item" in result:
-            raise HTTPException(status_code=401, detail="Token revoked")
+async def get_admin_user(
+    request: Request,
+    authorization: Optional[str] = Header(None),
+) -> dict:
+    """Authenticate an admin page by bearer token or session cookie.
 
-    return payload
+    A request with an ``Authorization`` header is handled exactly like
+    ``get_current_user``.  Otherwise the ``ADMIN_SESSION_COOKIE`` cookie
+    must hold a session token from ``cookie_session.issue``; it shares the
+    verified-token cache and revocation checks of bearer tokens.
+
+    Args:
+        request: The incoming request, for its cookies.
+        authorization: Raw ``Authorization`` header value, if any.
+
+    Returns:
+        The decoded payload.  Cookie sessions have ``typ`` ``"session"``
+        and a ``csrf`` claim.
+
+    Raises:
+        HTTPException: 401 if neither credential is present or valid.
+    """
+    if authorization:
+        return await get_current_user(authorization)
+    token = request.cookies.get(config.ADMIN_SESSION_COOKIE)
+    if not token:
+        raise HTTPException(status_code=401, detail="No token provided")
+    return await verify_token(token, cookie_session.SESSION_TYPE, cookie_session.expand)
+
+
+async def get_admin_form_user(
+    request: Request,
+    csrf_token: Optional[str] = Form(None),
+    authorization: Optional[str] = Header(None),
+) -> dict:
+    """Authenticate an admin form post, enforcing CSRF for cookie sessions.
+
+    Bearer-authenticated posts need no CSRF token: a browser never adds
+    the header on its own.
+
+    Args:
+        request: The incoming request, for its cookies.
+        csrf_token: The form's hidden ``csrf_token`` field.
+        authorization: Raw ``Authorization`` header value, if any.
+
+    Returns:
+        The decoded payload, as from ``get_admin_user``.
+
+    Raises:
+        HTTPException: 401 as for ``get_admin_user``.  403 if a cookie
+            session posts without its CSRF token.
+    """
+    user = await get_admin_user(request, authorization)
+    if user.get("typ") == cookie_session.SESSION_TYPE and not cookie_session.csrf_matches(
+        user, csrf_token
+    ):
+        raise HTTPException(status_code=403, detail="Invalid CSRF token")
+    return user
+
+
+async def get_tenant_admin(user: dict = Depends(get_current_user)) -> dict:
+    """Require a bearer token whose user is an admin of their tenant.
+
+    The role is read from the user's record on every call rather than
+    trusted from the token, so removing it takes effect at once.
+
+    Args:
+        user: Decoded JWT payload injected by ``get_current_user``.
+
+    Returns:
+        The decoded payload.
+
+    Raises:
+        HTTPException: 401 as for ``get_current_user``.  403 if the user
+            does not have ``ADMIN_ROLE``.
+    """
+    if await get_role(user["user_id"]) != ADMIN_ROLE:
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return user
@@ -0,0 +1,38 @@
+"""Public JWT verification keys as a JSON Web Key Set."""
+
+from fastapi import APIRouter, Request, Response
+
+from .. import config, keyring
+from ..conditional import etag_matches
+
+router = APIRouter()
+
+
+@router.get("/.well-known/jwks.json")
+def jwks(request: Request) -> Response:
+    """Serve the public keys that verify our tokens.
+
+    Services that trust our tokens fetch this document, cache it for
+    ``JWKS_MAX_AGE_SECONDS`` and revalidate with ``If-None-Match``, then
+    verify tokens locally by their ``kid``.  Refresh tokens and admin
+    sessions are signed with the same keys, so verifiers must also require
+    ``typ == "access"`` (``sessions.ACCESS_TYPE``).  Keys for previous signing
+    keys stay listed until they are rotated out, and a token with an
+    unknown ``kid`` is a signal to refetch.  The document has no keys
+    while ``JWT_ALGORITHM`` is ``HS256``.
+
+    Args:
+        request: The incoming request, for ``If-None-Match``.
+
+    Returns:
+        The JWK Set, or 304 if ``If-None-Match`` matches its ETag.
+    """
+    body, etag = keyring.jwks()
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={config.JWKS_MAX_AGE_SECONDS}",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,192 @@
+"""Bounded executor and async API for scrypt password hashing.
+
+``hash_password`` and ``verify_password`` cost tens of milliseconds of CPU
+and about 16 MiB each.  Running them inline in sync routes lets a login
+burst occupy every threadpool thread and starve cheap endpoints.  This
+module runs them on a dedicated, size-limited executor and sheds load
+with a 429 once more than ``KDF_WORKERS + KDF_MAX_QUEUE`` operations are
+in flight, so the rest of the app keeps its threadpool.
+
+``KDF_EXECUTOR`` selects ``thread`` (default; ``hashlib.scrypt`` releases
+the GIL while OpenSSL derives the key) or ``process``.  Process pools need
+``/dev/shm`` and do not work on AWS Lambda; use them under uvicorn only.
+
+``configure`` applies the scrypt parameters from ``app.config``.  They
+are pinned per deployment (``SCRYPT_N`` in ``template.yaml``) rather than
+calibrated in each container: containers that timed differently would
+pick different N and disagree about which hashes are outdated.  Pick the
+value with the calibration command, run with the function's memory
+settings::
+
+    AWS_LAMBDA_FUNCTION_MEMORY_SIZE=256 python -m app.auth.kdf
+
+Each operation records ``ScryptTime`` (the derivation itself, measured in
+the worker) and ``KdfWaitTime`` (time spent queued for a worker) in
+``app.metrics``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .. import config, metrics
+from .passwords import (
+    ScryptParams,
+    calibrate,
+    current_params,
+    hash_password,
+    set_params,
+    verify_password,
+)
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+_configured = False
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def configure() -> ScryptParams:
+    """Apply the configured scrypt parameters.
+
+    Runs once per process; later calls return the active parameters.
+
+    Returns:
+        The ``(N, r, p)`` now used for new hashes.
+    """
+    global _configured
+    with _executor_lock:
+        if _configured:
+            return current_params()
+        params = (config.SCRYPT_N, config.SCRYPT_R, config.SCRYPT_P)
+        set_params(*params)
+        _configured = True
+        return params
+
+
+def calibrated_params() -> ScryptParams:
+    """Time scrypt on this host and return the parameters to pin.
+
+    Targets ``SCRYPT_TARGET_MS`` per verify and caps memory so
+    ``KDF_WORKERS`` concurrent derivations use at most
+    ``SCRYPT_MEMORY_FRACTION`` of the function's ``MemorySize``.
+
+    Returns:
+        The calibrated ``(N, r, p)``.
+    """
+    budget = config.LAMBDA_MEMORY_MB * 1024 * 1024 * config.SCRYPT_MEMORY_FRACTION
+    return calibrate(
+        config.SCRYPT_TARGET_MS,
+        int(budget / max(config.KDF_WORKERS, 1)),
+        r=config.SCRYPT_R,
+        p=config.SCRYPT_P,
+        min_n=config.SCRYPT_MIN_N,
+    )
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if not _configured:
+        configure()
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if config.KDF_EXECUTOR == "process":
+                    _executor = ProcessPoolExecutor(max_workers=config.KDF_WORKERS)
+                else:
+                    _executor = ThreadPoolExecutor(
+                        max_workers=config.KDF_WORKERS, thread_name_prefix="kdf"
+                    )
+    return _executor
+
+
+def _timed(fn: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    """Call ``fn`` in the worker and return its result and duration in ms."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def _run(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run ``fn`` on the KDF executor, rejecting work past the queue limit.
+
+    Raises:
+        HTTPException: 429 when the KDF queue is full.
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= config.KDF_WORKERS + config.KDF_MAX_QUEUE:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please retry",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        result, took = await loop.run_in_executor(_get_executor(), _timed, fn, *args)
+        metrics.record("ScryptTime", took)
+        metrics.record("KdfWaitTime", max((time.perf_counter() - start) * 1000 - took, 0.0))
+        return result
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the KDF executor.
+
+    Args:
+        password: The plaintext password to hash.
+
+    Returns:
+        The self-describing hash string from ``hash_password``.
+
+    Raises:
+        HTTPException: 429 when the KDF queue is full.
+    """
+    if not _configured:
+        configure()
+    return await _run(hash_password, password, current_params())
+
+
+async def verify_password_async(password: str, stored_hash: str) -> bool:
+    """Verify a password on the KDF executor.
+
+    Args:
+        password: The plaintext password to verify.
+        stored_hash: The self-describing hash string from ``hash_password``.
+
+    Returns:
+        ``True`` if the password matches, ``False`` otherwise.
+
+    Raises:
+        HTTPException: 429 when the KDF queue is full.
+    """
+    return await _run(verify_password, password, stored_hash)
+
+
+def pending() -> int:
+    """Return the number of KDF operations queued or running."""
+    return _pending
+
+
+def shutdown() -> None:
+    """Stop the executor, waiting for running operations to finish."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+if __name__ == "__main__":
+    n, r, p = calibrated_params()
+    print(f"SCRYPT_N={n} SCRYPT_R={r} SCRYPT_P={p}")
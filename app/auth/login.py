@@ -1,81 +1,137 @@
 """User login and JWT token generation."""
 
-import uuid
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 
-import jwt
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 
-from ..config import JWT_EXPIRY_HOURS, get_jwt_secret
-from ..db import users_table
+from . import kdf, sessions
 from .dependencies import get_tenant
+from .kdf import hash_password_async, verify_password_async
 from .models import LoginRequest
-from .passwords import verify_password
+from .passwords import needs_rehash
+from .rate_limit import check_login_attempt
+from .user_store import get_user, record_login, update_password_hash
 
 router = APIRouter()
 
 
-"""
-TODO: 
-    Use a JWT cookie not a json body response, 
-to support browser-based clients and SSR forms. 
-This will require CORS adjustments and CSRF protections, 
-but is more realistic for a full-stack app. The current 
-token-in-body approach is more of an API-only style and 
-doesn't demonstrate the full capabilities of FastAPI's 
-cookie handling or server-rendered forms.
-"""
-@router.post("/login")
-def login(body: LoginRequest, tenant: dict = Depends(get_tenant)):
-    """Authenticate a user and return a signed JWT.
+async def _upgrade_password_hash(user_id: str, password: str, old_hash: str) -> None:
+    """Re-hash a password stored with weaker scrypt parameters.
 
-    Looks up the user by tenant-scoped ID, verifies the password hash,
-    and issues a 24-hour access token with a unique JTI for revocation
-    support.
+    Runs as a background task after a successful login.  Under uvicorn
+    that is after the response is sent; on Lambda, Mangum waits for
+    background tasks before returning, so the hash adds to that one
+    login.  ``needs_rehash`` only fires once per user after the pinned
+    parameters are raised, and the upgrade is skipped while other KDF
+    work is queued.  The write is conditional on the stored hash being
+    unchanged so a concurrent password reset is never overwritten.
+    Failures and skips are left for the next login to retry.
 
     Args:
-        body: Validated login credentials (email and password).
-        tenant: Tenant context resolved from the ``x-api-key`` header.
+        user_id: Tenant-scoped user ID.
+        password: The plaintext password that just verified.
+        old_hash: The hash the password verified against.
+    """
+    if kdf.pending() > 0:
+        return
+    try:
+        new_hash = await hash_password_async(password)
+        await update_password_hash(
+            user_id, new_hash, old_hash, datetime.now(timezone.utc).isoformat()
+        )
+    except Exception as exc:
+        print(f"Password rehash skipped for {user_id}: {exc!r}")
+
+
+async def authenticate(
+    tenant: dict,
+    email: str,
+    password: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+) -> dict:
+    """Check a user's credentials and return their record.
+
+    Counts the attempt against the per-email and per-IP login limits,
+    looks up the user by tenant-scoped ID and verifies the password
+    hash.  Hashes stored with weaker scrypt parameters are upgraded in
+    a background task.  Shared by ``POST /auth/login`` and the admin
+    login form.
+
+    Args:
+        tenant: Tenant context the user belongs to.
+        email: Submitted email address.
+        password: Submitted plaintext password.
+        request: The incoming request, used for the client IP.
+        background_tasks: Used to schedule the hash upgrade.
 
     Returns:
-        A dict containing the signed JWT and basic user profile fields.
+        The full user item.
 
     Raises:
         HTTPException: 401 if the user does not exist or the password
-            is incorrect.
+            is incorrect.  429 if the attempt limit is exceeded or the
+            password hashing queue is full.
     """
-    table = users_table()
-    email = body.email.lower()
+    email = email.lower()
     user_id = f"{tenant['client_id']}#{tenant['site_id']}#{email}"
 
-    result = table.get_item(Key={"user_id": user_id})
-    if "Item" not in result:
+    client_ip = request.client.host if request.client else None
+    await check_login_attempt(tenant, email, client_ip)
+
+    user = await get_user(user_id)
+    if user is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    user = result["Item"]
-    if not verify_password(body.password, user["password_hash"]):
+    if not await verify_password_async(password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    now = datetime.now(timezone.utc)
-    payload = {
-        "jti": str(uuid.uuid4()),
-        "user_id": user["user_id"],
-        "email": user["email"],
-        "client_id": tenant["client_id"],
-        "site_id": tenant["site_id"],
-        "exp": now + timedelta(hours=JWT_EXPIRY_HOURS),
-        "iat": now,
-    }
-    token = jwt.encode(payload, get_jwt_secret(), algorithm="HS256")
+    if needs_rehash(user["password_hash"]):
+        background_tasks.add_task(
+            _upgrade_password_hash, user_id, password, user["password_hash"]
+        )
+    return user
+
+
+@router.post("/login")
+async def login(
+    body: LoginRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    tenant: dict = Depends(get_tenant),
+):
+    """Authenticate a user and return a signed JWT.
+
+    Checks the credentials with ``authenticate`` and starts a session
+    (``sessions.start``): an access token valid for
+    ``ACCESS_TOKEN_MINUTES`` with a unique JTI for revocation support,
+    and a refresh token for ``POST /auth/token/refresh``.  ``last_login``
+    goes on the write-behind queue, so it does not delay the response.
+
+    Args:
+        body: Validated login credentials (email and password).
+        request: The incoming request, used for the client IP.
+        background_tasks: Used to schedule the hash upgrade.
+        tenant: Tenant context resolved from the ``x-api-key`` header.
+
+    Returns:
+        A dict containing the access token, the refresh token and basic
+        user profile fields.
+
+    Raises:
+        HTTPException: 401 if the user does not exist or the password
+            is incorrect.  429 if the attempt limit is exceeded or the
+            password hashing queue is full.
+    """
+    user = await authenticate(tenant, body.email, body.password, request, background_tasks)
+
+    tokens = await sessions.start(user, tenant)
 
-    table.update_item(
-        Key={"user_id": user_id},
-        UpdateExpression="SET last_login = :t",
-        ExpressionAttributeValues={":t": now.isoformat()},
-    )
+    await record_login(user["user_id"], datetime.now(timezone.utc))
 
     return {
-        "token": token,
+        "token": tokens["token"],
+        "refresh_token": tokens["refresh_token"],
         "user": {
             "user_id": user["user_id"],
             "email": user["email"],
@@ -4,19 +4,23 @@ from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends
 
-from ..db import blacklist_table
+from ..aiodb import blacklist_table
+from . import revocation_filter, sessions, token_cache
 from .dependencies import get_current_user
 
 router = APIRouter()
 
 
 @router.post("/logout")
-def logout(user: dict = Depends(get_current_user)):
-    """Add the current JWT to the blacklist.
+async def logout(user: dict = Depends(get_current_user)):
+    """Add the current JWT to the blacklist and end its session.
 
     Writes the token's JTI to the ``TokenBlacklist`` table so that
     subsequent requests using the same token are rejected.  The TTL
     matches the token's original expiry so the record auto-deletes.
+    The local verified-token cache and revocation filter are updated so
+    this container rejects the token immediately.  If the token belongs
+    to a refresh-token family, the family is revoked too.
 
     Args:
         user: Decoded JWT payload injected by ``get_current_user``.
@@ -24,10 +28,35 @@ def logout(user: dict = Depends(get_current_user)):
     Returns:
         A confirmation message.
     """
+    now = datetime.now(timezone.utc)
     table = blacklist_table()
-    table.put_item(Item={
+    await table.put_item(Item={
         "token_jti": user["jti"],
         "ttl": user["exp"],
-        "blacklisted_at": datetime.now(timezone.utc).isoformat(),
+        "blacklisted_at": now.isoformat(),
+        "revoked_hour": revocation_filter.hour_bucket(now),
     })
+    token_cache.revoke_jti(user["jti"])
+    revocation_filter.add(user["jti"])
+    if user.get("fam"):
+        await sessions.revoke_family(user["user_id"], user["fam"])
     return {"message": "Logged out successfully"}
+
+
+@router.post("/logout/all")
+async def logout_all(user: dict = Depends(get_current_user)):
+    """End every session of the current user.
+
+    One write bumps the user's ``token_epoch`` and clears their
+    refresh-token families, so no refresh token issued before it can be
+    exchanged again.  Access tokens still in flight stay valid until
+    they expire, except on containers that have seen the new epoch.
+
+    Args:
+        user: Decoded JWT payload injected by ``get_current_user``.
+
+    Returns:
+        A confirmation message.
+    """
+    await sessions.revoke_all(user["user_id"])
+    return {"message": "Logged out of all sessions"}
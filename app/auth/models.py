@@ -40,3 +40,9 @@ class PasswordResetConfirm(BaseModel):
 
     token: str
     new_password: str = Field(min_length=8)
+
+
+class RefreshRequest(BaseModel):
+    """Payload for ``POST /auth/token/refresh`` with a refresh token."""
+
+    refresh_token: str
@@ -6,7 +6,8 @@ import base64
 import hashlib
 import hmac
 import secrets
-from typing import Tuple
+import time
+from typing import Optional, Tuple
 
 
 SCRYPT_N = 16384
@@ -15,6 +16,10 @@ SCRYPT_P = 1
 SCRYPT_SALT_BYTES = 16
 SCRYPT_DKLEN = 32
 
+ScryptParams = Tuple[int, int, int]
+
+_params: ScryptParams = (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
 
 def _encode_bytes(value: bytes) -> str:
     """Base64-encode raw bytes for storage."""
@@ -39,7 +44,116 @@ def _split_hash(value: str) -> Tuple[int, int, int, bytes, bytes]:
     return n, r, p, salt, digest
 
 
-def hash_password(password: str) -> str:
+def scrypt_memory(n: int, r: int, p: int) -> int:
+    """Return the bytes OpenSSL allocates for one scrypt derivation."""
+    return 128 * r * (n + p + 2)
+
+
+def _maxmem(n: int, r: int, p: int) -> int:
+    """``maxmem`` for ``hashlib.scrypt``; its 32 MiB default rejects N >= 2**15."""
+    return scrypt_memory(n, r, p) + 1024 * 1024
+
+
+def current_params() -> ScryptParams:
+    """Return the ``(N, r, p)`` used for new hashes."""
+    return _params
+
+
+def set_params(n: int, r: int, p: int) -> None:
+    """Set the ``(N, r, p)`` used for new hashes.
+
+    Args:
+        n: CPU/memory cost, a power of two greater than 1.
+        r: Block size.
+        p: Parallelization factor.
+
+    Raises:
+        ValueError: If ``n`` is not a power of two or any value is < 1.
+    """
+    global _params
+    if n < 2 or n & (n - 1) or r < 1 or p < 1:
+        raise ValueError("Invalid scrypt parameters")
+    _params = (n, r, p)
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """Return ``True`` if ``stored_hash`` was made with weaker parameters.
+
+    Only strict upgrades count: every one of the embedded ``(N, r, p)``
+    must be at most the current value and at least one lower.  A hash
+    made with stronger or differently shaped parameters is left alone, so
+    lowering the parameters never downgrades stored hashes.
+
+    Args:
+        stored_hash: The self-describing hash string from ``hash_password``.
+
+    Returns:
+        ``True`` when ``current_params()`` strictly dominate the embedded
+        parameters.  Unparseable hashes return ``False`` since they
+        cannot have been verified.
+    """
+    try:
+        stored = _split_hash(stored_hash)[:3]
+    except (ValueError, TypeError):
+        return False
+    return stored != _params and all(old <= new for old, new in zip(stored, _params))
+
+
+def _time_scrypt(n: int, r: int, p: int) -> float:
+    """Return the milliseconds one derivation takes with these parameters."""
+    start = time.perf_counter()
+    hashlib.scrypt(
+        b"calibration",
+        salt=b"\0" * SCRYPT_SALT_BYTES,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=_maxmem(n, r, p),
+        dklen=SCRYPT_DKLEN,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def calibrate(
+    target_ms: float,
+    max_memory_bytes: int,
+    r: int = SCRYPT_R,
+    p: int = SCRYPT_P,
+    min_n: int = SCRYPT_N,
+) -> ScryptParams:
+    """Pick the largest N that fits a latency target and memory ceiling.
+
+    scrypt time and memory both scale linearly with N, so one timed run
+    at ``min_n`` is enough to estimate the rest; the chosen N is timed
+    once more and halved if it overshoots.  The memory ceiling always
+    wins over ``min_n`` so concurrent verifies cannot exhaust a small
+    Lambda.
+
+    Args:
+        target_ms: Desired time for a single verify on this host.
+        max_memory_bytes: Upper bound for one derivation's memory.
+        r: Block size to keep fixed.
+        p: Parallelization factor to keep fixed.
+        min_n: Lowest N to choose unless the memory ceiling forces less.
+
+    Returns:
+        The calibrated ``(N, r, p)``.  Call ``set_params`` to apply it.
+    """
+    n_max = 2
+    while scrypt_memory(n_max * 2, r, p) <= max_memory_bytes:
+        n_max *= 2
+    floor = min(min_n, n_max)
+
+    base_ms = max(_time_scrypt(floor, r, p), 0.001)
+    n = floor
+    while n * 2 <= n_max and base_ms * (n * 2) / floor <= target_ms:
+        n *= 2
+    if n > floor and _time_scrypt(n, r, p) > target_ms * 1.5:
+        n //= 2
+    return n, r, p
+
+
+def hash_password(password: str, params: Optional[ScryptParams] = None) -> str:
     """Hash a password with scrypt and return a self-describing string.
 
     The output format is ``scrypt$N$r$p$salt$digest`` where salt and
@@ -48,25 +162,29 @@ def hash_password(password: str) -> str:
 
     Args:
         password: The plaintext password to hash.
+        params: ``(N, r, p)`` to use instead of ``current_params()``.
+            Passed explicitly when hashing in a worker process.
 
     Returns:
         A ``$``-delimited string encoding the scrypt parameters, salt,
         and derived key.
     """
+    n, r, p = params or _params
     salt = secrets.token_bytes(SCRYPT_SALT_BYTES)
     digest = hashlib.scrypt(
         password.encode("utf-8"),
         salt=salt,
-        n=SCRYPT_N,
-        r=SCRYPT_R,
-        p=SCRYPT_P,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=_maxmem(n, r, p),
         dklen=SCRYPT_DKLEN,
     )
     return "scrypt$" + "$".join(
         [
-            str(SCRYPT_N),
-            str(SCRYPT_R),
-            str(SCRYPT_P),
+            str(n),
+            str(r),
+            str(p),
             _encode_bytes(salt),
             _encode_bytes(digest),
         ]
@@ -98,6 +216,7 @@ def verify_password(password: str, stored_hash: str) -> bool:
         n=n,
         r=r,
         p=p,
+        maxmem=_maxmem(n, r, p),
         dklen=len(digest),
     )
     return hmac.compare_digest(candidate, digest)
@@ -1,30 +1,47 @@
 """Password reset request."""
 
+import asyncio
 import secrets
+import time
 from datetime import datetime, timedelta, timezone
 
-import boto3
 from fastapi import APIRouter, Depends
 
-from ..db import password_reset_table, users_table
+from .. import config, mail
+from ..aiodb import password_reset_table, users_table
+from . import reset_tokens
 from .dependencies import get_tenant
 from .models import PasswordResetRequest
+from .user_store import ensure_password_fingerprint
 
 router = APIRouter()
 
 GENERIC_RESPONSE = {"message": "If account exists, reset email sent"}
 
 
+async def _generic_response(started: float) -> dict:
+    """Return ``GENERIC_RESPONSE`` no sooner than ``PASSWORD_RESET_MIN_SECONDS``."""
+    remaining = config.PASSWORD_RESET_MIN_SECONDS - (time.monotonic() - started)
+    if remaining > 0:
+        await asyncio.sleep(remaining)
+    return GENERIC_RESPONSE
+
+
 @router.post("/password-reset")
-def password_reset(body: PasswordResetRequest, tenant: dict = Depends(get_tenant)):
+async def password_reset(body: PasswordResetRequest, tenant: dict = Depends(get_tenant)):
     """Generate a password reset token and send an email.
 
-    Creates a URL-safe reset token, stores it in the
-    ``PasswordResetTokens`` table with a one-hour TTL, and sends an
-    email via SES containing the reset link.
+    With ``RESET_TOKEN_MODE=table`` creates a URL-safe reset token and
+    stores it in the ``PasswordResetTokens`` table with a
+    ``RESET_TOKEN_TTL_SECONDS`` TTL.  With ``signed`` the token is signed
+    by ``reset_tokens.issue`` and nothing is stored.  Either way an email
+    containing the reset link is handed to ``app.mail.send_now`` (an SQS
+    message in production); the response does not wait for delivery.
 
     A generic response is returned regardless of whether the email
-    matches an existing user, to prevent user-enumeration attacks.
+    matches an existing user, to prevent user-enumeration attacks.  Every
+    path is padded to ``PASSWORD_RESET_MIN_SECONDS`` so the extra work
+    for a known email does not show in the response time either.
 
     Args:
         body: Validated payload containing the user's email address.
@@ -33,40 +50,47 @@ def password_reset(body: PasswordResetRequest, tenant: dict = Depends(get_tenant
     Returns:
         A generic acknowledgement message.
     """
+    started = time.monotonic()
     table = users_table()
-    reset_table = password_reset_table()
     email = body.email.lower()
     user_id = f"{tenant['client_id']}#{tenant['site_id']}#{email}"
 
     try:
-        result = table.get_item(Key={"user_id": user_id})
+        result = await table.get_item(Key={"user_id": user_id})
     except Exception:
-        return GENERIC_RESPONSE
+        return await _generic_response(started)
 
     if "Item" not in result:
-        return GENERIC_RESPONSE
-
-    reset_token = secrets.token_urlsafe(32)
-    expiry = datetime.now(timezone.utc) + timedelta(hours=1)
+        return await _generic_response(started)
 
-    reset_table.put_item(Item={
-        "reset_token": reset_token,
-        "user_id": user_id,
-        "ttl": int(expiry.timestamp()),
-        "used": False,
+    # Only known emails get this far; a failure here must look like any
+    # other response or it would reveal that the account exists.
+    try:
+        if config.RESET_TOKEN_MODE == "signed":
+            fingerprint = await ensure_password_fingerprint(result["Item"])
+            if fingerprint is None:
+                return await _generic_response(started)
+            reset_token = reset_tokens.issue(user_id, fingerprint)
+        else:
+            reset_token = secrets.token_urlsafe(32)
+            expiry = datetime.now(timezone.utc) + timedelta(seconds=config.RESET_TOKEN_TTL_SECONDS)
+            await password_reset_table().put_item(Item={
+                "reset_token": reset_token,
+                "user_id": user_id,
+                "ttl": int(expiry.timestamp()),
+                "used": False,
+            })
+    except Exception as exc:
+        print(f"Password reset for {user_id} failed: {exc!r}")
+        return await _generic_response(started)
+
+    reset_link = config.RESET_LINK_TEMPLATE.format(
+        site=tenant["site_id"].lower(), token=reset_token
+    )
+    await mail.send_now(email, "Password Reset Request", "password_reset", {
+        "email": email,
+        "reset_link": reset_link,
+        "expires_minutes": config.RESET_TOKEN_TTL_SECONDS // 60,
     })
 
-    """TODO: SES email setup and sending """
-    # reset_link = f"https://{tenant['site_id'].lower()}.com/reset-password?token={reset_token}"
-    # ses = boto3.client("ses")
-    # ses.send_email(
-    #     Source="noreply@yourservice.com",
-    #     Destination={"ToAddresses": [email]},
-    #     Message={
-    #         "Subject": {"Data": "Password Reset Request"},
-    #         "Body": {"Text": {"Data": f"Click here to reset: {reset_link}"}},
-    #     },
-    # )
-    print(f"Password reset token for {email}: {reset_token} (expires at {expiry.isoformat()})")
-
-    return GENERIC_RESPONSE
+    return await _generic_response(started)
@@ -4,60 +4,130 @@ from datetime import datetime, timezone
 
 from fastapi import APIRouter, HTTPException
 
-from ..db import password_reset_table, users_table
+from ..aiodb import ConditionalCheckFailed, password_reset_table, users_table
+from . import reset_tokens
+from .kdf import hash_password_async
 from .models import PasswordResetConfirm
-from .passwords import hash_password
+from .user_store import password_fingerprint
 
 router = APIRouter()
 
 
-@router.post("/password-reset/confirm")
-def password_reset_confirm(body: PasswordResetConfirm):
-    """Reset a password using a valid reset token.
+async def _claim_token(token: str) -> dict:
+    """Mark a reset token used if it is unused and unexpired.
 
-    Validates the token against the ``PasswordResetTokens`` table,
-    hashes the new password, and updates the user record.  The token
-    is marked as used to prevent replay.
-
-    Args:
-        body: Validated payload containing the reset token and new password.
+    The check and the ``used`` write are one conditional ``UpdateItem``,
+    so two concurrent confirmations cannot both redeem the same token.
 
     Returns:
-        A confirmation message on success.
+        The token record.
 
     Raises:
-        HTTPException: 400 if the token is invalid, expired, or already used.
+        HTTPException: 400 if the token is missing, used, or expired.
     """
-    reset_table = password_reset_table()
+    try:
+        result = await password_reset_table().update_item(
+            Key={"reset_token": token},
+            UpdateExpression="SET used = :t",
+            ConditionExpression=(
+                "attribute_exists(reset_token) AND used = :f AND #ttl > :now"
+            ),
+            ExpressionAttributeNames={"#ttl": "ttl"},
+            ExpressionAttributeValues={
+                ":t": True,
+                ":f": False,
+                ":now": int(datetime.now(timezone.utc).timestamp()),
+            },
+            ReturnValues="ALL_NEW",
+        )
+    except ConditionalCheckFailed:
+        raise HTTPException(status_code=400, detail="Invalid or expired token") from None
+    return result["Attributes"]
+
+
+async def _release_token(token: str) -> None:
+    """Undo ``_claim_token`` when the reset could not be completed."""
+    await password_reset_table().update_item(
+        Key={"reset_token": token},
+        UpdateExpression="SET used = :f",
+        ExpressionAttributeValues={":f": False},
+    )
+
+
+async def _confirm_signed(body: PasswordResetConfirm) -> None:
+    """Reset a password with a signed token in one conditional write.
 
-    result = reset_table.get_item(Key={"reset_token": body.token})
-    if "Item" not in result:
+    The signature and expiry are checked in memory.  The update requires
+    the user's ``password_fp`` to still match the token, and replaces it,
+    so the same token cannot be redeemed twice.
+
+    Raises:
+        HTTPException: 400 if the token is invalid, expired, or already used.
+            429 if the password hashing queue is full.
+    """
+    claims = reset_tokens.verify(body.token)
+    if claims is None:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    token_data = result["Item"]
+    password_hash = await hash_password_async(body.new_password)
+    try:
+        await users_table().update_item(
+            Key={"user_id": claims["user_id"]},
+            UpdateExpression="SET password_hash = :h, password_fp = :new_fp, updated_at = :u",
+            ConditionExpression="password_fp = :fp",
+            ExpressionAttributeValues={
+                ":h": password_hash,
+                ":new_fp": password_fingerprint(password_hash),
+                ":u": datetime.now(timezone.utc).isoformat(),
+                ":fp": claims["password_fp"],
+            },
+        )
+    except ConditionalCheckFailed:
+        raise HTTPException(status_code=400, detail="Invalid or expired token") from None
 
-    if token_data.get("used", False):
-        raise HTTPException(status_code=400, detail="Token already used")
 
-    if datetime.now(timezone.utc).timestamp() > token_data["ttl"]:
-        raise HTTPException(status_code=400, detail="Token expired")
+@router.post("/password-reset/confirm")
+async def password_reset_confirm(body: PasswordResetConfirm):
+    """Reset a password using a valid reset token.
 
-    table = users_table()
-    now = datetime.now(timezone.utc).isoformat()
+    Signed tokens (see ``reset_tokens``) are confirmed with a single
+    conditional write on the user.  Opaque tokens are claimed in the
+    ``PasswordResetTokens`` table first; claiming marks the token as
+    used, which prevents replay.
 
-    table.update_item(
-        Key={"user_id": token_data["user_id"]},
-        UpdateExpression="SET password_hash = :h, updated_at = :u",
-        ExpressionAttributeValues={
-            ":h": hash_password(body.new_password),
-            ":u": now,
-        },
-    )
+    Args:
+        body: Validated payload containing the reset token and new password.
 
-    reset_table.update_item(
-        Key={"reset_token": body.token},
-        UpdateExpression="SET used = :u",
-        ExpressionAttributeValues={":u": True},
-    )
+    Returns:
+        A confirmation message on success.
+
+    Raises:
+        HTTPException: 400 if the token is invalid, expired, or already used.
+            429 if the password hashing queue is full.
+    """
+    if reset_tokens.is_signed(body.token):
+        await _confirm_signed(body)
+        return {"message": "Password reset successful"}
+
+    token_data = await _claim_token(body.token)
+
+    try:
+        password_hash = await hash_password_async(body.new_password)
+        await users_table().update_item(
+            Key={"user_id": token_data["user_id"]},
+            UpdateExpression="SET password_hash = :h, password_fp = :fp, updated_at = :u",
+            ExpressionAttributeValues={
+                ":h": password_hash,
+                ":fp": password_fingerprint(password_hash),
+                ":u": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+    except Exception:
+        # The password is unchanged, so let the user retry the same link.
+        try:
+            await _release_token(body.token)
+        except Exception as exc:
+            print(f"Could not release reset token after a failed reset: {exc!r}")
+        raise
 
     return {"message": "Password reset successful"}
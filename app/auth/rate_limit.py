@@ -0,0 +1,147 @@
+"""Sliding-window login attempt limiter backed by the LoginAttempts table.
+
+Each login is counted against two identifiers, the tenant-scoped email
+and the tenant-scoped client IP, before any password hashing happens, so
+credential-stuffing traffic is rejected without paying for scrypt.
+
+Counts use the sliding-window-counter approximation: one counter per
+fixed window, with the previous window weighted by how much of it still
+overlaps the sliding window.  Both counters live on a single item per
+identifier, so a check is one ``UpdateItem`` (``ADD`` the current window,
+``REMOVE`` the stale one, return ``ALL_NEW``).  An in-memory copy of the
+last known counts lets a container reject an identifier that is already
+over its limit without another DynamoDB call.  If DynamoDB is unavailable
+the limiter fails open on the local counts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .. import config
+from ..aiodb import login_attempts_table
+
+_MAX_LOCAL_KEYS = 10000
+
+_lock = threading.Lock()
+# identifier -> (window index, previous window count, current window count)
+_local: Dict[str, Tuple[int, int, int]] = {}
+
+
+def _estimate(previous: int, current: int, now: float, window: float) -> float:
+    """Weighted request count over the sliding window ending at ``now``."""
+    elapsed = (now % window) / window
+    return previous * (1 - elapsed) + current
+
+
+def _retry_after(now: float, window: float) -> int:
+    return max(1, math.ceil(window - now % window))
+
+
+def _local_counts(key: str, index: int) -> Tuple[int, int]:
+    """Return the cached ``(previous, current)`` counts for ``index``."""
+    entry = _local.get(key)
+    if entry is None:
+        return 0, 0
+    cached_index, previous, current = entry
+    if cached_index == index:
+        return previous, current
+    if cached_index == index - 1:
+        return current, 0
+    return 0, 0
+
+
+def _remember(key: str, index: int, previous: int, current: int) -> None:
+    with _lock:
+        if len(_local) >= _MAX_LOCAL_KEYS and key not in _local:
+            _local.clear()
+        _local[key] = (index, previous, current)
+
+
+async def _record_remote(key: str, index: int, window: float) -> Tuple[int, int]:
+    """Atomically count one attempt in DynamoDB and return both windows."""
+    current_attr = f"w{index}"
+    previous_attr = f"w{index - 1}"
+    response = await login_attempts_table().update_item(
+        Key={"identifier": key},
+        UpdateExpression="ADD #cur :one SET #ttl = :ttl REMOVE #stale",
+        ExpressionAttributeNames={
+            "#cur": current_attr,
+            "#ttl": "ttl",
+            "#stale": f"w{index - 2}",
+        },
+        ExpressionAttributeValues={
+            ":one": 1,
+            ":ttl": int((index + 2) * window),
+        },
+        ReturnValues="ALL_NEW",
+    )
+    attributes = response.get("Attributes", {})
+    return int(attributes.get(previous_attr, 0)), int(attributes.get(current_attr, 1))
+
+
+async def _check(key: str, limit: int, now: float, window: float) -> Optional[int]:
+    """Count an attempt for ``key``; return a retry delay if over ``limit``."""
+    index = int(now // window)
+    previous, current = _local_counts(key, index)
+    if _estimate(previous, current, now, window) >= limit:
+        _remember(key, index, previous, current + 1)
+        return _retry_after(now, window)
+
+    try:
+        previous, current = await _record_remote(key, index, window)
+    except Exception as exc:
+        print(f"Login rate limiter falling back to local counts: {exc!r}")
+        current += 1
+    _remember(key, index, previous, current)
+
+    if _estimate(previous, current, now, window) > limit:
+        return _retry_after(now, window)
+    return None
+
+
+async def check_login_attempt(tenant: dict, email: str, client_ip: Optional[str]) -> None:
+    """Count a login attempt and reject it if any identifier is over limit.
+
+    Must be called before the password is verified.
+
+    Args:
+        tenant: Tenant context resolved from the ``x-api-key`` header.
+        email: Lower-cased email address from the login body.
+        client_ip: Source IP of the request, if known.
+
+    Raises:
+        HTTPException: 429 with ``Retry-After`` when the email or IP has
+            exceeded its attempts for the current window.
+    """
+    if not config.LOGIN_RATE_LIMIT_ENABLED:
+        return
+
+    scope = f"{tenant['client_id']}#{tenant['site_id']}"
+    window = config.LOGIN_RATE_WINDOW_SECONDS
+    now = time.time()
+    checks = [_check(f"email#{scope}#{email}", config.LOGIN_RATE_LIMIT_PER_EMAIL, now, window)]
+    if client_ip:
+        checks.append(
+            _check(f"ip#{scope}#{client_ip}", config.LOGIN_RATE_LIMIT_PER_IP, now, window)
+        )
+
+    delays = [delay for delay in await asyncio.gather(*checks) if delay is not None]
+    if delays:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts, please retry later",
+            headers={"Retry-After": str(max(delays))},
+        )
+
+
+def reset() -> None:
+    """Forget all locally cached counts."""
+    with _lock:
+        _local.clear()
@@ -4,21 +4,22 @@ from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException
 
-from ..db import users_table
 from .dependencies import get_tenant
+from .kdf import hash_password_async
 from .models import RegisterRequest
-from .passwords import hash_password
+from .user_store import UserExistsError, create_user, password_fingerprint
 
 router = APIRouter()
 
 
 @router.post("/register", status_code=201)
-def register(body: RegisterRequest, tenant: dict = Depends(get_tenant)):
+async def register(body: RegisterRequest, tenant: dict = Depends(get_tenant)):
     """Register a new user in the tenant-scoped Users table.
 
     Builds a composite ``user_id`` from the tenant's client/site IDs and the
-    email address, then writes the record to DynamoDB.  Duplicate emails
-    within the same tenant are rejected.
+    email address, then writes the record to DynamoDB in a single
+    conditional put.  Duplicate emails within the same tenant are
+    rejected atomically.
 
     Args:
         body: Validated registration payload (email, password, optional name).
@@ -29,27 +30,30 @@ def register(body: RegisterRequest, tenant: dict = Depends(get_tenant)):
 
     Raises:
         HTTPException: 409 if a user with the same tenant-scoped email
-            already exists.
+            already exists.  429 if the password hashing queue is full.
     """
-    table = users_table()
     email = body.email.lower()
     user_id = f"{tenant['client_id']}#{tenant['site_id']}#{email}"
 
-    existing = table.get_item(Key={"user_id": user_id})
-    if "Item" in existing:
-        raise HTTPException(status_code=409, detail="User already exists")
-
+    password_hash = await hash_password_async(body.password)
     now = datetime.now(timezone.utc).isoformat()
-    table.put_item(Item={
+    item = {
         "user_id": user_id,
         "email": email,
-        "password_hash": hash_password(body.password),
+        "password_hash": password_hash,
+        "password_fp": password_fingerprint(password_hash),
+        "refresh_families": {},
+        "token_epoch": 0,
         "name": body.name,
         "client_id": tenant["client_id"],
         "site_id": tenant["site_id"],
         "created_at": now,
         "updated_at": now,
-    })
+    }
+    try:
+        await create_user(item)
+    except UserExistsError:
+        raise HTTPException(status_code=409, detail="User already exists")
 
     return {
         "message": "Registration successful",
@@ -0,0 +1,247 @@
+"""Bloom filter of revoked JTIs kept by each warm container.
+
+Almost no token presented to ``get_current_user`` has been revoked, yet
+each one used to cost a ``TokenBlacklist`` point read.  This module keeps
+a compact Bloom filter of the JTIs currently in the blacklist table so the
+common case (definitely not revoked) needs no I/O.  A positive answer may
+be a false positive and must be confirmed with the authoritative
+``get_item``.
+
+The filter is built from a projected scan of the blacklist table.  It
+is kept current by ``add`` calls from ``logout`` on this container, and
+every ``REVOCATION_FILTER_REFRESH_SECONDS`` by a sync of entries written
+since the last one.  Logout stamps each entry with the hour it was
+written (``revoked_hour``), so a sync is a ``Query`` per hour on the
+``revoked-hour-index`` GSI that reads only the new entries, not a scan.
+Bloom filters cannot delete, so the whole filter is rebuilt every
+``REVOCATION_FILTER_REBUILD_SECONDS`` to drop expired entries; that is
+the only scan.
+
+Syncs and rebuilds run as background tasks, so requests never wait for
+them: a request that finds the filter due for a refresh starts one and
+answers from the current filter.  A filter not refreshed within
+``REVOCATION_FILTER_MAX_STALENESS_SECONDS`` (or none at all, as on a cold
+container) is not used, and checks fall back to DynamoDB.  If a refresh
+fails the filter is dropped and checks fall back until the next one
+succeeds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from .. import config
+from ..aiodb import blacklist_table
+
+HOUR_INDEX = "revoked-hour-index"
+
+# Overlap applied to incremental syncs to absorb clock skew between
+# containers and the gap between stamping ``blacklisted_at`` and the write.
+_SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing.
+
+    Args:
+        capacity: Expected number of items.
+        error_rate: Target false-positive rate at ``capacity`` items.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.size = max(bits, 64)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: str) -> None:
+        """Insert ``value`` into the filter."""
+        if value in self:
+            return
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+_lock = threading.Lock()
+_filter: Optional[BloomFilter] = None
+_built_at = 0.0
+_refreshed_at = 0.0
+_synced_since: Optional[datetime] = None
+_refreshing = False
+_task: Optional[asyncio.Task] = None
+
+
+def hour_bucket(when: datetime) -> str:
+    """Return the ``revoked_hour`` value for an entry written at ``when``."""
+    return when.astimezone(timezone.utc).strftime("%Y-%m-%dT%H")
+
+
+async def _scan_jtis() -> List[str]:
+    """Return every unexpired JTI in the blacklist table."""
+    table = blacklist_table()
+    kwargs = {
+        "ProjectionExpression": "token_jti",
+        "FilterExpression": "#ttl > :now",
+        "ExpressionAttributeNames": {"#ttl": "ttl"},
+        "ExpressionAttributeValues": {":now": int(time.time())},
+    }
+    jtis = []
+    while True:
+        response = await table.scan(**kwargs)
+        jtis.extend(item["token_jti"] for item in response.get("Items", []))
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return jtis
+        kwargs["ExclusiveStartKey"] = last_key
+
+
+async def _query_jtis(since: datetime) -> List[str]:
+    """Return the JTIs blacklisted at or after ``since``, hour by hour."""
+    table = blacklist_table()
+    hour = since.replace(minute=0, second=0, microsecond=0)
+    now = datetime.now(timezone.utc)
+    jtis = []
+    while hour <= now:
+        kwargs = {
+            "IndexName": HOUR_INDEX,
+            "KeyConditionExpression": "revoked_hour = :hour AND blacklisted_at >= :since",
+            "ExpressionAttributeValues": {
+                ":hour": hour_bucket(hour),
+                ":since": since.isoformat(),
+            },
+        }
+        while True:
+            response = await table.query(**kwargs)
+            jtis.extend(item["token_jti"] for item in response.get("Items", []))
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                break
+            kwargs["ExclusiveStartKey"] = last_key
+        hour += timedelta(hours=1)
+    return jtis
+
+
+async def _refresh(rebuild: bool, since: Optional[datetime]) -> None:
+    """Sync or rebuild the filter; runs as a background task."""
+    global _filter, _built_at, _refreshed_at, _synced_since
+    started = datetime.now(timezone.utc)
+    now = time.monotonic()
+    try:
+        jtis = await (_scan_jtis() if rebuild else _query_jtis(since))
+        with _lock:
+            if rebuild:
+                capacity = max(config.REVOCATION_FILTER_CAPACITY, len(jtis) * 2)
+                bloom = BloomFilter(capacity, config.REVOCATION_FILTER_ERROR_RATE)
+                _built_at = now
+            else:
+                bloom = _filter
+            if bloom is not None:
+                for jti in jtis:
+                    bloom.add(jti)
+                _filter = bloom
+                _refreshed_at = now
+                _synced_since = started - _SYNC_OVERLAP
+    except Exception as exc:
+        print(f"Revocation filter refresh failed, using DynamoDB: {exc!r}")
+        with _lock:
+            _filter = None
+
+
+def _refresh_done(task: asyncio.Task) -> None:
+    # A done callback rather than ``finally``: it also runs when the task
+    # is cancelled before it starts.
+    global _refreshing
+    with _lock:
+        _refreshing = False
+
+
+def _schedule_refresh(now: float) -> None:
+    """Start a background sync or rebuild if one is due and none is running."""
+    global _refreshing, _task
+    with _lock:
+        if _refreshing:
+            return
+        if _filter is not None and now - _refreshed_at < config.REVOCATION_FILTER_REFRESH_SECONDS:
+            return
+        rebuild = (
+            _filter is None
+            or _synced_since is None
+            or now - _built_at >= config.REVOCATION_FILTER_REBUILD_SECONDS
+            or _filter.count > _filter.capacity
+        )
+        since = None if rebuild else _synced_since
+        _refreshing = True
+    try:
+        _task = asyncio.get_running_loop().create_task(_refresh(rebuild, since))
+    except RuntimeError:
+        with _lock:
+            _refreshing = False
+        return
+    _task.add_done_callback(_refresh_done)
+
+
+async def might_be_revoked(jti: str) -> bool:
+    """Return ``False`` only if ``jti`` is definitely not blacklisted.
+
+    Never waits for DynamoDB: a due refresh is started in the background
+    and the check is answered from the current filter.
+
+    Args:
+        jti: The token's ``jti`` claim.
+
+    Returns:
+        ``False`` when the filter proves the JTI is absent, ``True`` when
+        it may be present or the filter is disabled, missing or too stale.
+        A ``True`` result must be confirmed against the blacklist table.
+    """
+    if not config.REVOCATION_FILTER_ENABLED:
+        return True
+    now = time.monotonic()
+    _schedule_refresh(now)
+    with _lock:
+        bloom = _filter
+        usable = (
+            bloom is not None
+            and now - _refreshed_at < config.REVOCATION_FILTER_MAX_STALENESS_SECONDS
+        )
+    return not usable or jti in bloom
+
+
+def add(jti: str) -> None:
+    """Record a revocation made on this container.
+
+    Args:
+        jti: The ``jti`` just written to the blacklist table.
+    """
+    with _lock:
+        if _filter is not None:
+            _filter.add(jti)
+
+
+def reset() -> None:
+    """Discard the filter so the next check rebuilds it."""
+    global _filter, _built_at, _refreshed_at, _synced_since
+    with _lock:
+        _filter = None
+        _built_at = _refreshed_at = 0.0
+        _synced_since = None
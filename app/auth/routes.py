@@ -2,6 +2,9 @@
 
 from fastapi import APIRouter
 
+from .. import keyring
+from . import kdf
+from .jwks import router as jwks_router
 from .login import router as login_router
 from .logout import router as logout_router
 from .pw_reset import router as pw_reset_router
@@ -16,3 +19,10 @@ router.include_router(register_router)
 router.include_router(pw_reset_router)
 router.include_router(pw_reset_confirm_router)
 router.include_router(token_refresh_router)
+router.include_router(jwks_router)
+
+# Apply the pinned scrypt parameters and load the JWT keys while the router
+# is imported rather than inside the first login request.  Routes that do
+# not mount this router never pay for either.
+kdf.configure()
+keyring.prefetch()
@@ -0,0 +1,296 @@
+"""Access/refresh token pairs with rotation and reuse detection.
+
+Login issues a short-lived access token (``ACCESS_TOKEN_MINUTES``) and a
+long-lived refresh token (``REFRESH_TOKEN_DAYS``).  Each login starts a
+refresh-token *family*.  The user's record keeps one small entry per
+family, ``refresh_families[<family>] = <generation>``, plus an integer
+``token_epoch``.  Both tokens carry the family, and the refresh token
+also carries its generation and the epoch it was issued under.
+
+Refreshing is one conditional ``UpdateItem`` that bumps the family's
+generation only if the presented generation and epoch are still
+current, so a refresh needs no read:
+
+* A stale generation means the refresh token was used twice, e.g. it
+  was stolen and both parties refreshed.  The whole family is revoked
+  and both parties must log in again.
+* A stale epoch means every session was revoked.  ``revoke_all`` does
+  that with a single write that increments ``token_epoch`` and clears
+  the families.
+
+Epochs only grow, so each container caches the latest one it has seen
+per user.  Refresh tokens, and access tokens carrying an ``ep`` claim,
+from an older epoch are then rejected without I/O.  Other containers
+reject the refresh tokens at their next refresh, and the access tokens
+expire on their own.
+
+Every token we sign carries a ``typ`` claim: ``"access"`` here,
+``"refresh"`` on refresh tokens and ``"session"`` on admin cookies
+(``cookie_session``).  They are signed with the same key, so the claim is
+what keeps one from being used as another, here and at services that
+verify through the JWKS.  Access tokens issued before the claim existed
+have none and are accepted as access tokens until they expire.
+
+Family IDs start with their creation time in hex, so sorting them by ID
+puts the oldest first.  Logging in with ``REFRESH_FAMILIES_MAX`` families
+already stored drops the oldest.
+"""
+
+from __future__ import annotations
+
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import jwt
+
+from .. import config, keyring
+from ..aiodb import ConditionalCheckFailed, users_table
+
+ACCESS_TYPE = "access"
+REFRESH_TYPE = "refresh"
+
+_lock = threading.Lock()
+_epochs: "OrderedDict[str, int]" = OrderedDict()
+
+
+class RefreshError(Exception):
+    """Raised when a refresh token cannot be exchanged."""
+
+
+# ---------------------------------------------------------------------------
+# Epoch cache
+# ---------------------------------------------------------------------------
+
+
+def known_epoch(user_id: str) -> Optional[int]:
+    """Return the newest ``token_epoch`` this container has seen for a user."""
+    with _lock:
+        return _epochs.get(user_id)
+
+
+def remember_epoch(user_id: str, epoch: int) -> None:
+    """Record ``epoch`` for ``user_id`` if it is newer than the cached one."""
+    if config.TOKEN_EPOCH_CACHE_MAX_ENTRIES <= 0:
+        return
+    with _lock:
+        if _epochs.get(user_id, -1) < epoch:
+            _epochs[user_id] = epoch
+        _epochs.move_to_end(user_id)
+        while len(_epochs) > config.TOKEN_EPOCH_CACHE_MAX_ENTRIES:
+            _epochs.popitem(last=False)
+
+
+def token_type(payload: dict) -> str:
+    """Return the ``typ`` of a verified payload; untyped tokens are access tokens."""
+    return payload.get("typ", ACCESS_TYPE)
+
+
+def is_stale(payload: dict) -> bool:
+    """Return ``True`` if ``payload`` predates the user's cached epoch."""
+    epoch = payload.get("ep")
+    if epoch is None:
+        return False
+    current = known_epoch(payload.get("user_id", ""))
+    return current is not None and epoch < current
+
+
+# ---------------------------------------------------------------------------
+# Issuing
+# ---------------------------------------------------------------------------
+
+
+def _new_family() -> str:
+    return f"{int(time.time()):08x}{secrets.token_hex(4)}"
+
+
+def _sign(user: dict, family: str, generation: int, epoch: int) -> Dict[str, str]:
+    now = datetime.now(timezone.utc)
+    access = {
+        "typ": ACCESS_TYPE,
+        "jti": str(uuid.uuid4()),
+        "user_id": user["user_id"],
+        "email": user["email"],
+        "client_id": user.get("client_id"),
+        "site_id": user.get("site_id"),
+        "fam": family,
+        "ep": epoch,
+        "exp": now + timedelta(minutes=config.ACCESS_TOKEN_MINUTES),
+        "iat": now,
+    }
+    refresh = {
+        "typ": REFRESH_TYPE,
+        "jti": str(uuid.uuid4()),
+        "user_id": user["user_id"],
+        "email": user["email"],
+        "client_id": user.get("client_id"),
+        "site_id": user.get("site_id"),
+        "fam": family,
+        "gen": generation,
+        "ep": epoch,
+        "exp": now + timedelta(days=config.REFRESH_TOKEN_DAYS),
+        "iat": now,
+    }
+    return {"token": keyring.encode(access), "refresh_token": keyring.encode(refresh)}
+
+
+async def _add_family(user: dict, family: str) -> None:
+    """Store generation 0 of ``family`` on the user, pruning old families.
+
+    Raises:
+        ConditionalCheckFailed: If ``refresh_families`` was created or
+            removed since ``user`` was read.
+    """
+    families = user.get("refresh_families")
+    params: Dict = {
+        "ExpressionAttributeValues": {":zero": 0},
+    }
+    epoch_clause = "token_epoch = if_not_exists(token_epoch, :zero)"
+    if families is None:
+        params["UpdateExpression"] = f"SET refresh_families = :fams, {epoch_clause}"
+        params["ConditionExpression"] = "attribute_not_exists(refresh_families)"
+        params["ExpressionAttributeValues"][":fams"] = {family: 0}
+    else:
+        names = {"#f": family}
+        expression = f"SET refresh_families.#f = :zero, {epoch_clause}"
+        excess = len(families) - config.REFRESH_FAMILIES_MAX + 1
+        oldest = sorted(families)[:max(excess, 0)]
+        if oldest:
+            names.update({f"#o{i}": old for i, old in enumerate(oldest)})
+            expression += " REMOVE " + ", ".join(
+                f"refresh_families.#o{i}" for i in range(len(oldest))
+            )
+        params["UpdateExpression"] = expression
+        params["ConditionExpression"] = "attribute_exists(refresh_families)"
+        params["ExpressionAttributeNames"] = names
+    await users_table().update_item(Key={"user_id": user["user_id"]}, **params)
+
+
+async def start(user: dict, tenant: dict) -> Dict[str, str]:
+    """Start a refresh-token family for a user who just logged in.
+
+    Args:
+        user: The full user item, as read for the login.
+        tenant: Tenant context; its IDs go into the token claims.
+
+    Returns:
+        ``{"token": <access token>, "refresh_token": <refresh token>}``.
+    """
+    family = _new_family()
+    try:
+        await _add_family(user, family)
+    except ConditionalCheckFailed:
+        # A concurrent login created the map (or a revoke cleared it)
+        # after ``user`` was read; retry once against the current record.
+        result = await users_table().get_item(Key={"user_id": user["user_id"]})
+        user = result.get("Item") or user
+        await _add_family(user, family)
+
+    epoch = int(user.get("token_epoch", 0))
+    remember_epoch(user["user_id"], epoch)
+    claims = dict(user, client_id=tenant["client_id"], site_id=tenant["site_id"])
+    return _sign(claims, family, 0, epoch)
+
+
+# ---------------------------------------------------------------------------
+# Rotation and revocation
+# ---------------------------------------------------------------------------
+
+
+async def rotate(refresh_token: str) -> Dict[str, str]:
+    """Exchange a refresh token for a new access/refresh pair.
+
+    Args:
+        refresh_token: A refresh token from ``start`` or ``rotate``.
+
+    Returns:
+        ``{"token": ..., "refresh_token": ...}``.
+
+    Raises:
+        RefreshError: If the token is invalid, expired, from a revoked
+            epoch or family, or has already been used (in which case the
+            family is revoked).
+    """
+    try:
+        claims = await keyring.decode(refresh_token)
+    except jwt.InvalidTokenError:
+        raise RefreshError("Invalid refresh token") from None
+    if claims.get("typ") != REFRESH_TYPE:
+        raise RefreshError("Invalid refresh token")
+    if is_stale(claims):
+        raise RefreshError("Session revoked")
+
+    user_id, family = claims["user_id"], claims["fam"]
+    generation, epoch = int(claims["gen"]), int(claims["ep"])
+    try:
+        await users_table().update_item(
+            Key={"user_id": user_id},
+            UpdateExpression="SET refresh_families.#f = :next",
+            ConditionExpression="refresh_families.#f = :gen AND token_epoch = :ep",
+            ExpressionAttributeNames={"#f": family},
+            ExpressionAttributeValues={":next": generation + 1, ":gen": generation, ":ep": epoch},
+        )
+    except ConditionalCheckFailed:
+        await _diagnose(user_id, family, generation)
+        raise RefreshError("Session revoked") from None
+
+    remember_epoch(user_id, epoch)
+    return _sign(claims, family, generation + 1, epoch)
+
+
+async def _diagnose(user_id: str, family: str, generation: int) -> None:
+    """After a failed rotation, revoke the family if the token was reused."""
+    result = await users_table().get_item(
+        Key={"user_id": user_id},
+        ProjectionExpression="token_epoch, refresh_families.#f",
+        ExpressionAttributeNames={"#f": family},
+    )
+    item = result.get("Item")
+    if item is None:
+        return
+    remember_epoch(user_id, int(item.get("token_epoch", 0)))
+    current = item.get("refresh_families", {}).get(family)
+    if current is not None and int(current) > generation:
+        print(f"Refresh token reuse detected for {user_id}, revoking family {family}")
+        await revoke_family(user_id, family)
+
+
+async def revoke_family(user_id: str, family: str) -> None:
+    """Invalidate every refresh token of one family (one login session)."""
+    try:
+        await users_table().update_item(
+            Key={"user_id": user_id},
+            UpdateExpression="REMOVE refresh_families.#f",
+            ConditionExpression="attribute_exists(user_id)",
+            ExpressionAttributeNames={"#f": family},
+        )
+    except ConditionalCheckFailed:
+        pass
+
+
+async def revoke_all(user_id: str) -> int:
+    """Invalidate every refresh token of a user with one write.
+
+    Returns:
+        The new ``token_epoch``.
+    """
+    result = await users_table().update_item(
+        Key={"user_id": user_id},
+        UpdateExpression="SET refresh_families = :empty ADD token_epoch :one",
+        ConditionExpression="attribute_exists(user_id)",
+        ExpressionAttributeValues={":empty": {}, ":one": 1},
+        ReturnValues="UPDATED_NEW",
+    )
+    epoch = int(result["Attributes"]["token_epoch"])
+    remember_epoch(user_id, epoch)
+    return epoch
+
+
+def reset() -> None:
+    """Forget the cached epochs."""
+    with _lock:
+        _epochs.clear()
@@ -0,0 +1,142 @@
+"""In-process cache of verified JWTs for ``get_current_user``.
+
+A warm container often sees the same bearer token many times in a row
+(SPA clients polling ``/user/user``, admin pages).  This module keeps a
+bounded LRU of tokens that already passed signature verification, keyed
+by a SHA-256 digest of the raw token so the token itself is never held
+as a dict key.  Each entry stores the decoded payload until the token's
+``exp`` and the blacklist verdict for a much shorter window, so a
+revocation written by another container is picked up within
+``TOKEN_CACHE_REVOCATION_TTL_SECONDS``.  Payloads are copied on the way in
+and out, so a caller that modifies its payload does not change what later
+requests see.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .. import config
+
+_lock = threading.Lock()
+_entries: "OrderedDict[bytes, _Entry]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "revocation_checks": 0, "evictions": 0}
+
+
+class _Entry:
+    """A verified token's payload and its cached blacklist verdict."""
+
+    __slots__ = ("payload", "expires_at", "revoked", "checked_until")
+
+    def __init__(self, payload: dict, expires_at: float):
+        self.payload = payload
+        self.expires_at = expires_at
+        self.revoked = False
+        self.checked_until = 0.0
+
+
+def token_digest(token: str) -> bytes:
+    """Return the cache key for a raw token string."""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def get(digest: bytes) -> Optional[dict]:
+    """Return the cached payload for a verified token, if still valid.
+
+    Args:
+        digest: Key produced by ``token_digest``.
+
+    Returns:
+        A copy of the decoded payload, or ``None`` on a miss or if the
+        cached entry has passed the token's ``exp``.
+    """
+    now = time.time()
+    with _lock:
+        entry = _entries.get(digest)
+        if entry is None or entry.expires_at <= now:
+            if entry is not None:
+                del _entries[digest]
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(digest)
+        _stats["hits"] += 1
+        return dict(entry.payload)
+
+
+def put(digest: bytes, payload: dict) -> None:
+    """Store a verified payload until the token's ``exp``.
+
+    Args:
+        digest: Key produced by ``token_digest``.
+        payload: The decoded, signature-verified JWT payload.
+    """
+    if config.TOKEN_CACHE_MAX_ENTRIES <= 0:
+        return
+    expires_at = float(payload.get("exp", 0))
+    if expires_at <= time.time():
+        return
+    with _lock:
+        _entries[digest] = _Entry(dict(payload), expires_at)
+        _entries.move_to_end(digest)
+        while len(_entries) > config.TOKEN_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def revocation_verdict(digest: bytes) -> Optional[bool]:
+    """Return the cached blacklist verdict, or ``None`` if it must be re-checked."""
+    now = time.time()
+    with _lock:
+        entry = _entries.get(digest)
+        if entry is None or entry.checked_until <= now:
+            _stats["revocation_checks"] += 1
+            return None
+        return entry.revoked
+
+
+def record_revocation_verdict(digest: bytes, revoked: bool) -> None:
+    """Cache the result of a blacklist lookup for a short window.
+
+    A positive verdict is kept until the token expires since revocation
+    cannot be undone.
+    """
+    with _lock:
+        entry = _entries.get(digest)
+        if entry is None:
+            return
+        entry.revoked = revoked
+        if revoked:
+            entry.checked_until = entry.expires_at
+        else:
+            entry.checked_until = time.time() + config.TOKEN_CACHE_REVOCATION_TTL_SECONDS
+
+
+def revoke_jti(jti: str) -> None:
+    """Mark every cached token with ``jti`` as revoked.
+
+    Called by ``logout`` so the revoking container rejects the token
+    immediately instead of after the verdict window.
+    """
+    with _lock:
+        for entry in _entries.values():
+            if entry.payload.get("jti") == jti:
+                entry.revoked = True
+                entry.checked_until = entry.expires_at
+
+
+def stats() -> Dict[str, int]:
+    """Return hit/miss counters and the current entry count."""
+    with _lock:
+        return dict(_stats, size=len(_entries))
+
+
+def clear() -> None:
+    """Drop all entries and reset the counters."""
+    with _lock:
+        _entries.clear()
+        for key in _stats:
+            _stats[key] = 0
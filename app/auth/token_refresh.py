@@ -2,48 +2,75 @@
 
 import uuid
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 import jwt
 from fastapi import APIRouter, Header, HTTPException
 
-from ..config import JWT_EXPIRY_HOURS, REFRESH_THRESHOLD_HOURS, get_jwt_secret
-from ..db import users_table
+from .. import keyring
+from ..config import ACCESS_TOKEN_MINUTES, REFRESH_THRESHOLD_HOURS
+from ..aiodb import users_table
+from . import sessions, token_cache
+from .dependencies import check_not_revoked
+from .models import RefreshRequest
 
 router = APIRouter()
 
 
 @router.post("/token/refresh")
-def refresh_token(authorization: str = Header()):
-    """Issue a new JWT when the current one is within the refresh window.
-
-    Accepts tokens that are still valid but close to expiring.
-    Rejects tokens that are already expired or still far from expiry.
-    The refresh window is defined by ``REFRESH_THRESHOLD_HOURS`` in
-    ``app.config``.
+async def refresh_token(
+    body: Optional[RefreshRequest] = None,
+    authorization: Optional[str] = Header(None),
+):
+    """Exchange a refresh token, or renew a bearer token near expiry.
+
+    With a ``refresh_token`` in the body, the token is rotated by
+    ``sessions.rotate``: the response carries a new access token and a
+    new refresh token, and the presented one stops working.  Presenting
+    an already-rotated refresh token revokes its whole session.
+
+    Without a body this is the legacy flow: the bearer token from the
+    ``Authorization`` header is renewed if it is still valid but within
+    ``REFRESH_THRESHOLD_HOURS`` of expiry, and is not blacklisted, from
+    before the user's last ``/auth/logout/all`` (``token_epoch``), or from
+    a logged-out session.  The new token lasts ``ACCESS_TOKEN_MINUTES`` and
+    keeps the old one's ``ep`` and ``fam``, so it can be revoked the same
+    way.
 
     Args:
-        authorization: Raw ``Authorization`` header value (``Bearer <token>``).
+        body: Optional payload with the refresh token.
+        authorization: Raw ``Authorization`` header value (``Bearer <token>``),
+            used by the legacy flow.
 
     Returns:
-        A dict containing the newly signed JWT.
+        A dict with the new ``token`` (and ``refresh_token`` when one was
+        presented).
 
     Raises:
-        HTTPException: 401 if the token is missing, invalid, or already
-            expired.  400 if the token is still far from expiry.  403 if
-            the user no longer exists.
+        HTTPException: 401 if the token is missing, invalid, revoked, or
+            already expired.  400 if a bearer token is still far from
+            expiry.  403 if the user no longer exists.
     """
-    if not authorization.startswith("Bearer "):
+    if body is not None:
+        try:
+            return await sessions.rotate(body.refresh_token)
+        except sessions.RefreshError as exc:
+            raise HTTPException(status_code=401, detail=str(exc)) from None
+
+    if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="No token provided")
 
     token = authorization.split(" ", 1)[1]
-    secret = get_jwt_secret()
 
     try:
-        payload = jwt.decode(
-            token, secret, algorithms=["HS256"], options={"verify_exp": False}
-        )
+        payload = await keyring.decode(token, options={"verify_exp": False})
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if sessions.token_type(payload) != sessions.ACCESS_TYPE:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if sessions.is_stale(payload):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    await check_not_revoked(token_cache.token_digest(token), payload)
 
     exp = datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
     now = datetime.now(timezone.utc)
@@ -56,18 +83,31 @@ def refresh_token(authorization: str = Header()):
         raise HTTPException(status_code=400, detail="Token still valid, refresh not needed")
 
     table = users_table()
-    result = table.get_item(Key={"user_id": payload["user_id"]})
+    result = await table.get_item(Key={"user_id": payload["user_id"]})
     if "Item" not in result:
         raise HTTPException(status_code=403, detail="User no longer exists")
 
+    item = result["Item"]
+    epoch = int(item.get("token_epoch", 0))
+    sessions.remember_epoch(payload["user_id"], epoch)
+    if int(payload.get("ep", 0)) < epoch:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    family = payload.get("fam")
+    if family is not None and family not in item.get("refresh_families", {}):
+        raise HTTPException(status_code=401, detail="Token revoked")
+
     new_payload = {
+        "typ": sessions.ACCESS_TYPE,
         "jti": str(uuid.uuid4()),
         "user_id": payload["user_id"],
         "email": payload["email"],
         "client_id": payload.get("client_id"),
         "site_id": payload.get("site_id"),
-        "exp": now + timedelta(hours=JWT_EXPIRY_HOURS),
+        "ep": epoch,
+        "exp": now + timedelta(minutes=ACCESS_TOKEN_MINUTES),
         "iat": now,
     }
+    if family is not None:
+        new_payload["fam"] = family
 
-    return {"token": jwt.encode(new_payload, secret, algorithm="HS256")}
+    return {"token": keyring.encode(new_payload)}
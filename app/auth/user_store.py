@@ -0,0 +1,192 @@
+"""User record access for the auth routes.
+
+Wraps the Users table so the hot write paths use as few round trips as
+possible:
+
+* ``create_user`` is a single conditional ``PutItem``
+  (``attribute_not_exists(user_id)``) instead of a read followed by a
+  racy write.
+* ``record_login`` takes ``last_login`` off the response path by
+  queueing it on ``app.write_behind``, where repeated logins for the
+  same user coalesce into one ``UpdateItem`` with the latest timestamp.
+
+A user whose record has ``role`` set to ``ADMIN_ROLE`` may use the
+tenant-wide routes (``POST /user/batch``, ``GET /admin/users/export``).
+The role is only ever set by an operator, directly on the record.
+
+Every write of ``password_hash`` also writes ``password_fp``, a short
+digest of the hash.  Signed password-reset tokens carry it, and the
+reset is conditional on it, so a token stops working once the password
+changes.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from .. import config, write_behind
+from ..aiodb import ConditionalCheckFailed, users_table
+
+
+ADMIN_ROLE = "admin"
+
+# Attributes safe to return to API clients; never ``password_hash``.
+PUBLIC_ATTRIBUTES = (
+    "user_id",
+    "email",
+    "name",
+    "client_id",
+    "site_id",
+    "created_at",
+    "updated_at",
+    "last_login",
+)
+
+
+def password_fingerprint(password_hash: str) -> str:
+    """Return the ``password_fp`` stored alongside ``password_hash``.
+
+    The hash embeds a random salt, so the digest changes on every
+    password change and reveals nothing about the password.  A rehash
+    with new parameters keeps the old fingerprint (see
+    ``update_password_hash``).
+    """
+    digest = hashlib.sha256(password_hash.encode("utf-8")).digest()[:12]
+    return base64.urlsafe_b64encode(digest).decode("ascii")
+
+
+class UserExistsError(Exception):
+    """Raised by ``create_user`` when the ``user_id`` is already taken."""
+
+
+def public_projection() -> Tuple[str, Dict[str, str]]:
+    """Return a ``ProjectionExpression`` and names for ``PUBLIC_ATTRIBUTES``.
+
+    Every attribute goes through a placeholder because ``name`` is a
+    DynamoDB reserved word.
+    """
+    names = {f"#p{i}": attr for i, attr in enumerate(PUBLIC_ATTRIBUTES)}
+    return ", ".join(names), names
+
+
+async def get_user(user_id: str) -> Optional[dict]:
+    """Return the user record, or ``None`` if it does not exist.
+
+    Args:
+        user_id: Tenant-scoped user ID.
+    """
+    result = await users_table().get_item(Key={"user_id": user_id})
+    return result.get("Item")
+
+
+async def get_role(user_id: str) -> Optional[str]:
+    """Return the user's ``role``, or ``None`` if unset or the user is gone.
+
+    Args:
+        user_id: Tenant-scoped user ID.
+    """
+    result = await users_table().get_item(
+        Key={"user_id": user_id},
+        ProjectionExpression="#role",
+        ExpressionAttributeNames={"#role": "role"},
+    )
+    return result.get("Item", {}).get("role")
+
+
+async def create_user(item: dict) -> None:
+    """Insert a new user in one conditional write.
+
+    Args:
+        item: The full user record, including ``user_id``.
+
+    Raises:
+        UserExistsError: If a record with the same ``user_id`` exists.
+    """
+    try:
+        await users_table().put_item(
+            Item=item,
+            ConditionExpression="attribute_not_exists(user_id)",
+        )
+    except ConditionalCheckFailed:
+        raise UserExistsError(item["user_id"]) from None
+
+
+async def update_password_hash(
+    user_id: str, new_hash: str, expected_hash: str, updated_at: str
+) -> bool:
+    """Replace a password hash only if it still matches ``expected_hash``.
+
+    Used for parameter upgrades of the same password, so ``password_fp``
+    is left unchanged and outstanding reset tokens stay valid.
+
+    Args:
+        user_id: Tenant-scoped user ID.
+        new_hash: The replacement hash.
+        expected_hash: The hash the caller last saw.
+        updated_at: ISO timestamp for ``updated_at``.
+
+    Returns:
+        ``True`` if the hash was replaced, ``False`` if it had changed.
+    """
+    try:
+        await users_table().update_item(
+            Key={"user_id": user_id},
+            UpdateExpression="SET password_hash = :h, updated_at = :u",
+            ConditionExpression="password_hash = :old",
+            ExpressionAttributeValues={
+                ":h": new_hash,
+                ":u": updated_at,
+                ":old": expected_hash,
+            },
+        )
+    except ConditionalCheckFailed:
+        return False
+    return True
+
+
+async def ensure_password_fingerprint(user: dict) -> Optional[str]:
+    """Return ``user``'s ``password_fp``, storing it first if it is missing.
+
+    Records created before ``password_fp`` existed get it on their first
+    reset request.  The write is conditional on ``password_hash`` so it
+    cannot pair a fingerprint with a newer hash.
+
+    Args:
+        user: The full user item.
+
+    Returns:
+        The fingerprint, or ``None`` if the hash changed concurrently.
+    """
+    fingerprint = user.get("password_fp")
+    if fingerprint:
+        return fingerprint
+    fingerprint = password_fingerprint(user["password_hash"])
+    try:
+        await users_table().update_item(
+            Key={"user_id": user["user_id"]},
+            UpdateExpression="SET password_fp = :fp",
+            ConditionExpression="password_hash = :h",
+            ExpressionAttributeValues={":fp": fingerprint, ":h": user["password_hash"]},
+        )
+    except ConditionalCheckFailed:
+        return None
+    return fingerprint
+
+
+async def record_login(user_id: str, when: datetime) -> None:
+    """Queue the ``last_login`` update on the write-behind queue.
+
+    Args:
+        user_id: Tenant-scoped user ID.
+        when: Login time.
+    """
+    await write_behind.update(
+        config.USERS_TABLE,
+        {"user_id": user_id},
+        UpdateExpression="SET last_login = :t",
+        ConditionExpression="attribute_exists(user_id)",
+        ExpressionAttributeValues={":t": when.isoformat()},
+    )
@@ -0,0 +1,419 @@
+"""Parallel-scan engine for bulk jobs over DynamoDB tables.
+
+A job scans one table and maps each item to an action: ``Put``,
+``Delete`` or ``Update``.  Returning ``None`` leaves the item alone.  The
+engine runs the scan as ``segments`` parallel segments on a thread pool
+with the boto3 resources from ``app.db``:
+
+* Puts and deletes are written with ``BatchWriteItem`` in chunks of 25.
+  ``UnprocessedItems`` are retried with backoff.  Updates are sent as
+  individual ``UpdateItem`` calls, which is needed for conditional or
+  partial writes.
+* Reads and writes are throttled to ``target_rcu`` / ``target_wcu``
+  capacity units per second across all segments.  The throttle uses the
+  consumed capacity DynamoDB reports.
+* With ``checkpoint`` set, each segment's ``LastEvaluatedKey`` is saved
+  to a JSON file after its page's writes have been applied.  Re-running
+  the same job with the same file continues where it stopped.  A dry run
+  reads the file but never writes it, so a real run afterwards with the
+  same file still does all the work.
+
+Built-in jobs (``JOBS``):
+
+* ``purge-reset-tokens``: delete used or expired password reset tokens
+  without waiting for the TTL sweeper.
+* ``purge-blacklist``: delete blacklist entries whose token has expired.
+* ``backfill-tenant``: set missing ``client_id``/``site_id`` on users
+  from their composite ``user_id``.
+
+Run from the repository root::
+
+    python -m app.bulk purge-reset-tokens --segments 16 --target-rcu 500 \\
+        --checkpoint /tmp/purge.json --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from . import db
+
+_BATCH_SIZE = 25
+_MAX_ATTEMPTS = 8
+
+
+class Put:
+    """Write ``item`` in full."""
+
+    __slots__ = ("item",)
+
+    def __init__(self, item: Dict[str, Any]):
+        self.item = item
+
+
+class Delete:
+    """Delete the item with primary key ``key``."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: Dict[str, Any]):
+        self.key = key
+
+
+class Update:
+    """Apply ``update_item`` arguments (expression, condition, values) to ``key``."""
+
+    __slots__ = ("key", "params")
+
+    def __init__(self, key: Dict[str, Any], **params: Any):
+        self.key = key
+        self.params = params
+
+
+Action = Optional[Any]
+
+
+class Job:
+    """A bulk job definition.
+
+    Args:
+        name: Job name, also recorded in the checkpoint.
+        table: Returns the boto3 table resource to scan (e.g.
+            ``db.users_table``).
+        process: Maps one scanned item to an action, or ``None``.
+        scan_params: Extra ``Scan`` arguments, e.g. a ``FilterExpression``
+            with its attribute names and values, or a
+            ``ProjectionExpression``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        table: Callable[[], Any],
+        process: Callable[[Dict[str, Any]], Action],
+        **scan_params: Any,
+    ):
+        self.name = name
+        self.table = table
+        self.process = process
+        self.scan_params = scan_params
+
+
+class _Throttle:
+    """Token bucket over consumed capacity units, shared by all segments."""
+
+    def __init__(self, rate: Optional[float]):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._available = rate or 0.0
+        self._updated = time.monotonic()
+
+    def consume(self, units: float) -> None:
+        """Record ``units`` consumed and sleep while over the target rate."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(
+                self.rate, self._available + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._available -= units
+            wait = -self._available / self.rate if self._available < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class _Checkpoint:
+    """Per-segment scan positions persisted to a JSON file."""
+
+    def __init__(self, path: Optional[str], job: str, segments: int, persist: bool = True):
+        self.path = path
+        self.persist = persist
+        self._lock = threading.Lock()
+        self.state: Dict[str, Any] = {"job": job, "segments": segments, "positions": {}}
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                saved = json.load(fh)
+            if saved.get("job") != job or saved.get("segments") != segments:
+                raise ValueError(
+                    f"Checkpoint {path} is for {saved.get('job')} with "
+                    f"{saved.get('segments')} segments"
+                )
+            self.state = saved
+
+    def position(self, segment: int) -> Any:
+        """Return the saved position: a DynamoDB-JSON key, ``"done"``, or ``None``."""
+        return self.state["positions"].get(str(segment))
+
+    def save(self, segment: int, position: Any) -> None:
+        with self._lock:
+            self.state["positions"][str(segment)] = position
+            if not self.path or not self.persist:
+                return
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as fh:
+                json.dump(self.state, fh)
+            os.replace(tmp, self.path)
+
+
+def _serialize_key(key: Dict[str, Any]) -> Dict[str, Any]:
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+    return {name: serializer.serialize(value) for name, value in key.items()}
+
+
+def _deserialize_key(key: Dict[str, Any]) -> Dict[str, Any]:
+    from boto3.dynamodb.types import TypeDeserializer
+
+    deserializer = TypeDeserializer()
+    return {name: deserializer.deserialize(value) for name, value in key.items()}
+
+
+def _units(response: Dict[str, Any]) -> float:
+    consumed = response.get("ConsumedCapacity") or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(entry.get("CapacityUnits", 0.0) for entry in consumed)
+
+
+class _Runner:
+    def __init__(self, job: Job, segments: int, target_rcu, target_wcu, checkpoint, dry_run):
+        self.job = job
+        self.segments = segments
+        self.read_throttle = _Throttle(target_rcu)
+        self.write_throttle = _Throttle(target_wcu)
+        self.checkpoint = _Checkpoint(checkpoint, job.name, segments, persist=not dry_run)
+        self.dry_run = dry_run
+        self._stats_lock = threading.Lock()
+        self.stats = {"scanned": 0, "matched": 0, "put": 0, "deleted": 0, "updated": 0,
+                      "conditional_failures": 0, "read_units": 0.0, "write_units": 0.0}
+
+    def _count(self, **deltas: float) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    def _batch_write(self, table: Any, actions: List[Any]) -> None:
+        for start in range(0, len(actions), _BATCH_SIZE):
+            chunk = actions[start:start + _BATCH_SIZE]
+            requests = [
+                {"PutRequest": {"Item": a.item}} if isinstance(a, Put)
+                else {"DeleteRequest": {"Key": a.key}}
+                for a in chunk
+            ]
+            pending = {table.name: requests}
+            for attempt in range(_MAX_ATTEMPTS):
+                response = db.dynamodb_resource().batch_write_item(
+                    RequestItems=pending, ReturnConsumedCapacity="TOTAL"
+                )
+                units = _units(response)
+                self._count(write_units=units)
+                self.write_throttle.consume(units)
+                pending = response.get("UnprocessedItems") or {}
+                if not pending:
+                    break
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+            else:
+                raise RuntimeError(f"Unprocessed writes remain on {table.name}")
+            self._count(
+                put=sum(isinstance(a, Put) for a in chunk),
+                deleted=sum(isinstance(a, Delete) for a in chunk),
+            )
+
+    def _update(self, table: Any, action: Update) -> None:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = table.update_item(
+                Key=action.key, ReturnConsumedCapacity="TOTAL", **action.params
+            )
+        except ClientError as exc:
+            if exc.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            self._count(conditional_failures=1)
+            return
+        units = _units(response)
+        self._count(updated=1, write_units=units)
+        self.write_throttle.consume(units)
+
+    def _apply(self, table: Any, actions: List[Any]) -> None:
+        if self.dry_run:
+            return
+        self._batch_write(table, [a for a in actions if isinstance(a, (Put, Delete))])
+        for action in actions:
+            if isinstance(action, Update):
+                self._update(table, action)
+
+    def run_segment(self, segment: int) -> None:
+        position = self.checkpoint.position(segment)
+        if position == "done":
+            return
+        table = self.job.table()
+        params = dict(
+            self.job.scan_params,
+            Segment=segment,
+            TotalSegments=self.segments,
+            ReturnConsumedCapacity="TOTAL",
+        )
+        if position:
+            params["ExclusiveStartKey"] = _deserialize_key(position)
+
+        while True:
+            response = table.scan(**params)
+            units = _units(response)
+            self.read_throttle.consume(units)
+            items = response.get("Items", [])
+            actions = [a for a in map(self.job.process, items) if a is not None]
+            self._count(
+                scanned=response.get("ScannedCount", len(items)),
+                matched=len(actions),
+                read_units=units,
+            )
+            self._apply(table, actions)
+
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                self.checkpoint.save(segment, "done")
+                return
+            self.checkpoint.save(segment, _serialize_key(last_key))
+            params["ExclusiveStartKey"] = last_key
+
+
+def run(
+    job: Job,
+    segments: int = 8,
+    workers: Optional[int] = None,
+    target_rcu: Optional[float] = None,
+    target_wcu: Optional[float] = None,
+    checkpoint: Optional[str] = None,
+    dry_run: bool = False,
+) -> Dict[str, float]:
+    """Run ``job`` as a parallel scan and return its counters.
+
+    Args:
+        job: The job to run.
+        segments: ``TotalSegments`` for the parallel scan.
+        workers: Threads scanning at once; defaults to ``segments``.
+        target_rcu: Read capacity units per second to stay under.
+        target_wcu: Write capacity units per second to stay under.
+        checkpoint: JSON file for per-segment progress.
+        dry_run: Scan and count matches without writing items or the
+            checkpoint.
+
+    Returns:
+        Counts of scanned, matched, put, deleted and updated items and
+        the capacity consumed.
+
+    Raises:
+        ValueError: If ``checkpoint`` belongs to a different job or
+            segment count.
+    """
+    runner = _Runner(job, segments, target_rcu, target_wcu, checkpoint, dry_run)
+    with ThreadPoolExecutor(max_workers=workers or segments, thread_name_prefix="bulk") as pool:
+        for future in [pool.submit(runner.run_segment, s) for s in range(segments)]:
+            future.result()
+    return runner.stats
+
+
+# ---------------------------------------------------------------------------
+# Built-in jobs
+# ---------------------------------------------------------------------------
+
+
+def purge_reset_tokens_job(now: Optional[int] = None) -> Job:
+    """Delete password reset tokens that are used or past their ``ttl``."""
+    now = int(now if now is not None else time.time())
+    return Job(
+        "purge-reset-tokens",
+        db.password_reset_table,
+        lambda item: Delete({"reset_token": item["reset_token"]}),
+        ProjectionExpression="reset_token",
+        FilterExpression="used = :t OR #ttl < :now",
+        ExpressionAttributeNames={"#ttl": "ttl"},
+        ExpressionAttributeValues={":t": True, ":now": now},
+    )
+
+
+def purge_blacklist_job(now: Optional[int] = None) -> Job:
+    """Delete blacklist entries for tokens that have already expired."""
+    now = int(now if now is not None else time.time())
+    return Job(
+        "purge-blacklist",
+        db.blacklist_table,
+        lambda item: Delete({"token_jti": item["token_jti"]}),
+        ProjectionExpression="token_jti",
+        FilterExpression="#ttl < :now",
+        ExpressionAttributeNames={"#ttl": "ttl"},
+        ExpressionAttributeValues={":now": now},
+    )
+
+
+def _backfill_tenant(item: Dict[str, Any]) -> Action:
+    parts = item["user_id"].split("#", 2)
+    if len(parts) != 3:
+        return None
+    return Update(
+        {"user_id": item["user_id"]},
+        UpdateExpression=(
+            "SET client_id = if_not_exists(client_id, :c), "
+            "site_id = if_not_exists(site_id, :s)"
+        ),
+        ConditionExpression="attribute_exists(user_id)",
+        ExpressionAttributeValues={":c": parts[0], ":s": parts[1]},
+    )
+
+
+def backfill_tenant_job() -> Job:
+    """Set ``client_id``/``site_id`` on users that lack them."""
+    return Job(
+        "backfill-tenant",
+        db.users_table,
+        _backfill_tenant,
+        ProjectionExpression="user_id",
+        FilterExpression="attribute_not_exists(client_id) OR attribute_not_exists(site_id)",
+    )
+
+
+JOBS: Dict[str, Callable[[], Job]] = {
+    "purge-reset-tokens": purge_reset_tokens_job,
+    "purge-blacklist": purge_blacklist_job,
+    "backfill-tenant": backfill_tenant_job,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a bulk DynamoDB job.")
+    parser.add_argument("job", choices=sorted(JOBS))
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--target-rcu", type=float)
+    parser.add_argument("--target-wcu", type=float)
+    parser.add_argument("--checkpoint")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    stats = run(
+        JOBS[args.job](),
+        segments=args.segments,
+        workers=args.workers,
+        target_rcu=args.target_rcu,
+        target_wcu=args.target_wcu,
+        checkpoint=args.checkpoint,
+        dry_run=args.dry_run,
+    )
+    stats["seconds"] = round(time.monotonic() - started, 2)
+    print(json.dumps({"job": args.job, "dry_run": args.dry_run, **stats}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Cold-start import profiling and lazy router mounting.
+
+The Lambda init phase pays for every module the entrypoint imports.  This
+module records how long each feature router (and, when profiling is on,
+each third-party package) takes to import, warns once when the configured
+budget is exceeded, and provides ``LazyRouterMount`` so routers can be
+imported on the first request under their prefix instead of at init.
+
+Only the standard library is imported here so that loading it does not
+itself show up in the profile.
+"""
+
+from __future__ import annotations
+
+import builtins
+import importlib
+import json
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from . import config
+
+_init_started = time.perf_counter()
+_init_finished: Optional[float] = None
+_router_imports: List[Dict[str, Any]] = []
+_package_imports: Dict[str, float] = {}
+_budget_reported = False
+_original_import: Optional[Callable[..., Any]] = None
+
+
+def _timed_builtin_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """``builtins.__import__`` replacement that times first-time package loads.
+
+    Only absolute imports of top-level packages that are not yet in
+    ``sys.modules`` are timed.  Times are inclusive of nested imports, so
+    ``jinja2`` includes ``markupsafe``.
+    """
+    top = name.partition(".")[0]
+    if level != 0 or not top or top in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        if top in sys.modules and top not in _package_imports:
+            _package_imports[top] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def start_profiling() -> None:
+    """Install the package import timer.
+
+    Called at import time of this module when ``COLD_START_PROFILE`` is
+    enabled.  Safe to call more than once.
+    """
+    global _original_import
+    if _original_import is not None:
+        return
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_builtin_import
+
+
+def stop_profiling() -> None:
+    """Restore the original ``builtins.__import__``."""
+    global _original_import
+    if _original_import is None:
+        return
+    builtins.__import__ = _original_import
+    _original_import = None
+
+
+def elapsed_ms() -> float:
+    """Return milliseconds since this module was first imported."""
+    end = _init_finished if _init_finished is not None else time.perf_counter()
+    return round((end - _init_started) * 1000, 2)
+
+
+def report() -> Dict[str, Any]:
+    """Return the cold-start profile collected so far.
+
+    Returns:
+        A dict with the total init time, the configured budget, per-router
+        import times and (when profiling is on) per-package import times
+        sorted slowest first.
+    """
+    packages = sorted(_package_imports.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "init_ms": elapsed_ms(),
+        "budget_ms": config.COLD_START_BUDGET_MS or None,
+        "lazy_routers": config.LAZY_ROUTERS,
+        "routers": list(_router_imports),
+        "packages": dict(packages),
+    }
+
+
+def _check_budget() -> None:
+    """Print the profile once if the init budget has been exceeded."""
+    global _budget_reported
+    budget = config.COLD_START_BUDGET_MS
+    if _budget_reported or budget <= 0:
+        return
+    total = elapsed_ms() + sum(entry["ms"] for entry in _router_imports if entry["lazy"])
+    if total > budget:
+        _budget_reported = True
+        print(json.dumps({"cold_start_budget_exceeded": report()}))
+
+
+def timed_import(module: str, package: Optional[str] = None, lazy: bool = False):
+    """Import a module and record how long it took.
+
+    Args:
+        module: Module name, absolute or relative to ``package``.
+        package: Anchor package for relative names.
+        lazy: ``True`` when the import happens on a request rather than
+            during init.
+
+    Returns:
+        The imported module.
+    """
+    before = set(sys.modules)
+    start = time.perf_counter()
+    mod = importlib.import_module(module, package)
+    took = round((time.perf_counter() - start) * 1000, 2)
+    loaded = sorted({name.partition(".")[0] for name in set(sys.modules) - before})
+    _router_imports.append({
+        "module": mod.__name__,
+        "ms": took,
+        "lazy": lazy,
+        "loaded": loaded,
+    })
+    _check_budget()
+    return mod
+
+
+def mark_ready() -> None:
+    """Mark the end of the init phase and emit the profile if requested.
+
+    Called by ``handler.py`` once the ASGI app and adapter exist.
+    """
+    global _init_finished
+    if _init_finished is not None:
+        return
+    _init_finished = time.perf_counter()
+    _check_budget()
+    if config.COLD_START_PROFILE:
+        print(json.dumps({"cold_start": report()}))
+
+
+class LazyRouterMount:
+    """ASGI middleware that mounts feature routers on first use.
+
+    Each entry in ``routers`` maps a URL prefix to a module exposing a
+    ``router`` attribute.  The module is imported and included on the
+    target app the first time a request path falls under its prefix.
+    Requests for the OpenAPI schema or docs mount everything so the
+    schema stays complete.
+
+    Args:
+        app: The next ASGI app in the stack.
+        target: The FastAPI app routers are included on.
+        routers: Mapping of URL prefix to module name.
+        package: Anchor package for relative module names.
+    """
+
+    def __init__(self, app, target, routers: Dict[str, str], package: Optional[str] = None):
+        self.app = app
+        self.target = target
+        self.pending = dict(routers)
+        self.package = package
+        self._lock = threading.Lock()
+
+    def _prefix_for(self, path: str) -> Optional[str]:
+        for prefix in tuple(self.pending):
+            if path == prefix or path.startswith(prefix + "/"):
+                return prefix
+        return None
+
+    def mount(self, prefix: str) -> None:
+        """Import and include the router for ``prefix`` if still pending."""
+        with self._lock:
+            module = self.pending.get(prefix)
+            if module is None:
+                return
+            mod = timed_import(module, self.package, lazy=True)
+            self.target.include_router(mod.router, prefix=prefix)
+            self.target.openapi_schema = None
+            del self.pending[prefix]
+
+    def mount_all(self) -> None:
+        """Mount every pending router."""
+        for prefix in list(self.pending):
+            self.mount(prefix)
+
+    async def __call__(self, scope, receive, send):
+        if self.pending and scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            if path in (self.target.openapi_url, self.target.docs_url, self.target.redoc_url):
+                self.mount_all()
+            else:
+                prefix = self._prefix_for(path)
+                if prefix is not None:
+                    self.mount(prefix)
+        await self.app(scope, receive, send)
+
+
+if config.COLD_START_PROFILE:
+    start_profiling()
@@ -0,0 +1,16 @@
+"""Conditional ``GET`` support shared by routes that send an ``ETag``."""
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Return ``True`` if an ``If-None-Match`` header matches ``etag``.
+
+    Comparison is weak, as RFC 9110 requires for ``If-None-Match``: a
+    ``W/`` prefix is ignored, and ``*`` matches any ETag.
+    """
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
@@ -1,36 +1,213 @@
 """Runtime configuration and secrets management."""
 
-import json
 import os
 
-import boto3
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean feature flag from the environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 
 USERS_TABLE = os.environ.get("USER_TABLE", "Users")
 BLACKLIST_TABLE = os.environ.get("BLACKLIST_TABLE", "TokenBlacklist")
 PASSWORD_RESET_TABLE = os.environ.get("PASSWORD_RESET_TABLE", "PasswordResetTokens")
 LOGIN_ATTEMPTS_TABLE = os.environ.get("LOGIN_ATTEMPTS_TABLE", "LoginAttempts")
+API_KEYS_TABLE = os.environ.get("API_KEYS_TABLE", "ApiKeys")
 RESUME_TABLE = os.environ.get("RESUME_TABLE", "portfolio_personal_data")
 
+# Async data-access layer (``app.aiodb``).  ``memory`` runs against the
+# in-process stand-in in ``devtools.dynamodb`` (not deployed); ``DYNAMODB_ENDPOINT_URL`` points the HTTP
+# backend at e.g. DynamoDB Local.
+DYNAMODB_BACKEND = os.environ.get("DYNAMODB_BACKEND", "aws")
+DYNAMODB_ENDPOINT_URL = os.environ.get("DYNAMODB_ENDPOINT_URL", "")
+DYNAMODB_MAX_CONNECTIONS = int(os.environ.get("DYNAMODB_MAX_CONNECTIONS", "32"))
+
+# Upper bound on IDs accepted by the ``/batch`` endpoints.
+BATCH_MAX_IDS = int(os.environ.get("BATCH_MAX_IDS", "500"))
+
+# Resume documents are cached in-process, pre-serialized.  Entries older
+# than the TTL are served for up to ``RESUME_CACHE_STALE_SECONDS`` more while
+# they are re-read in the background; ``RESUME_CACHE_MAX_AGE_SECONDS`` is the
+# ``Cache-Control`` max-age given to browsers and CDNs.
+RESUME_DEFAULT_USER = os.environ.get("RESUME_DEFAULT_USER", "brudow317")
+RESUME_CACHE_MAX_ENTRIES = int(os.environ.get("RESUME_CACHE_MAX_ENTRIES", "256"))
+RESUME_CACHE_TTL_SECONDS = float(os.environ.get("RESUME_CACHE_TTL_SECONDS", "300"))
+RESUME_CACHE_STALE_SECONDS = float(os.environ.get("RESUME_CACHE_STALE_SECONDS", "86400"))
+RESUME_CACHE_MAX_AGE_SECONDS = int(os.environ.get("RESUME_CACHE_MAX_AGE_SECONDS", "60"))
+
+# Write-behind queue for writes that are off the response path.
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "1000"))
+WRITE_BEHIND_FLUSH_SECONDS = float(os.environ.get("WRITE_BEHIND_FLUSH_SECONDS", "1"))
+
 
 JWT_SECRET_NAME = os.environ.get("JWT_SECRET_NAME", "")
 JWT_EXPIRY_HOURS = 24
 REFRESH_THRESHOLD_HOURS = 2
 
-API_KEYS = {
-    "site_a_key_abc123": {"client_id": "ClientCustomerC", "site_id": "SiteA"},
-    "site_b_key_xyz789": {"client_id": "ClientCustomerA", "site_id": "SiteB"},
-}
+# Access/refresh token pairs (``app.auth.sessions``).  The access-token
+# lifetime defaults to the legacy 24 hours; deployments whose clients use
+# refresh tokens should lower it.  Each login is a refresh-token family; a
+# user keeps at most ``REFRESH_FAMILIES_MAX`` of them.
+ACCESS_TOKEN_MINUTES = int(os.environ.get("ACCESS_TOKEN_MINUTES", str(JWT_EXPIRY_HOURS * 60)))
+REFRESH_TOKEN_DAYS = int(os.environ.get("REFRESH_TOKEN_DAYS", "30"))
+REFRESH_FAMILIES_MAX = int(os.environ.get("REFRESH_FAMILIES_MAX", "10"))
+TOKEN_EPOCH_CACHE_MAX_ENTRIES = int(os.environ.get("TOKEN_EPOCH_CACHE_MAX_ENTRIES", "4096"))
+
+# JWT keyring (``app.keyring``).  Keys are reloaded in the background after
+# the refresh interval; a token with an unknown ``kid`` forces a reload at
+# most once per refetch interval.
+JWT_KEYS_REFRESH_SECONDS = float(os.environ.get("JWT_KEYS_REFRESH_SECONDS", "300"))
+JWT_KEYS_MIN_REFETCH_SECONDS = float(os.environ.get("JWT_KEYS_MIN_REFETCH_SECONDS", "30"))
+
+# Token signing algorithm: ``HS256`` with the shared secret, or ``EdDSA`` /
+# ``ES256`` with the private key in the secret's ``jwt_private_key`` field
+# (``JWT_PRIVATE_KEY`` locally).  The public keys are served from
+# ``/auth/.well-known/jwks.json`` with this ``Cache-Control`` max-age.
+JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
+JWKS_MAX_AGE_SECONDS = int(os.environ.get("JWKS_MAX_AGE_SECONDS", "300"))
+
+# Password-reset tokens.  ``table`` stores opaque tokens in
+# ``PASSWORD_RESET_TABLE``; ``signed`` issues HMAC-signed tokens
+# (``app.auth.reset_tokens``) and needs no table.
+RESET_TOKEN_MODE = os.environ.get("RESET_TOKEN_MODE", "table")
+RESET_TOKEN_TTL_SECONDS = int(os.environ.get("RESET_TOKEN_TTL_SECONDS", "3600"))
+# Every ``/auth/password-reset`` response takes at least this long, so the
+# lookup and mail handoff for a known email cannot be told apart from an
+# unknown one by timing.
+PASSWORD_RESET_MIN_SECONDS = float(os.environ.get("PASSWORD_RESET_MIN_SECONDS", "0.3"))
+RESET_LINK_TEMPLATE = os.environ.get(
+    "RESET_LINK_TEMPLATE", "https://{site}.com/reset-password?token={token}"
+)
+
+# Outbound mail (``app.mail``).  ``MAIL_TRANSPORT`` is ``sqs``, ``ses``,
+# ``smtp``, ``file`` (``.eml`` files under ``MAIL_FILE_DIR``) or ``memory``.
+# With ``sqs`` messages go to ``MAIL_QUEUE_URL`` and the queue consumer
+# delivers them through ``MAIL_DELIVERY_TRANSPORT``.
+MAIL_TRANSPORT = os.environ.get("MAIL_TRANSPORT", "file")
+MAIL_QUEUE_URL = os.environ.get("MAIL_QUEUE_URL", "")
+MAIL_DELIVERY_TRANSPORT = os.environ.get("MAIL_DELIVERY_TRANSPORT", "ses")
+MAIL_FROM = os.environ.get("MAIL_FROM", "noreply@yourservice.com")
+MAIL_MAX_PENDING = int(os.environ.get("MAIL_MAX_PENDING", "100"))
+MAIL_BATCH_SIZE = int(os.environ.get("MAIL_BATCH_SIZE", "10"))
+MAIL_FLUSH_SECONDS = float(os.environ.get("MAIL_FLUSH_SECONDS", "1"))
+MAIL_FILE_DIR = os.environ.get("MAIL_FILE_DIR", "/tmp/mail")
+MAIL_SMTP_HOST = os.environ.get("MAIL_SMTP_HOST", "localhost")
+MAIL_SMTP_PORT = int(os.environ.get("MAIL_SMTP_PORT", "1025"))
+MAIL_SMTP_USER = os.environ.get("MAIL_SMTP_USER", "")
+MAIL_SMTP_PASSWORD = os.environ.get("MAIL_SMTP_PASSWORD", "")
+MAIL_SMTP_STARTTLS = _env_flag("MAIL_SMTP_STARTTLS")
+
+# Verified-JWT cache used by ``get_current_user``.  Set the size to 0 to
+# disable it.  The revocation TTL bounds how long a blacklist entry written
+# by another container can go unnoticed.
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", "1024"))
+TOKEN_CACHE_REVOCATION_TTL_SECONDS = float(
+    os.environ.get("TOKEN_CACHE_REVOCATION_TTL_SECONDS", "5")
+)
 
-_jwt_secret_cache = None
+# Bloom filter of revoked JTIs.  A negative answer skips the blacklist read;
+# revocations from other containers are picked up within the refresh window.
+# Refreshes run in the background; a filter older than the staleness limit
+# is not trusted.
+REVOCATION_FILTER_ENABLED = _env_flag("REVOCATION_FILTER_ENABLED", default=True)
+REVOCATION_FILTER_REFRESH_SECONDS = float(
+    os.environ.get("REVOCATION_FILTER_REFRESH_SECONDS", "15")
+)
+REVOCATION_FILTER_MAX_STALENESS_SECONDS = float(
+    os.environ.get("REVOCATION_FILTER_MAX_STALENESS_SECONDS", "60")
+)
+REVOCATION_FILTER_REBUILD_SECONDS = float(
+    os.environ.get("REVOCATION_FILTER_REBUILD_SECONDS", "3600")
+)
+REVOCATION_FILTER_CAPACITY = int(os.environ.get("REVOCATION_FILTER_CAPACITY", "10000"))
+REVOCATION_FILTER_ERROR_RATE = float(os.environ.get("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+
+# scrypt runs on a dedicated executor; requests beyond
+# ``KDF_WORKERS + KDF_MAX_QUEUE`` in-flight hashes are shed with a 429.
+KDF_EXECUTOR = os.environ.get("KDF_EXECUTOR", "thread")
+KDF_WORKERS = int(os.environ.get("KDF_WORKERS", "2"))
+KDF_MAX_QUEUE = int(os.environ.get("KDF_MAX_QUEUE", "8"))
+
+# scrypt parameters for new hashes, pinned per deployment.  ``python -m
+# app.auth.kdf`` suggests N for ``SCRYPT_TARGET_MS`` while keeping
+# ``KDF_WORKERS`` concurrent derivations within ``SCRYPT_MEMORY_FRACTION`` of
+# the function's memory.  Hashes stored with weaker parameters are upgraded
+# on the next successful login.
+SCRYPT_N = int(os.environ.get("SCRYPT_N", "16384"))
+SCRYPT_R = int(os.environ.get("SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("SCRYPT_P", "1"))
+SCRYPT_TARGET_MS = float(os.environ.get("SCRYPT_TARGET_MS", "100"))
+SCRYPT_MIN_N = int(os.environ.get("SCRYPT_MIN_N", "16384"))
+SCRYPT_MEMORY_FRACTION = float(os.environ.get("SCRYPT_MEMORY_FRACTION", "0.25"))
+LAMBDA_MEMORY_MB = int(os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "256"))
+
+# Login attempt limits, counted per tenant-scoped email and client IP over a
+# sliding window before any password hashing.
+LOGIN_RATE_LIMIT_ENABLED = _env_flag("LOGIN_RATE_LIMIT_ENABLED", default=True)
+LOGIN_RATE_WINDOW_SECONDS = float(os.environ.get("LOGIN_RATE_WINDOW_SECONDS", "900"))
+LOGIN_RATE_LIMIT_PER_EMAIL = int(os.environ.get("LOGIN_RATE_LIMIT_PER_EMAIL", "10"))
+LOGIN_RATE_LIMIT_PER_IP = int(os.environ.get("LOGIN_RATE_LIMIT_PER_IP", "50"))
+
+# Admin SSR templates: precompiled bundle written by ``python -m
+# app.templating`` and the size of the rendered-page cache.
+ADMIN_TEMPLATES_COMPILED_DIR = os.environ.get(
+    "ADMIN_TEMPLATES_COMPILED_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates_compiled"),
+)
+ADMIN_FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get("ADMIN_FRAGMENT_CACHE_MAX_ENTRIES", "256"))
+
+# Cookie sessions for the admin pages (``app.auth.cookie_session``).  Turn
+# ``ADMIN_COOKIE_SECURE`` off only for local development over plain HTTP.
+ADMIN_SESSION_COOKIE = os.environ.get("ADMIN_SESSION_COOKIE", "admin_session")
+ADMIN_SESSION_MINUTES = int(os.environ.get("ADMIN_SESSION_MINUTES", "480"))
+ADMIN_COOKIE_SECURE = _env_flag("ADMIN_COOKIE_SECURE", default=True)
+ADMIN_COOKIE_SAMESITE = os.environ.get("ADMIN_COOKIE_SAMESITE", "strict")
+
+# Tenant registry (``app.tenants``).  API-key records are keyed by the
+# SHA-256 of the key and come from ``TENANT_REGISTRY_FILE`` (``file``) or the
+# ``API_KEYS_TABLE`` table (``dynamodb``).
+TENANT_REGISTRY_SOURCE = os.environ.get("TENANT_REGISTRY_SOURCE", "file")
+TENANT_REGISTRY_FILE = os.environ.get(
+    "TENANT_REGISTRY_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tenants.json"),
+)
+TENANT_REGISTRY_REFRESH_SECONDS = float(os.environ.get("TENANT_REGISTRY_REFRESH_SECONDS", "300"))
+TENANT_NEGATIVE_CACHE_SECONDS = float(os.environ.get("TENANT_NEGATIVE_CACHE_SECONDS", "60"))
+
+# Cold-start tuning.  With ``LAZY_ROUTERS`` enabled each feature router is
+# imported on the first request under its prefix instead of at init time.
+LAZY_ROUTERS = _env_flag("LAZY_ROUTERS")
+COLD_START_PROFILE = _env_flag("COLD_START_PROFILE")
+COLD_START_BUDGET_MS = float(os.environ.get("COLD_START_BUDGET_MS", "0"))
+
+# Request metrics (``app.metrics``) in CloudWatch Embedded Metric Format.
+# ``METRICS_SINK`` is ``stdout`` (picked up by CloudWatch Logs on Lambda),
+# ``memory`` (kept in ``app.metrics.emitted``) or ``off``.
+METRICS_SINK = os.environ.get("METRICS_SINK", "stdout")
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "Lambdalith")
+
+# Invocation profiling (``app.profiling``).  A request is profiled when its
+# ``x-profile`` header equals ``PROFILE_TOKEN`` or with probability
+# ``PROFILE_SAMPLE_RATE``, at most once per ``PROFILE_MIN_INTERVAL_SECONDS``
+# per container.  ``PROFILE_OUTPUT`` is ``stdout`` or a directory.
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "sample")
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MIN_INTERVAL_SECONDS = float(os.environ.get("PROFILE_MIN_INTERVAL_SECONDS", "60"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_OUTPUT = os.environ.get("PROFILE_OUTPUT", "stdout")
 
 
 def get_jwt_secret() -> str:
-    """Fetch the JWT signing secret, caching after first call.
+    """Return the secret that currently signs new JWTs.
 
-    Uses Secrets Manager when ``JWT_SECRET_NAME`` is set (deployed
-    environment).  Falls back to the ``JWT_SECRET`` env var for local
-    development.  The result is cached in ``_jwt_secret_cache`` so
-    Secrets Manager is only called once per Lambda cold start.
+    The secret comes from ``app.keyring``, which prefetches it at init,
+    refreshes it in the background and keeps the previous key for
+    verification across a rotation.  New code should sign and verify
+    through ``app.keyring`` so tokens carry a ``kid`` header.
 
     Returns:
         The plaintext JWT signing secret.
@@ -39,19 +216,6 @@ def get_jwt_secret() -> str:
         RuntimeError: If neither ``JWT_SECRET_NAME`` nor ``JWT_SECRET``
             is configured.
     """
-    global _jwt_secret_cache
-    if _jwt_secret_cache is not None:
-        return _jwt_secret_cache
-
-    if not JWT_SECRET_NAME:
-        secret = os.environ.get("JWT_SECRET")
-        if not secret:
-            raise RuntimeError("Neither JWT_SECRET_NAME nor JWT_SECRET is configured")
-        _jwt_secret_cache = secret
-        return _jwt_secret_cache
-
-    client = boto3.client("secretsmanager")
-    response = client.get_secret_value(SecretId=JWT_SECRET_NAME)
-    secret_dict = json.loads(response["SecretString"])
-    _jwt_secret_cache = secret_dict["jwt_secret"]
-    return _jwt_secret_cache
+    from . import keyring
+
+    return keyring.signing_key()[1]
@@ -1,11 +1,14 @@
 """DynamoDB table accessors.
 
+Synchronous boto3 resources for scripts and bulk tooling; request handlers
+use the awaitable equivalents in ``app.aiodb``.
+
 Single boto3 resource cached at module level for Lambda warm-start reuse.
 All table names come from app.config so there is one place to change them.
+boto3 is imported on first use so routes that never touch DynamoDB do not
+pay for it at cold start.
 """
 
-import boto3
-
 from . import config
 
 _dynamodb = None
@@ -14,9 +17,23 @@ _dynamodb = None
 def _get_dynamodb():
     global _dynamodb
     if _dynamodb is None:
+        import boto3
+
         _dynamodb = boto3.resource("dynamodb")
     return _dynamodb
 
+
+def dynamodb_resource():
+    """Return the shared DynamoDB service resource.
+
+    For calls that are not tied to one table, such as ``batch_write_item``.
+
+    Returns:
+        A ``boto3.resources.factory.dynamodb.ServiceResource``.
+    """
+    return _get_dynamodb()
+
+
 def users_table():
     """Return the Users table resource.
 
@@ -60,3 +77,12 @@ def login_attempts_table():
         A ``boto3.resources.factory.dynamodb.Table`` for rate-limiting data.
     """
     return _get_dynamodb().Table(config.LOGIN_ATTEMPTS_TABLE)
+
+
+def api_keys_table():
+    """Return the ApiKeys table resource.
+
+    Returns:
+        A ``boto3.resources.factory.dynamodb.Table`` for tenant API-key records.
+    """
+    return _get_dynamodb().Table(config.API_KEYS_TABLE)
@@ -0,0 +1,51 @@
+"""JSON encoding straight to bytes for hot response paths.
+
+FastAPI's default path runs a response through ``jsonable_encoder`` (a
+recursive Python walk that also converts DynamoDB ``Decimal`` values) and
+then through stdlib ``json``.  ``dumps`` skips that walk: it encodes
+arbitrary items (``Decimal``, ``set`` and ``bytes`` included) with orjson
+when it is installed, or stdlib ``json`` otherwise.
+
+Validated models need no helper: ``model_dump_json`` already serializes
+in pydantic-core (see ``benchmarks/resume_encoding.py``).
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from decimal import Decimal
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Convert the non-JSON types DynamoDB returns."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize ``obj`` to compact JSON bytes.
+
+    Args:
+        obj: A JSON-compatible value, possibly containing DynamoDB types.
+
+    Returns:
+        UTF-8 encoded JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
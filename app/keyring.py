@@ -0,0 +1,358 @@
+"""JWT signing keyring with background refresh and rotation support.
+
+Keys come from Secrets Manager when ``JWT_SECRET_NAME`` is set: the
+``AWSCURRENT`` version signs new tokens and the ``AWSPREVIOUS`` version,
+if any, is kept for verification only, so tokens issued before a
+rotation stay valid until they expire.  Without ``JWT_SECRET_NAME`` the
+keys come from ``JWT_SECRET`` and the optional ``JWT_SECRET_PREVIOUS``.
+
+``JWT_ALGORITHM`` picks how tokens are signed.  ``HS256`` (default) signs
+with the secret itself.  ``EdDSA`` (Ed25519) and ``ES256`` (P-256) sign
+with a private key, read from the secret's ``jwt_private_key`` field (PEM)
+or ``JWT_PRIVATE_KEY``/``JWT_PRIVATE_KEY_PREVIOUS``, so other services
+can verify tokens offline with the public keys published by
+``GET /auth/.well-known/jwks.json`` (``jwks``).  The secret stays in use
+for HMAC purposes such as password-reset tokens, and HS256 tokens issued
+before a switch still verify until they expire.
+
+Every token is signed with a ``kid`` header naming its key, and
+``decode`` verifies against that key only, with the algorithm the key
+was loaded for, never the one named in the token.  A secret's ``kid`` is
+its Secrets Manager ``VersionId``, or ``JWT_SECRET_KID`` /
+``JWT_SECRET_PREVIOUS_KID`` for environment secrets, so nothing derived
+from the secret is published.  A public key's ``kid`` is a digest of the
+public key.  Public keys are parsed once per load.  Tokens without a
+``kid`` (issued before this module) are tried against every HMAC key.
+
+``jwt``, ``cryptography`` and boto3 are imported on first use, so
+importing this module costs nothing at cold start.  The auth router calls
+``prefetch`` when it is imported, which loads the keyring and creates the
+Secrets Manager client outside the billed request.  After
+``JWT_KEYS_REFRESH_SECONDS`` the next use starts a refresh on a
+background thread and keeps using the loaded keys meanwhile.  A token
+with an unknown ``kid`` (signed by a container that saw a rotation
+first) triggers an immediate refetch, at most once every
+``JWT_KEYS_MIN_REFETCH_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import config, metrics
+
+ALGORITHM = "HS256"
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+
+_lock = threading.Lock()
+_keys: Dict[str, str] = {}
+_legacy: Dict[str, str] = {}
+_public: Dict[str, Tuple[str, Any]] = {}
+_signer: Optional[Tuple[str, str, Any]] = None
+_jwks: Tuple[bytes, str] = (b'{"keys":[]}', "")
+_current_kid: Optional[str] = None
+_loaded_at = 0.0
+_refetched_at = 0.0
+_refreshing = False
+_client = None
+
+
+def _legacy_kid(secret: str) -> str:
+    """Return the digest ``kid`` that tokens signed before version kids carry.
+
+    Only used to look up keys for such tokens; never put in a new token.
+    """
+    return hashlib.sha256(secret.encode()).hexdigest()[:16]
+
+
+def _secrets_client():
+    global _client
+    if _client is None:
+        import boto3
+
+        _client = boto3.client("secretsmanager")
+    return _client
+
+
+def _read_stage(stage: str) -> Optional[Dict[str, str]]:
+    """Return the secret's fields for ``stage``, with its ``VersionId`` as ``kid``."""
+    try:
+        response = _secrets_client().get_secret_value(
+            SecretId=config.JWT_SECRET_NAME, VersionStage=stage
+        )
+    except Exception as exc:
+        if stage == "AWSCURRENT":
+            raise
+        # No previous version exists until the first rotation.
+        if getattr(exc, "response", {}).get("Error", {}).get("Code") != "ResourceNotFoundException":
+            print(f"Could not read {stage} JWT secret: {exc!r}")
+        return None
+    return dict(json.loads(response["SecretString"]), kid=response["VersionId"])
+
+
+def _fetch() -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    """Return the current key material and the verify-only previous ones.
+
+    Each is a dict with ``jwt_secret``, its ``kid`` and, if configured,
+    ``jwt_private_key``.
+
+    Raises:
+        RuntimeError: If neither ``JWT_SECRET_NAME`` nor ``JWT_SECRET``
+            is configured.
+    """
+    if config.JWT_SECRET_NAME:
+        current = _read_stage("AWSCURRENT")
+        previous = _read_stage("AWSPREVIOUS")
+    else:
+        if not os.environ.get("JWT_SECRET"):
+            raise RuntimeError("Neither JWT_SECRET_NAME nor JWT_SECRET is configured")
+        current = {
+            "jwt_secret": os.environ["JWT_SECRET"],
+            "jwt_private_key": os.environ.get("JWT_PRIVATE_KEY", ""),
+            "kid": os.environ.get("JWT_SECRET_KID", "env-current"),
+        }
+        previous = {
+            "jwt_secret": os.environ.get("JWT_SECRET_PREVIOUS", ""),
+            "jwt_private_key": os.environ.get("JWT_PRIVATE_KEY_PREVIOUS", ""),
+            "kid": os.environ.get("JWT_SECRET_PREVIOUS_KID", "env-previous"),
+        }
+    if not previous or previous["jwt_secret"] == current["jwt_secret"]:
+        return current, []
+    return current, [previous]
+
+
+def _parse_private_key(pem: str, algorithm: str) -> Any:
+    """Load a PEM private key and check it suits ``algorithm``.
+
+    Raises:
+        RuntimeError: If the key is of the wrong type.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+    key = serialization.load_pem_private_key(pem.encode(), password=None)
+    if algorithm == "EdDSA" and isinstance(key, ed25519.Ed25519PrivateKey):
+        return key
+    if (
+        algorithm == "ES256"
+        and isinstance(key, ec.EllipticCurvePrivateKey)
+        and isinstance(key.curve, ec.SECP256R1)
+    ):
+        return key
+    raise RuntimeError(f"JWT private key is not a {algorithm} key")
+
+
+def public_kid(public_key: Any) -> str:
+    """Return the ``kid`` for a public key (a digest of its DER encoding)."""
+    from cryptography.hazmat.primitives import serialization
+
+    der = public_key.public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return hashlib.sha256(der).hexdigest()[:16]
+
+
+def _jwks_document(public: Dict[str, Tuple[str, Any]]) -> Tuple[bytes, str]:
+    """Serialize the public keys as a JWK Set; return it and its ETag."""
+    import jwt
+
+    keys = []
+    for kid, (algorithm, key) in sorted(public.items()):
+        jwk = jwt.get_algorithm_by_name(algorithm).to_jwk(key, as_dict=True)
+        jwk.update(kid=kid, alg=algorithm, use="sig")
+        keys.append(jwk)
+    body = json.dumps({"keys": keys}, separators=(",", ":"), sort_keys=True).encode()
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _load() -> None:
+    """Fetch the secrets and replace the keyring.
+
+    Raises:
+        RuntimeError: If ``JWT_ALGORITHM`` is asymmetric and the current
+            key material has no private key.
+    """
+    global _keys, _legacy, _public, _signer, _jwks, _current_kid, _loaded_at
+    algorithm = config.JWT_ALGORITHM
+    current, previous = _fetch()
+    keys: Dict[str, str] = {}
+    legacy: Dict[str, str] = {}
+    public: Dict[str, Tuple[str, Any]] = {}
+    signer = None
+    for material in previous + [current]:
+        secret = material.get("jwt_secret")
+        if secret:
+            keys[material["kid"]] = secret
+            legacy[_legacy_kid(secret)] = secret
+        pem = material.get("jwt_private_key")
+        if pem and algorithm in ASYMMETRIC_ALGORITHMS:
+            private_key = _parse_private_key(pem, algorithm)
+            kid = public_kid(private_key.public_key())
+            public[kid] = (algorithm, private_key.public_key())
+            signer = (kid, algorithm, private_key)
+    current_kid = current["kid"]
+    if algorithm in ASYMMETRIC_ALGORITHMS:
+        if not current.get("jwt_private_key"):
+            raise RuntimeError(f"JWT_ALGORITHM={algorithm} needs a jwt_private_key")
+    else:
+        signer = (current_kid, ALGORITHM, current["jwt_secret"])
+    document = _jwks_document(public)
+    with _lock:
+        _keys = keys
+        _legacy = legacy
+        _public = public
+        _signer = signer
+        _jwks = document
+        _current_kid = current_kid
+        _loaded_at = time.monotonic()
+
+
+def _refresh() -> None:
+    global _refreshing
+    try:
+        _load()
+    except Exception as exc:
+        print(f"JWT keyring refresh failed, keeping loaded keys: {exc!r}")
+    finally:
+        with _lock:
+            _refreshing = False
+
+
+def _ensure_loaded() -> None:
+    """Load the keyring if empty; start a background refresh if stale."""
+    global _refreshing
+    if _current_kid is None:
+        _load()
+        return
+    if time.monotonic() - _loaded_at < config.JWT_KEYS_REFRESH_SECONDS:
+        return
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=_refresh, name="jwt-keyring", daemon=True).start()
+
+
+def prefetch() -> None:
+    """Load the keyring now rather than in the first request.
+
+    Failures are retried on first use.
+    """
+    try:
+        _load()
+    except Exception as exc:
+        print(f"JWT keyring prefetch failed: {exc!r}")
+
+
+def signing_key() -> Tuple[str, str]:
+    """Return the ``(kid, secret)`` used to sign new tokens."""
+    _ensure_loaded()
+    with _lock:
+        return _current_kid, _keys[_current_kid]
+
+
+def key_for(kid: str) -> Optional[str]:
+    """Return the loaded secret for ``kid`` without refetching, or ``None``."""
+    _ensure_loaded()
+    with _lock:
+        return _keys.get(kid) or _legacy.get(kid)
+
+
+def encode(payload: Dict[str, Any]) -> str:
+    """Sign ``payload`` with the current key and a ``kid`` header."""
+    import jwt
+
+    _ensure_loaded()
+    with _lock:
+        kid, algorithm, key = _signer
+    return jwt.encode(payload, key, algorithm=algorithm, headers={"kid": kid})
+
+
+def jwks() -> Tuple[bytes, str]:
+    """Return the JWK Set of the public verification keys and its ETag.
+
+    The document is built when the keyring loads, so serving it costs no
+    serialization.  In ``HS256`` mode it has no keys.
+    """
+    _ensure_loaded()
+    with _lock:
+        return _jwks
+
+
+async def _refetch_for(kid: str) -> None:
+    """Reload the keyring for an unknown ``kid``, rate-limited."""
+    global _refetched_at
+    with _lock:
+        now = time.monotonic()
+        known = kid in _keys or kid in _legacy or kid in _public
+        if known or now - _refetched_at < config.JWT_KEYS_MIN_REFETCH_SECONDS:
+            return
+        _refetched_at = now
+    try:
+        await asyncio.to_thread(_load)
+    except Exception as exc:
+        print(f"JWT keyring refetch failed: {exc!r}")
+
+
+async def decode(token: str, **options: Any) -> Dict[str, Any]:
+    """Verify ``token`` against the keyring and return its payload.
+
+    Args:
+        token: The encoded JWT.
+        **options: Extra keyword arguments for ``jwt.decode``.
+
+    Raises:
+        jwt.InvalidTokenError: If the token does not verify against any
+            known key (``jwt.ExpiredSignatureError`` if it has expired).
+    """
+    with metrics.timer("JwtDecodeTime"):
+        return await _decode(token, **options)
+
+
+async def _decode(token: str, **options: Any) -> Dict[str, Any]:
+    import jwt
+
+    _ensure_loaded()
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is not None and kid not in _keys and kid not in _legacy and kid not in _public:
+        await _refetch_for(kid)
+
+    with _lock:
+        if kid is None:
+            candidates = [(ALGORITHM, _keys[_current_kid])] + [
+                (ALGORITHM, secret) for key_id, secret in _keys.items() if key_id != _current_kid
+            ]
+        elif kid in _public:
+            candidates = [_public[kid]]
+        elif kid in _keys or kid in _legacy:
+            candidates = [(ALGORITHM, _keys.get(kid) or _legacy[kid])]
+        else:
+            raise jwt.InvalidTokenError("Unknown signing key")
+
+    for algorithm, key in candidates[:-1]:
+        try:
+            return jwt.decode(token, key, algorithms=[algorithm], **options)
+        except jwt.InvalidSignatureError:
+            continue
+    algorithm, key = candidates[-1]
+    return jwt.decode(token, key, algorithms=[algorithm], **options)
+
+
+def reset() -> None:
+    """Forget the loaded keys (e.g. after changing the secret env vars)."""
+    global _keys, _legacy, _public, _signer, _jwks, _current_kid, _loaded_at, _refetched_at
+    with _lock:
+        _keys = {}
+        _legacy = {}
+        _public = {}
+        _signer = None
+        _jwks = (b'{"keys":[]}', "")
+        _current_kid = None
+        _loaded_at = 0.0
+        _refetched_at = 0.0
@@ -0,0 +1,509 @@
+"""Outbound mail queue with pluggable transports.
+
+Routes call ``send`` and return as soon as the message is queued;
+rendering and delivery happen on the flusher.  Routes whose response time
+must not depend on whether mail was sent call ``send_now`` instead, which
+hands the message to the transport inside the request.  The pipeline
+mirrors ``app.write_behind``:
+
+* Messages wait in a bounded in-process queue (``MAIL_MAX_PENDING``).
+  When it is full the enqueuing request flushes inline rather than drop
+  mail.
+* A periodic task started in the app lifespan sends up to
+  ``MAIL_BATCH_SIZE`` messages per transport call; the lifespan shutdown
+  drains the queue, so on Lambda mail goes out before the invocation
+  returns.
+* A failed message is retried after a jittered exponential backoff, at
+  most ``_MAX_ATTEMPTS`` times.  Rejections that cannot succeed on retry
+  (``MailRejected``) are dropped at once.
+
+Bodies are rendered from ``templates/email/<name>.txt`` and, if present,
+``templates/email/<name>.html`` with Jinja2, HTML autoescaped.  Jinja2 and
+``smtplib`` are imported on first use, so importing this module is cheap.
+
+``MAIL_TRANSPORT`` selects the transport:
+
+* ``sqs``: a JSON description of each message is put on ``MAIL_QUEUE_URL``
+  (``SendMessageBatch``) and the queue invokes ``handle_sqs_event``, which
+  renders and delivers through ``MAIL_DELIVERY_TRANSPORT``.  The handoff is
+  durable and costs one SQS call, so nothing waits on SES.
+* ``ses``: Amazon SES ``SendEmail`` through boto3, one call per message,
+  run concurrently.
+* ``smtp``: one SMTP connection per batch (``MAIL_SMTP_*``).
+* ``file`` (default): writes each message as an ``.eml`` file under
+  ``MAIL_FILE_DIR``, for local development.
+* ``memory``: appends to ``outbox``, for tests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from email.message import EmailMessage
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional
+
+from . import config
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+_MAX_ATTEMPTS = 5
+_SES_CONCURRENCY = 8
+_SQS_BATCH_SIZE = 10
+
+
+class MailRejected(Exception):
+    """Raised by a transport for a message that must not be retried."""
+
+
+class Message:
+    """A queued message, rendered from ``template`` at send time."""
+
+    __slots__ = ("to", "subject", "template", "context", "attempts", "not_before")
+
+    def __init__(self, to: str, subject: str, template: str, context: Dict[str, Any]):
+        self.to = to
+        self.subject = subject
+        self.template = template
+        self.context = context
+        self.attempts = 0
+        self.not_before = 0.0
+
+    def render(self) -> EmailMessage:
+        """Build the MIME message from the templates."""
+        from jinja2 import TemplateNotFound
+
+        env = _environment()
+        message = EmailMessage()
+        message["From"] = config.MAIL_FROM
+        message["To"] = self.to
+        message["Subject"] = self.subject
+        domain = config.MAIL_FROM.rpartition("@")[2] or "localhost"
+        message["Message-ID"] = f"<{uuid.uuid4()}@{domain}>"
+        message.set_content(env.get_template(f"email/{self.template}.txt").render(self.context))
+        try:
+            html = env.get_template(f"email/{self.template}.html").render(self.context)
+        except TemplateNotFound:
+            html = None
+        if html is not None:
+            message.add_alternative(html, subtype="html")
+        return message
+
+
+    def to_json(self) -> str:
+        """Serialize the message for ``SqsTransport``."""
+        return json.dumps({
+            "to": self.to,
+            "subject": self.subject,
+            "template": self.template,
+            "context": self.context,
+        })
+
+    @classmethod
+    def from_json(cls, body: str) -> "Message":
+        """Inverse of ``to_json``."""
+        data = json.loads(body)
+        return cls(data["to"], data["subject"], data["template"], data["context"])
+
+
+_env: Optional["Environment"] = None
+
+
+def _environment() -> "Environment":
+    global _env
+    if _env is None:
+        from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+        from .templating import TEMPLATES_DIR
+
+        _env = Environment(
+            loader=FileSystemLoader(str(TEMPLATES_DIR)),
+            autoescape=select_autoescape(["html"]),
+        )
+    return _env
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+
+class Transport:
+    """Delivers batches of rendered messages."""
+
+    async def send(self, batch: List[Message]) -> List[Message]:
+        """Send ``batch``; return the messages that should be retried."""
+        raise NotImplementedError
+
+
+class SesTransport(Transport):
+    """Amazon SES ``SendEmail`` (raw MIME), one concurrent call per message."""
+
+    def __init__(self):
+        self._client = None
+
+    def _ses(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("ses")
+        return self._client
+
+    def _send_one(self, message: Message) -> None:
+        rendered = message.render()
+        try:
+            self._ses().send_raw_email(
+                Source=config.MAIL_FROM,
+                Destinations=[message.to],
+                RawMessage={"Data": rendered.as_bytes()},
+            )
+        except Exception as exc:
+            code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+            if code in ("MessageRejected", "MailFromDomainNotVerifiedException"):
+                raise MailRejected(code) from exc
+            raise
+
+    async def send(self, batch: List[Message]) -> List[Message]:
+        gate = asyncio.Semaphore(_SES_CONCURRENCY)
+
+        async def one(message: Message) -> Optional[Message]:
+            async with gate:
+                try:
+                    await asyncio.to_thread(self._send_one, message)
+                except MailRejected as exc:
+                    print(f"Mail to {message.to} rejected: {exc!r}")
+                except Exception as exc:
+                    print(f"Mail to {message.to} failed: {exc!r}")
+                    return message
+            return None
+
+        results = await asyncio.gather(*(one(message) for message in batch))
+        return [message for message in results if message is not None]
+
+
+class SqsTransport(Transport):
+    """Puts messages on ``MAIL_QUEUE_URL`` for ``handle_sqs_event``."""
+
+    def __init__(self, queue_url: str):
+        self.queue_url = queue_url
+        self._client = None
+
+    def _sqs(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("sqs")
+        return self._client
+
+    def _send_batch(self, batch: List[Message]) -> List[Message]:
+        failed: List[Message] = []
+        for start in range(0, len(batch), _SQS_BATCH_SIZE):
+            chunk = batch[start:start + _SQS_BATCH_SIZE]
+            try:
+                response = self._sqs().send_message_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[
+                        {"Id": str(index), "MessageBody": message.to_json()}
+                        for index, message in enumerate(chunk)
+                    ],
+                )
+            except Exception as exc:
+                print(f"SQS mail handoff failed: {exc!r}")
+                failed.extend(chunk)
+                continue
+            for entry in response.get("Failed", []):
+                print(f"SQS mail handoff failed: {entry.get('Code')}")
+                failed.append(chunk[int(entry["Id"])])
+        return failed
+
+    async def send(self, batch: List[Message]) -> List[Message]:
+        return await asyncio.to_thread(self._send_batch, batch)
+
+
+class SmtpTransport(Transport):
+    """SMTP relay; each batch is sent over one connection."""
+
+    def _send_batch(self, batch: List[Message]) -> List[Message]:
+        import smtplib
+
+        failed: List[Message] = []
+        try:
+            smtp = smtplib.SMTP(config.MAIL_SMTP_HOST, config.MAIL_SMTP_PORT, timeout=10)
+        except OSError as exc:
+            print(f"SMTP connection failed: {exc!r}")
+            return list(batch)
+        with smtp:
+            if config.MAIL_SMTP_STARTTLS:
+                smtp.starttls()
+            if config.MAIL_SMTP_USER:
+                smtp.login(config.MAIL_SMTP_USER, config.MAIL_SMTP_PASSWORD)
+            for index, message in enumerate(batch):
+                try:
+                    smtp.send_message(message.render())
+                except smtplib.SMTPRecipientsRefused as exc:
+                    print(f"Mail to {message.to} rejected: {exc!r}")
+                except (smtplib.SMTPServerDisconnected, OSError) as exc:
+                    # The connection is gone; retry everything not yet sent.
+                    print(f"SMTP connection lost: {exc!r}")
+                    failed.extend(batch[index:])
+                    break
+                except Exception as exc:
+                    print(f"Mail to {message.to} failed: {exc!r}")
+                    failed.append(message)
+        return failed
+
+    async def send(self, batch: List[Message]) -> List[Message]:
+        return await asyncio.to_thread(self._send_batch, batch)
+
+
+class FileTransport(Transport):
+    """Writes each message to ``<directory>/<timestamp>-<id>.eml``."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _write(self, batch: List[Message]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for message in batch:
+            name = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.eml"
+            path = os.path.join(self.directory, name)
+            with open(path, "wb") as fh:
+                fh.write(message.render().as_bytes())
+
+    async def send(self, batch: List[Message]) -> List[Message]:
+        await asyncio.to_thread(self._write, batch)
+        return []
+
+
+outbox: List[EmailMessage] = []
+
+
+class MemoryTransport(Transport):
+    """Appends rendered messages to the module-level ``outbox``."""
+
+    async def send(self, batch: List[Message]) -> List[Message]:
+        outbox.extend(message.render() for message in batch)
+        return []
+
+
+_transport: Optional[Transport] = None
+_delivery_transport: Optional[Transport] = None
+
+
+def _make_transport(kind: str) -> Transport:
+    if kind == "sqs":
+        return SqsTransport(config.MAIL_QUEUE_URL)
+    if kind == "ses":
+        return SesTransport()
+    if kind == "smtp":
+        return SmtpTransport()
+    if kind == "memory":
+        return MemoryTransport()
+    return FileTransport(config.MAIL_FILE_DIR)
+
+
+def get_transport() -> Transport:
+    """Return the transport selected by ``MAIL_TRANSPORT``."""
+    global _transport
+    if _transport is None:
+        _transport = _make_transport(config.MAIL_TRANSPORT)
+    return _transport
+
+
+def get_delivery_transport() -> Transport:
+    """Return the transport ``handle_sqs_event`` delivers through."""
+    global _delivery_transport
+    if _delivery_transport is None:
+        _delivery_transport = _make_transport(config.MAIL_DELIVERY_TRANSPORT)
+    return _delivery_transport
+
+
+def set_transport(transport: Optional[Transport], delivery: Optional[Transport] = None) -> None:
+    """Replace the transports (``None`` recreates them from config)."""
+    global _transport, _delivery_transport
+    _transport = transport
+    _delivery_transport = delivery
+
+
+# ---------------------------------------------------------------------------
+# Queue
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_pending: Deque[Message] = deque()
+_task: Optional[asyncio.Task] = None
+
+
+async def send(to: str, subject: str, template: str, context: Dict[str, Any]) -> None:
+    """Queue a message for delivery.
+
+    Args:
+        to: Recipient address.
+        subject: Subject line.
+        template: Template name under ``templates/email/`` without extension.
+        context: Template variables.
+    """
+    with _lock:
+        _pending.append(Message(to, subject, template, context))
+        full = len(_pending) >= config.MAIL_MAX_PENDING
+    if full:
+        await flush()
+
+
+async def send_now(to: str, subject: str, template: str, context: Dict[str, Any]) -> None:
+    """Hand a message to the transport before returning.
+
+    If the transport fails the message is queued for retry like one from
+    ``send``.  Arguments are as for ``send``.
+    """
+    message = Message(to, subject, template, context)
+    try:
+        failed = await get_transport().send([message])
+    except Exception as exc:
+        print(f"Mail to {to} failed: {exc!r}")
+        failed = [message]
+    if failed:
+        _retry(failed, time.monotonic())
+
+
+def pending() -> int:
+    """Return the number of messages waiting to be sent."""
+    return len(_pending)
+
+
+def _take_due(now: float) -> List[Message]:
+    with _lock:
+        due = [message for message in _pending if message.not_before <= now]
+        for message in due:
+            _pending.remove(message)
+    return due
+
+
+def _retry(messages: List[Message], now: float) -> None:
+    with _lock:
+        for message in messages:
+            message.attempts += 1
+            if message.attempts >= _MAX_ATTEMPTS:
+                print(f"Dropping mail to {message.to} after {message.attempts} attempts")
+                continue
+            message.not_before = now + random.uniform(0, 0.1 * 2 ** message.attempts)
+            _pending.append(message)
+
+
+async def flush() -> int:
+    """Send every message that is due.
+
+    Returns:
+        The number of messages taken off the queue (including any that
+        failed and were re-queued).
+    """
+    now = time.monotonic()
+    messages = _take_due(now)
+    if not messages:
+        return 0
+    transport = get_transport()
+    failed: List[Message] = []
+    size = max(config.MAIL_BATCH_SIZE, 1)
+    for start in range(0, len(messages), size):
+        batch = messages[start:start + size]
+        try:
+            failed.extend(await transport.send(batch))
+        except Exception as exc:
+            print(f"Mail batch failed: {exc!r}")
+            failed.extend(batch)
+    if failed:
+        _retry(failed, time.monotonic())
+    return len(messages)
+
+
+async def _run_periodically() -> None:
+    while True:
+        await asyncio.sleep(config.MAIL_FLUSH_SECONDS)
+        try:
+            await flush()
+        except Exception as exc:
+            print(f"Mail flush failed: {exc!r}")
+
+
+def start() -> None:
+    """Start the periodic sender on the running event loop."""
+    global _task
+    loop = asyncio.get_running_loop()
+    if _task is not None and not _task.done() and _task.get_loop() is loop:
+        return
+    _task = loop.create_task(_run_periodically())
+
+
+async def stop() -> None:
+    """Stop the periodic sender and drain the queue, waiting out retries."""
+    global _task
+    task, _task = _task, None
+    if task is not None and not task.done():
+        # A task left behind on a previous, closed loop cannot be awaited.
+        with contextlib.suppress(RuntimeError):
+            task.cancel()
+            if task.get_loop() is asyncio.get_running_loop():
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+    while _pending:
+        await flush()
+        with _lock:
+            wait = min((m.not_before for m in _pending), default=None)
+        if wait is not None:
+            await asyncio.sleep(max(wait - time.monotonic(), 0))
+
+
+# ---------------------------------------------------------------------------
+# SQS consumer
+# ---------------------------------------------------------------------------
+
+
+def is_sqs_event(event: Any) -> bool:
+    """Return ``True`` if ``event`` is an SQS batch for ``handle_sqs_event``."""
+    records = event.get("Records") if isinstance(event, dict) else None
+    return bool(records) and records[0].get("eventSource") == "aws:sqs"
+
+
+async def deliver_records(records: List[Dict[str, Any]]) -> List[str]:
+    """Deliver the messages in SQS ``records``.
+
+    Returns:
+        The ``messageId`` of every record that should be redelivered.
+    """
+    by_message: Dict[int, str] = {}
+    batch: List[Message] = []
+    for record in records:
+        try:
+            message = Message.from_json(record["body"])
+        except (KeyError, TypeError, ValueError) as exc:
+            # Redelivery cannot fix a malformed body; let it go.
+            print(f"Dropping malformed mail record {record.get('messageId')}: {exc!r}")
+            continue
+        by_message[id(message)] = record["messageId"]
+        batch.append(message)
+    if not batch:
+        return []
+    try:
+        failed = await get_delivery_transport().send(batch)
+    except Exception as exc:
+        print(f"Mail batch failed: {exc!r}")
+        failed = batch
+    return [by_message[id(message)] for message in failed]
+
+
+def handle_sqs_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Lambda entry point for the mail queue.
+
+    Failed records are reported as ``batchItemFailures`` so SQS redelivers
+    only those (``ReportBatchItemFailures``), up to the queue's
+    ``maxReceiveCount`` before they move to the dead-letter queue.
+    """
+    failed = asyncio.run(deliver_records(event["Records"]))
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed]}
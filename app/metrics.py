@@ -0,0 +1,230 @@
+"""Request-level performance metrics in CloudWatch Embedded Metric Format.
+
+``MetricsMiddleware`` gives every HTTP request a ``Recorder`` held in a
+context variable.  Code on the request path adds to it through
+``record``, ``timer`` and ``record_dynamodb``; calls made outside a
+request (the write-behind flusher, CLI jobs) are ignored.  When the
+response has been sent the middleware emits:
+
+* one request document with dimensions ``Route`` and ``Method``:
+  ``Latency``, ``ColdStart`` (1 on the first request this process
+  serves), and every metric recorded during the request, such as
+  ``ScryptTime``, ``KdfWaitTime`` and ``JwtDecodeTime``;
+* one document per DynamoDB table touched, with dimension ``Table``:
+  ``DynamoDBCalls``, ``DynamoDBLatency`` and
+  ``DynamoDBConsumedCapacity``.
+
+``Route`` is the matched path template (``/resume/resume/{id}``), never
+the raw path, so the number of metric streams stays bounded.
+
+Documents are JSON lines.  On Lambda, stdout goes to CloudWatch Logs,
+which extracts the metrics without any API calls.  ``METRICS_SINK``
+selects ``stdout`` (default), ``memory`` (kept in ``emitted``, for tests
+and benchmarks) or ``off``.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from . import config
+
+_UNITS = ("Milliseconds", "Count", "None")
+
+_recorder: ContextVar[Optional["Recorder"]] = ContextVar("metrics_recorder", default=None)
+_cold = True
+_sink: Optional[Callable[[Dict[str, Any]], None]] = None
+
+emitted: List[Dict[str, Any]] = []
+
+
+class Recorder:
+    """Metrics accumulated during one request.
+
+    Values recorded more than once under the same name are summed.
+    """
+
+    __slots__ = ("values", "units", "tables")
+
+    def __init__(self):
+        self.values: Dict[str, float] = {}
+        self.units: Dict[str, str] = {}
+        self.tables: Dict[str, List[float]] = {}
+
+    def add(self, name: str, value: float, unit: str) -> None:
+        self.values[name] = self.values.get(name, 0) + value
+        self.units[name] = unit
+
+    def add_table(self, table: str, ms: float, capacity: float) -> None:
+        stats = self.tables.setdefault(table, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += ms
+        stats[2] += capacity
+
+
+def enabled() -> bool:
+    """Return ``True`` if a request is currently being recorded."""
+    return _recorder.get() is not None
+
+
+def record(name: str, value: float, unit: str = "Milliseconds") -> None:
+    """Add ``value`` to metric ``name`` for the current request.
+
+    Args:
+        name: Metric name, e.g. ``ScryptTime``.
+        value: Amount to add.
+        unit: ``Milliseconds``, ``Count`` or ``None``.
+    """
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.add(name, value, unit if unit in _UNITS else "None")
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Record the wall time of the ``with`` block in milliseconds."""
+    if _recorder.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000)
+
+
+def record_dynamodb(table: str, ms: float, capacity: float = 0.0) -> None:
+    """Count one DynamoDB call against ``table`` for the current request.
+
+    Args:
+        table: Table name, or ``batch`` for multi-table calls.
+        ms: Call latency in milliseconds.
+        capacity: Capacity units reported in ``ConsumedCapacity``.
+    """
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.add_table(table, ms, capacity)
+
+
+def capacity_by_table(consumed: Any) -> Dict[str, float]:
+    """Sum a ``ConsumedCapacity`` value (a dict or a list of dicts) per table."""
+    if not consumed:
+        return {}
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    totals: Dict[str, float] = {}
+    for entry in consumed:
+        name = entry.get("TableName") or "batch"
+        totals[name] = totals.get(name, 0.0) + float(entry.get("CapacityUnits") or 0)
+    return totals
+
+
+def _document(
+    dimensions: Dict[str, str], values: Dict[str, float], units: Dict[str, str]
+) -> Dict[str, Any]:
+    document: Dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": config.METRICS_NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": units[name]} for name in values],
+            }],
+        },
+    }
+    document.update(dimensions)
+    document.update({name: round(value, 3) for name, value in values.items()})
+    return document
+
+
+def _write_stdout(document: Dict[str, Any]) -> None:
+    sys.stdout.write(json.dumps(document, separators=(",", ":")) + "\n")
+    sys.stdout.flush()
+
+
+def _write_memory(document: Dict[str, Any]) -> None:
+    emitted.append(document)
+
+
+def set_sink(sink: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+    """Send documents to ``sink`` instead of the ``METRICS_SINK`` default."""
+    global _sink
+    _sink = sink
+
+
+def _emit(document: Dict[str, Any]) -> None:
+    sink = _sink
+    if sink is None:
+        sink = _write_memory if config.METRICS_SINK == "memory" else _write_stdout
+    try:
+        sink(document)
+    except Exception as exc:
+        print(f"Metrics emit failed: {exc!r}")
+
+
+def flush(recorder: Recorder, route: str, method: str) -> None:
+    """Emit the documents for one finished request."""
+    _emit(_document(
+        {"Route": route, "Method": method}, recorder.values, recorder.units,
+    ))
+    for table, (calls, ms, capacity) in recorder.tables.items():
+        _emit(_document(
+            {"Table": table},
+            {"DynamoDBCalls": calls, "DynamoDBLatency": ms, "DynamoDBConsumedCapacity": capacity},
+            {
+                "DynamoDBCalls": "Count",
+                "DynamoDBLatency": "Milliseconds",
+                "DynamoDBConsumedCapacity": "Count",
+            },
+        ))
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records and emits metrics for each HTTP request.
+
+    Add it last so it wraps the whole stack, including lazy router
+    imports.
+
+    Args:
+        app: The next ASGI app in the stack.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _cold
+        if scope["type"] != "http" or config.METRICS_SINK == "off":
+            await self.app(scope, receive, send)
+            return
+
+        cold, _cold = _cold, False
+        recorder = Recorder()
+        token = _recorder.set(recorder)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _recorder.reset(token)
+            recorder.add("Latency", (time.perf_counter() - start) * 1000, "Milliseconds")
+            recorder.add("ColdStart", 1 if cold else 0, "Count")
+            recorder.add(f"Status{status['code'] // 100}xx", 1, "Count")
+            flush(recorder, _route_of(scope), scope["method"])
@@ -0,0 +1,246 @@
+"""Opt-in CPU profiling of single Lambda invocations.
+
+``handler.py`` asks ``begin`` whether to profile each invocation.  An
+invocation is profiled when either
+
+* its request carries an ``x-profile`` header equal to ``PROFILE_TOKEN``
+  (the header is ignored while ``PROFILE_TOKEN`` is empty), or
+* a random draw falls under ``PROFILE_SAMPLE_RATE`` (e.g. ``0.01``),
+
+and no other invocation in this container was profiled in the last
+``PROFILE_MIN_INTERVAL_SECONDS``.  The interval caps the overhead however
+the profiler is triggered, so a 1% rate is safe to leave on.
+
+``PROFILE_MODE`` picks the profiler:
+
+* ``sample`` (default): a daemon thread reads every thread's stack each
+  ``PROFILE_INTERVAL_MS`` through ``sys._current_frames``.  The request
+  thread is never interrupted, so the cost is the sampler's own CPU.
+  Output is collapsed stacks (``frame;frame;frame count``), ready for
+  ``flamegraph.pl`` or speedscope.  Threads other than the one serving
+  the request are only counted when busy, so KDF workers show up while
+  deriving a key but idle pool threads do not.
+* ``cprofile``: deterministic ``cProfile`` of the request thread, written
+  as a ``pstats`` dump (or, on stdout, the top functions by cumulative
+  time).  More precise and much slower; use it on demand only.
+
+``PROFILE_OUTPUT`` is ``stdout`` (one JSON line per profile, so it lands
+in CloudWatch Logs) or a directory such as ``/tmp/profiles``.  Extract
+the stacks from a log line with::
+
+    jq -r '.profile.collapsed[]' line.json > login.folded
+"""
+
+from __future__ import annotations
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from . import config
+
+HEADER = "x-profile"
+
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "thread.py")
+_MAX_DEPTH = 128
+_TOP_FUNCTIONS = 40
+
+_lock = threading.Lock()
+_last_started = float("-inf")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _collapse(frame) -> str:
+    names: List[str] = []
+    while frame is not None and len(names) < _MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _idle(frame) -> bool:
+    return os.path.basename(frame.f_code.co_filename) in _IDLE_FILES
+
+
+class Sampler:
+    """Collects collapsed stacks of all threads on a background thread.
+
+    Args:
+        interval: Seconds between samples.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (ident != self._target and _idle(frame)):
+                    continue
+                stack = _collapse(frame)
+                self.stacks[f"{names.get(ident, ident)};{stack}"] += 1
+            self.samples += 1
+
+    def collapsed(self) -> List[str]:
+        """Return ``stack count`` lines, most frequent first."""
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+
+class Session:
+    """One profiled invocation.
+
+    Args:
+        mode: ``sample`` or ``cprofile``.
+        label: Request method and path, for the output.
+        request_id: Lambda request id, used in file names.
+    """
+
+    def __init__(self, mode: str, label: str, request_id: str):
+        self.mode = mode
+        self.label = label
+        self.request_id = request_id
+        self._sampler: Optional[Sampler] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = Sampler(config.PROFILE_INTERVAL_MS / 1000)
+            self._sampler.start()
+
+    def stop(self) -> None:
+        """Stop profiling and write the output."""
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        try:
+            self._write()
+        except Exception as exc:
+            print(f"Profile output failed: {exc!r}")
+
+    def _summary(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "request": self.label,
+            "request_id": self.request_id,
+            "elapsed_ms": round((time.perf_counter() - self._started) * 1000, 2),
+        }
+
+    def _top_functions(self) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(self._profile, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda row: row[1][3], reverse=True)
+        return [
+            {
+                "function": f"{filename}:{line}({name})",
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+            }
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in rows[:_TOP_FUNCTIONS]
+        ]
+
+    def _write(self) -> None:
+        summary = self._summary()
+        output = config.PROFILE_OUTPUT
+        if output == "stdout":
+            if self._sampler is not None:
+                summary["samples"] = self._sampler.samples
+                summary["collapsed"] = self._sampler.collapsed()
+            else:
+                summary["top"] = self._top_functions()
+            print(json.dumps({"profile": summary}))
+            return
+
+        os.makedirs(output, exist_ok=True)
+        if self._sampler is not None:
+            path = os.path.join(output, f"{self.request_id}.folded")
+            with open(path, "w") as fh:
+                fh.write("\n".join(self._sampler.collapsed()) + "\n")
+        else:
+            path = os.path.join(output, f"{self.request_id}.prof")
+            self._profile.dump_stats(path)
+        summary["path"] = path
+        print(json.dumps({"profile": summary}))
+
+
+def _header(event: Dict[str, Any]) -> Optional[str]:
+    headers = event.get("headers") or {}
+    for name, value in headers.items():
+        if name.lower() == HEADER:
+            return value
+    return None
+
+
+def _requested(event: Dict[str, Any]) -> bool:
+    token = config.PROFILE_TOKEN
+    if token:
+        value = _header(event)
+        if value is not None and hmac.compare_digest(value.encode(), token.encode()):
+            return True
+    rate = config.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def _label(event: Dict[str, Any]) -> str:
+    http = event.get("requestContext", {}).get("http", {})
+    method = http.get("method") or event.get("httpMethod", "")
+    path = event.get("rawPath") or event.get("path", "")
+    return f"{method} {path}".strip()
+
+
+def begin(event: Dict[str, Any], context: Any = None) -> Optional[Session]:
+    """Start a profiling session for this invocation if it is due one.
+
+    Args:
+        event: The Lambda event (Function URL or API Gateway).
+        context: The Lambda context; its ``aws_request_id`` names output files.
+
+    Returns:
+        A started ``Session``, or ``None`` when this invocation is not
+        profiled.  Call ``Session.stop`` once the invocation returns.
+    """
+    global _last_started
+    if config.PROFILE_MODE == "off" or not isinstance(event, dict) or not _requested(event):
+        return None
+    now = time.monotonic()
+    with _lock:
+        if now - _last_started < config.PROFILE_MIN_INTERVAL_SECONDS:
+            return None
+        _last_started = now
+    request_id = getattr(context, "aws_request_id", None) or f"local-{int(time.time() * 1000)}"
+    session = Session(config.PROFILE_MODE, _label(event), request_id)
+    session.start()
+    return session
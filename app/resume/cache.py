@@ -0,0 +1,189 @@
+"""Read-through cache of serialized resume documents.
+
+Resume items are read on every public portfolio page view but change
+rarely.  This module keeps a bounded LRU of documents that have already
+been validated against ``ResumeSchema`` and serialized to JSON bytes,
+together with a strong ETag of those bytes, so a warm request is a dict
+lookup and a bytes write.
+
+Entries are fresh for ``RESUME_CACHE_TTL_SECONDS``.  For a further
+``RESUME_CACHE_STALE_SECONDS`` a stale entry is still served while a
+background task re-reads the item (stale-while-revalidate); after that
+the read happens inline.  Missing items and items that fail schema
+validation are cached the same way, so neither reaches DynamoDB (or logs
+the validation error) on every request.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from fastapi import BackgroundTasks
+from pydantic import ValidationError
+
+from .. import config
+from ..aiodb import iter_batch_get, resume_table
+from .resume import ResumeSchema
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, CachedResume]" = OrderedDict()
+_refreshing: Set[str] = set()
+
+
+class CachedResume:
+    """A serialized resume document, or a cached miss or invalid item, and its ETag."""
+
+    __slots__ = ("body", "etag", "fetched_at", "invalid")
+
+    def __init__(self, body: Optional[bytes], fetched_at: float, invalid: bool = False):
+        self.body = body
+        self.etag = None if body is None else f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.fetched_at = fetched_at
+        self.invalid = invalid
+
+
+def serialize(item: dict) -> bytes:
+    """Validate a resume item against ``ResumeSchema`` and encode it.
+
+    Raises:
+        pydantic.ValidationError: If the item does not match the schema.
+    """
+    return ResumeSchema.model_validate(item).model_dump_json().encode()
+
+
+def _key(user_id: str) -> dict:
+    return {"pk": f"USER#{user_id}-personaldata", "sk": "RESUME"}
+
+
+def _entry(user_id: str, item: Optional[dict]) -> CachedResume:
+    """Build a cache entry from a resume item (``None`` if missing).
+
+    An item that fails validation gives an entry with ``invalid`` set.
+    """
+    if item is None:
+        return CachedResume(None, time.monotonic())
+    try:
+        body = serialize(item)
+    except ValidationError as exc:
+        print(f"Resume for {user_id} failed validation: {exc}")
+        return CachedResume(None, time.monotonic(), invalid=True)
+    return CachedResume(body, time.monotonic())
+
+
+async def _load(user_id: str) -> CachedResume:
+    """Read, validate and serialize one resume item."""
+    response = await resume_table().get_item(Key=_key(user_id))
+    return _entry(user_id, response.get("Item"))
+
+
+def _store(user_id: str, entry: CachedResume) -> None:
+    if config.RESUME_CACHE_MAX_ENTRIES <= 0:
+        return
+    with _lock:
+        _entries[user_id] = entry
+        _entries.move_to_end(user_id)
+        while len(_entries) > config.RESUME_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+async def _revalidate(user_id: str) -> None:
+    try:
+        _store(user_id, await _load(user_id))
+    except Exception as exc:
+        print(f"Resume revalidation failed for {user_id}, serving stale: {exc!r}")
+    finally:
+        with _lock:
+            _refreshing.discard(user_id)
+
+
+async def get(user_id: str, background_tasks: BackgroundTasks) -> CachedResume:
+    """Return the cached resume for ``user_id``, reading through on a miss.
+
+    Args:
+        user_id: Resume owner ID (the ``USER#<id>-personaldata`` key).
+        background_tasks: Used to revalidate a stale entry after the
+            response is sent.
+
+    Returns:
+        The cached entry; ``body`` is ``None`` if the item does not exist
+        or does not match ``ResumeSchema`` (then ``invalid`` is set).
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is not None:
+            _entries.move_to_end(user_id)
+
+    if entry is not None:
+        age = now - entry.fetched_at
+        if age < config.RESUME_CACHE_TTL_SECONDS:
+            return entry
+        if age < config.RESUME_CACHE_TTL_SECONDS + config.RESUME_CACHE_STALE_SECONDS:
+            with _lock:
+                schedule = user_id not in _refreshing
+                _refreshing.add(user_id)
+            if schedule:
+                background_tasks.add_task(_revalidate, user_id)
+            return entry
+
+    entry = await _load(user_id)
+    _store(user_id, entry)
+    return entry
+
+
+def peek(user_id: str) -> Optional[CachedResume]:
+    """Return the entry for ``user_id`` if it is fresh, without any I/O."""
+    with _lock:
+        entry = _entries.get(user_id)
+    if entry is None or time.monotonic() - entry.fetched_at >= config.RESUME_CACHE_TTL_SECONDS:
+        return None
+    return entry
+
+
+async def get_many(user_ids: List[str]) -> AsyncIterator[Tuple[str, CachedResume]]:
+    """Yield ``(user_id, entry)`` for each ID, fetching misses in batches.
+
+    Fresh cache entries are yielded first; the rest are read with
+    ``BatchGetItem`` and yielded (and cached) as each batch arrives.  An
+    item that fails schema validation is yielded (and cached) as an entry
+    whose ``body`` and ``etag`` are both ``None`` and ``invalid`` is set.
+
+    Args:
+        user_ids: Resume owner IDs; duplicates are yielded once.
+
+    Raises:
+        aiodb.DynamoDBError: If the batch read fails part-way.
+    """
+    missing: Dict[str, str] = {}
+    for user_id in dict.fromkeys(user_ids):
+        entry = peek(user_id)
+        if entry is not None:
+            yield user_id, entry
+        else:
+            missing[_key(user_id)["pk"]] = user_id
+
+    async for page in iter_batch_get(
+        config.RESUME_TABLE, [_key(user_id) for user_id in missing.values()]
+    ):
+        for item in page:
+            user_id = missing.pop(item["pk"])
+            entry = _entry(user_id, item)
+            _store(user_id, entry)
+            yield user_id, entry
+
+    for user_id in missing.values():
+        entry = _entry(user_id, None)
+        _store(user_id, entry)
+        yield user_id, entry
+
+
+
+def clear() -> None:
+    """Drop every cached resume."""
+    with _lock:
+        _entries.clear()
+        _refreshing.clear()
@@ -1,6 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
+from .. import config
+
 class Site(BaseModel):
     type: str
     id: str
@@ -62,4 +64,11 @@ class ResumeSchema(BaseModel):
 
     class Config:
         # Allows the model to work if you pass it a dict with extra fields
-        extra = "ignore"
\ No newline at end of file
+        extra = "ignore"
+        # DynamoDB numbers arrive as Decimal; accept them for string fields
+        coerce_numbers_to_str = True
+
+class ResumeBatchRequest(BaseModel):
+    """Payload for ``POST /resume/batch``."""
+
+    user_ids: List[str] = Field(min_length=1, max_length=config.BATCH_MAX_IDS)
@@ -1,56 +1,99 @@
 """User service router combining all user endpoints."""
 
-from fastapi import APIRouter
-import os
-import boto3
-# from fastapi import FastAPI, HTTPException
+from typing import AsyncIterator, List
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from .. import config
+from ..conditional import etag_matches
+from ..encoding import dumps
+from . import cache
+from .resume import ResumeBatchRequest
 
 router = APIRouter()
 
-# Initialize the resource
-dynamodb = boto3.resource('dynamodb')
-# Pull the table name from the environment variable we set in SAM
 
-@router.get("/resume/{user_id}")
-async def get_resume(user_id: str):
+async def _resume_response(
+    user_id: str, request: Request, background_tasks: BackgroundTasks
+) -> Response:
+    """Serve a cached resume, answering ``If-None-Match`` with 304."""
+    entry = await cache.get(user_id, background_tasks)
+    if entry.invalid:
+        raise HTTPException(status_code=500, detail="Resume item is invalid")
+    if entry.body is None:
+        raise HTTPException(status_code=404, detail="Resume item not found.")
+
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": (
+            f"public, max-age={config.RESUME_CACHE_MAX_AGE_SECONDS}, "
+            f"stale-while-revalidate={int(config.RESUME_CACHE_STALE_SECONDS)}"
+        ),
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+async def _resume_lines(user_ids: List[str]) -> AsyncIterator[bytes]:
+    """Yield one NDJSON line per requested resume as it becomes available."""
     try:
-        # Your template uses 'USER#<id>-personaldata' as the PK
-        pk_value = f"USER#{user_id}-personaldata"
-        
-        response = resume_table.get_item(
-            Key={
-                'pk': pk_value,
-                'sk': 'RESUME'
-            }
-        )
-        
-        item = response.get('Item')
-        if not item:
-            raise HTTPException(status_code=404, detail="Resume item not found.")
-            
-        return item
-    except Exception as e:
-        # Log this to CloudWatch in production
-        raise HTTPException(status_code=500, detail=str(e))
+        async for user_id, entry in cache.get_many(user_ids):
+            prefix = b'{"user_id":' + dumps(user_id)
+            if entry.body is not None:
+                yield prefix + b',"resume":' + entry.body + b"}\n"
+            elif entry.invalid:
+                yield prefix + b',"error":"invalid"}\n'
+            else:
+                yield prefix + b',"error":"not_found"}\n'
+    except Exception as exc:
+        print(f"Resume batch failed: {exc!r}")
+        yield b'{"error":"unavailable"}\n'
+
+
+@router.post("/batch")
+async def get_resumes(body: ResumeBatchRequest) -> StreamingResponse:
+    """Return several resumes as newline-delimited JSON.
+
+    Cached resumes are written first; the rest are read with
+    ``BatchGetItem`` (100 keys per call, chunks in parallel) and written
+    as each chunk arrives.  Each line is ``{"user_id", "resume"}`` or
+    ``{"user_id", "error"}`` with ``not_found`` or ``invalid``; a read
+    failure part-way ends the stream with ``{"error": "unavailable"}``.
+
+    Args:
+        body: The resume owner IDs, at most ``BATCH_MAX_IDS``.
 
+    Returns:
+        An ``application/x-ndjson`` stream in completion order.
+    """
+    return StreamingResponse(_resume_lines(body.user_ids), media_type="application/x-ndjson")
+
+
+# Declared before ``/resume/{user_id}`` so "default" is not taken as an ID.
 @router.get("/resume/default")
-async def get_default_resume() -> dict:
-    try:
-        # Your template uses 'USER#<id>-personaldata' as the PK
-        pk_value = f"USER#brudow317-personaldata"
-        
-        response = resume_table.get_item(
-            Key={
-                'pk': pk_value,
-                'sk': 'RESUME'
-            }
-        )
-        
-        item = response.get('Item')
-        if not item:
-            raise HTTPException(status_code=404, detail="Resume item not found.")
-            
-        return item
-    except Exception as e:
-        # Log this to CloudWatch in production
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+async def get_default_resume(request: Request, background_tasks: BackgroundTasks) -> Response:
+    """Return the site owner's resume (``RESUME_DEFAULT_USER``)."""
+    return await _resume_response(config.RESUME_DEFAULT_USER, request, background_tasks)
+
+
+@router.get("/resume/{user_id}")
+async def get_resume(user_id: str, request: Request, background_tasks: BackgroundTasks) -> Response:
+    """Return a user's resume document.
+
+    The ``USER#<id>-personaldata`` / ``RESUME`` item is served from the
+    in-process cache as pre-serialized JSON with a strong ``ETag``.
+
+    Args:
+        user_id: Resume owner ID.
+
+    Returns:
+        The resume JSON, or 304 if ``If-None-Match`` matches the ETag.
+
+    Raises:
+        HTTPException: 404 if no resume exists for ``user_id``.  500 if
+            the stored item does not match ``ResumeSchema``.
+    """
+    return await _resume_response(user_id, request, background_tasks)
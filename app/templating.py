@@ -0,0 +1,152 @@
+"""Jinja2 environment for the admin SSR pages.
+
+Jinja2 normally parses and compiles each template on its first render,
+inside a request.  ``build`` does that ahead of time: it compiles the
+admin templates into Python modules (and their bytecode) under
+``ADMIN_TEMPLATES_COMPILED_DIR``, and the environment loads them through
+a ``ModuleLoader``.
+
+Compiled modules carry no freshness check of their own, so ``build`` also
+records a digest of the template sources in ``manifest.json``.  The
+bundle is used only while that digest matches the sources on disk; after
+any edit the environment ignores the whole bundle and compiles from
+source, as it does when there is no bundle.  The templates are loaded
+when this module is imported, so the first admin request renders without
+compiling either way.
+
+``render_cached`` keeps the rendered HTML of pages whose output depends
+only on their context, such as the admin forms, in a small LRU keyed by
+template and context.
+
+``sam build`` builds the bundle (``build-FastApiFunction`` in the
+``Makefile``).  For local runs, build it with::
+
+    python -m app.templating
+"""
+
+from __future__ import annotations
+
+import compileall
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import ChoiceLoader, Environment, FileSystemLoader, ModuleLoader
+
+from . import config
+
+TEMPLATES_DIR = Path(__file__).resolve().parents[1] / "templates"
+ADMIN_TEMPLATES = (
+    "admin/base.html",
+    "admin/users_form.html",
+    "admin/result.html",
+    "admin/password_reset_form.html",
+    "admin/login.html",
+)
+
+MANIFEST = "manifest.json"
+
+_lock = threading.Lock()
+_fragments: "OrderedDict[Tuple, str]" = OrderedDict()
+
+
+def _source_environment() -> Environment:
+    # Same autoescape setting Starlette's Jinja2Templates uses by default.
+    return Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)), autoescape=True)
+
+
+def source_digest() -> str:
+    """Return a digest of every admin template source, names included."""
+    digest = hashlib.sha256()
+    for name in sorted(ADMIN_TEMPLATES):
+        digest.update(name.encode() + b"\0")
+        digest.update((TEMPLATES_DIR / name).read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+def build(target: str = config.ADMIN_TEMPLATES_COMPILED_DIR) -> int:
+    """Compile the admin templates into importable modules under ``target``.
+
+    Returns:
+        The number of templates compiled.
+    """
+    os.makedirs(target, exist_ok=True)
+    env = _source_environment()
+    names = [name for name in env.list_templates() if name in ADMIN_TEMPLATES]
+    env.compile_templates(
+        target, zip=None, filter_func=lambda name: name in names, ignore_errors=False
+    )
+    compileall.compile_dir(target, quiet=1)
+    # Written last, so an interrupted build leaves no valid manifest.
+    with open(os.path.join(target, MANIFEST), "w") as fh:
+        json.dump({"sources": source_digest()}, fh)
+    return len(names)
+
+
+def _bundle_digest(compiled_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(compiled_dir, MANIFEST)) as fh:
+            return json.load(fh).get("sources")
+    except (OSError, ValueError):
+        return None
+
+
+def environment() -> Environment:
+    """Return an environment that uses the precompiled bundle if it is current."""
+    loaders = [FileSystemLoader(str(TEMPLATES_DIR))]
+    compiled_dir = config.ADMIN_TEMPLATES_COMPILED_DIR
+    if compiled_dir and os.path.isdir(compiled_dir):
+        if _bundle_digest(compiled_dir) == source_digest():
+            loaders.insert(0, ModuleLoader(compiled_dir))
+        else:
+            print(f"Ignoring stale admin template bundle in {compiled_dir}; run python -m app.templating")
+    return Environment(loader=ChoiceLoader(loaders), autoescape=True)
+
+
+def render_cached(name: str, context: Dict[str, Any]) -> str:
+    """Render ``name`` once per context, then serve it from memory.
+
+    Only use this for templates whose output is fully determined by
+    ``context`` (no request-specific values such as CSRF tokens).
+
+    Args:
+        name: Template name, e.g. ``admin/users_form.html``.
+        context: Template variables; values must be hashable.
+
+    Returns:
+        The rendered HTML.
+    """
+    cache_key = (name, tuple(sorted(context.items())))
+    with _lock:
+        html = _fragments.get(cache_key)
+        if html is not None:
+            _fragments.move_to_end(cache_key)
+            return html
+    html = templates.get_template(name).render(context)
+    if config.ADMIN_FRAGMENT_CACHE_MAX_ENTRIES > 0:
+        with _lock:
+            _fragments[cache_key] = html
+            while len(_fragments) > config.ADMIN_FRAGMENT_CACHE_MAX_ENTRIES:
+                _fragments.popitem(last=False)
+    return html
+
+
+def clear_cache() -> None:
+    """Drop all cached renders."""
+    with _lock:
+        _fragments.clear()
+
+
+templates = Jinja2Templates(env=environment())
+for _name in ADMIN_TEMPLATES:
+    templates.get_template(_name)
+
+
+if __name__ == "__main__":
+    count = build()
+    print(f"Compiled {count} templates into {config.ADMIN_TEMPLATES_COMPILED_DIR}")
@@ -0,0 +1,211 @@
+"""Tenant registry: API-key records indexed by key hash.
+
+Every tenant-scoped request presents an ``x-api-key``.  Keys are never
+stored: each record holds the SHA-256 of its key plus the tenant it maps
+to (``client_id``, ``site_id``).  The records are loaded into a dict
+keyed by that hash, so a lookup is one hash and one dict probe.  Only
+digests are ever compared, never key material, so lookup timing reveals
+nothing an attacker can use to guess a key byte by byte.
+
+``TENANT_REGISTRY_SOURCE`` picks where records come from:
+
+* ``file`` (default): a JSON list of ``{"key_hash", "client_id",
+  "site_id"}`` objects at ``TENANT_REGISTRY_FILE``.
+* ``dynamodb``: the ``API_KEYS_TABLE`` table, partition key
+  ``key_hash``.
+
+The index is reloaded every ``TENANT_REGISTRY_REFRESH_SECONDS``.  One
+request performs the reload while concurrent requests keep using the
+current index.  With the DynamoDB source, a key missing from the index
+is looked up once with ``GetItem``, so new tenants work before the next
+reload.  Unknown key hashes are remembered for
+``TENANT_NEGATIVE_CACHE_SECONDS``, so a brute-force key scan is answered
+from memory instead of the backing store.  Records with ``disabled`` set
+are treated as unknown.
+
+Generate a key and its record with::
+
+    python -m app.tenants create --client ClientCustomerC --site SiteA
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from . import config
+from .aiodb import api_keys_table
+
+_MAX_NEGATIVE_ENTRIES = 10000
+
+_lock = threading.Lock()
+_index: Dict[str, Dict[str, str]] = {}
+_loaded_at: Optional[float] = None
+_refreshing = False
+_negative: "OrderedDict[str, float]" = OrderedDict()
+
+
+def hash_key(api_key: str) -> str:
+    """Return the hex SHA-256 under which an API key is stored."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _tenant(record: dict) -> Optional[Dict[str, str]]:
+    if record.get("disabled"):
+        return None
+    return {"client_id": record["client_id"], "site_id": record["site_id"]}
+
+
+def _build(records: List[dict]) -> Dict[str, Dict[str, str]]:
+    index = {}
+    for record in records:
+        tenant = _tenant(record)
+        if tenant is not None:
+            index[record["key_hash"]] = tenant
+    return index
+
+
+def _load_file() -> List[dict]:
+    with open(config.TENANT_REGISTRY_FILE) as fh:
+        return json.load(fh)
+
+
+async def _load_table() -> List[dict]:
+    table = api_keys_table()
+    params = {
+        "ProjectionExpression": "key_hash, client_id, site_id, disabled",
+    }
+    records: List[dict] = []
+    while True:
+        response = await table.scan(**params)
+        records.extend(response.get("Items", []))
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return records
+        params["ExclusiveStartKey"] = last_key
+
+
+async def _fetch_one(key_hash: str) -> Optional[Dict[str, str]]:
+    response = await api_keys_table().get_item(Key={"key_hash": key_hash})
+    item = response.get("Item")
+    return None if item is None else _tenant(item)
+
+
+async def _ensure_fresh() -> None:
+    """Reload the index if it is older than the refresh interval."""
+    global _index, _loaded_at, _refreshing
+    now = time.monotonic()
+    if _loaded_at is not None and now - _loaded_at < config.TENANT_REGISTRY_REFRESH_SECONDS:
+        return
+    with _lock:
+        if _refreshing and _loaded_at is not None:
+            return
+        _refreshing = True
+    try:
+        if config.TENANT_REGISTRY_SOURCE == "dynamodb":
+            records = await _load_table()
+        else:
+            records = _load_file()
+        index = _build(records)
+    except Exception as exc:
+        if _loaded_at is None:
+            raise
+        print(f"Tenant registry refresh failed, keeping loaded index: {exc!r}")
+        index = _index
+    finally:
+        with _lock:
+            _refreshing = False
+    with _lock:
+        _index = index
+        _loaded_at = now
+        _negative.clear()
+
+
+def _negatively_cached(key_hash: str, now: float) -> bool:
+    with _lock:
+        expires_at = _negative.get(key_hash)
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            del _negative[key_hash]
+            return False
+        return True
+
+
+def _remember_unknown(key_hash: str, now: float) -> None:
+    with _lock:
+        _negative[key_hash] = now + config.TENANT_NEGATIVE_CACHE_SECONDS
+        _negative.move_to_end(key_hash)
+        while len(_negative) > _MAX_NEGATIVE_ENTRIES:
+            _negative.popitem(last=False)
+
+
+async def lookup(api_key: str) -> Optional[Dict[str, str]]:
+    """Return the tenant for an API key, or ``None`` if it is unknown.
+
+    Args:
+        api_key: The raw ``x-api-key`` value.
+
+    Returns:
+        A dict with ``client_id`` and ``site_id``, or ``None``.
+    """
+    await _ensure_fresh()
+    key_hash = hash_key(api_key)
+    tenant = _index.get(key_hash)
+    if tenant is not None:
+        return tenant
+
+    now = time.monotonic()
+    if _negatively_cached(key_hash, now):
+        return None
+    tenant = None
+    if config.TENANT_REGISTRY_SOURCE == "dynamodb":
+        try:
+            tenant = await _fetch_one(key_hash)
+        except Exception as exc:
+            print(f"Tenant lookup failed: {exc!r}")
+            return None
+    if tenant is None:
+        _remember_unknown(key_hash, now)
+        return None
+    with _lock:
+        _index[key_hash] = tenant
+    return tenant
+
+
+def reset() -> None:
+    """Drop the loaded index and negative cache."""
+    global _index, _loaded_at
+    with _lock:
+        _index = {}
+        _loaded_at = None
+        _negative.clear()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage tenant API keys.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="generate a key and print its record")
+    create.add_argument("--client", required=True)
+    create.add_argument("--site", required=True)
+    hashed = commands.add_parser("hash", help="print the key_hash of an existing key")
+    hashed.add_argument("api_key")
+    args = parser.parse_args(argv)
+
+    if args.command == "hash":
+        print(hash_key(args.api_key))
+        return
+    api_key = secrets.token_urlsafe(32)
+    record = {"key_hash": hash_key(api_key), "client_id": args.client, "site_id": args.site}
+    print(f"API key (shown once): {api_key}")
+    print(json.dumps(record))
+
+
+if __name__ == "__main__":
+    main()
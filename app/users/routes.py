@@ -1,11 +1,24 @@
 """User routes."""
 
+from typing import AsyncIterator, List
+
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
-from ..auth.dependencies import get_current_user
+from .. import config
+from ..aiodb import iter_batch_get
+from ..auth.dependencies import get_current_user, get_tenant_admin
+from ..auth.user_store import public_projection
+from ..encoding import dumps
 
 router = APIRouter()
 
+class UserBatchRequest(BaseModel):
+    """Payload for ``POST /user/batch``."""
+
+    user_ids: List[str] = Field(min_length=1, max_length=config.BATCH_MAX_IDS)
+
 @router.get("/user")
 def get_user(user: dict = Depends(get_current_user)) -> dict:
     """Return the authenticated user's profile from the JWT claims.
@@ -35,6 +48,64 @@ def ready() -> dict:
     """
     return {"status": "ready"}
 
+
+async def _user_lines(user_ids: List[str]) -> AsyncIterator[bytes]:
+    """Yield one NDJSON line per requested user as batches arrive."""
+    missing = dict.fromkeys(user_ids)
+    projection, names = public_projection()
+    try:
+        async for page in iter_batch_get(
+            config.USERS_TABLE,
+            [{"user_id": user_id} for user_id in missing],
+            ProjectionExpression=projection,
+            ExpressionAttributeNames=names,
+        ):
+            for item in page:
+                missing.pop(item["user_id"], None)
+                yield dumps({"user_id": item["user_id"], "user": item}) + b"\n"
+    except Exception as exc:
+        print(f"User batch failed: {exc!r}")
+        yield b'{"error":"unavailable"}\n'
+        return
+    for user_id in missing:
+        yield dumps({"user_id": user_id, "error": "not_found"}) + b"\n"
+
+
+@router.post("/batch")
+async def get_users(
+    body: UserBatchRequest, user: dict = Depends(get_tenant_admin)
+) -> StreamingResponse:
+    """Return several users of the caller's tenant as newline-delimited JSON.
+
+    Only tenant admins may call this: user IDs contain the email, so for
+    anyone else it would reveal which addresses have accounts, which
+    ``POST /auth/password-reset`` is careful not to do.
+
+    Users are read with ``BatchGetItem`` (100 keys per call, chunks in
+    parallel) and written as each chunk arrives.  IDs outside the
+    caller's client/site are reported as ``not_found`` without a read.
+
+    Args:
+        body: Tenant-scoped user IDs, at most ``BATCH_MAX_IDS``.
+        user: Decoded JWT payload of a tenant admin.
+
+    Returns:
+        An ``application/x-ndjson`` stream of ``{"user_id", "user"}`` or
+        ``{"user_id", "error"}`` lines in completion order.
+    """
+    prefix = f"{user.get('client_id')}#{user.get('site_id')}#"
+    own = [user_id for user_id in body.user_ids if user_id.startswith(prefix)]
+    foreign = [user_id for user_id in dict.fromkeys(body.user_ids) if not user_id.startswith(prefix)]
+
+    async def lines() -> AsyncIterator[bytes]:
+        for user_id in foreign:
+            yield dumps({"user_id": user_id, "error": "not_found"}) + b"\n"
+        if own:
+            async for line in _user_lines(own):
+                yield line
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 """Entity service router.
 
 from fastapi import APIRouter
@@ -44,5 +115,3 @@ from .user_profile import router as user_profile_router
 router = APIRouter()
 router.include_router(user_profile_router)
 """
-
-
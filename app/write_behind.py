@@ -0,0 +1,247 @@
+"""Write-behind queue for DynamoDB writes that are not needed for the response.
+
+Writes such as ``last_login`` bookkeeping are accepted here and returned
+from immediately.  Pending writes are coalesced per table and key (a
+later write to the same key replaces an earlier one), then flushed:
+
+* ``put`` and ``delete`` entries go out in ``BatchWriteItem`` chunks of
+  25, with ``UnprocessedItems`` retried with backoff.
+* ``update`` entries are sent as concurrent ``UpdateItem`` calls, since
+  ``BatchWriteItem`` cannot express partial updates.  A failed
+  ``ConditionExpression`` drops the write, as it would inline.
+
+Flushes run from a periodic task started in the app lifespan and from
+the lifespan shutdown.  Mangum runs the lifespan around every
+invocation, so on Lambda the queue is drained before each invocation
+returns; under uvicorn it is drained on shutdown.  The queue is bounded
+by ``WRITE_BEHIND_MAX_PENDING``: once full, the enqueuing request flushes
+inline instead of dropping writes.  Writes that fail are re-queued up to
+``_MAX_ATTEMPTS`` times unless a newer write for the same key arrived.
+``stop`` keeps flushing, with backoff, until those retries succeed or
+run out, so a frozen or recycled container does not silently lose them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import random
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import aiodb, config
+
+_BATCH_SIZE = 25
+_MAX_ATTEMPTS = 5
+_UPDATE_CONCURRENCY = 10
+
+
+class _Write:
+    """A pending put, delete or update."""
+
+    __slots__ = ("kind", "table", "key", "params", "attempts")
+
+    def __init__(self, kind: str, table: str, key: Dict[str, Any], params: Dict[str, Any]):
+        self.kind = kind
+        self.table = table
+        self.key = key
+        self.params = params
+        self.attempts = 0
+
+    def slot(self) -> Tuple:
+        """Coalescing key: item writes share a slot, updates are per expression."""
+        frozen = tuple(sorted(self.key.items()))
+        expression = self.params.get("UpdateExpression") if self.kind == "update" else None
+        return (self.table, frozen, expression)
+
+
+_lock = threading.Lock()
+_pending: "OrderedDict[Tuple, _Write]" = OrderedDict()
+_task: Optional[asyncio.Task] = None
+
+
+async def _enqueue(write: _Write) -> None:
+    with _lock:
+        slot = write.slot()
+        _pending.pop(slot, None)
+        _pending[slot] = write
+        full = len(_pending) >= config.WRITE_BEHIND_MAX_PENDING
+    if full:
+        await flush()
+
+
+async def put(table: str, key: Dict[str, Any], item: Dict[str, Any]) -> None:
+    """Queue a ``PutItem``.
+
+    Args:
+        table: Table name.
+        key: The item's primary key attributes (used for coalescing).
+        item: The full item to write.
+    """
+    await _enqueue(_Write("put", table, key, {"Item": item}))
+
+
+async def delete(table: str, key: Dict[str, Any]) -> None:
+    """Queue a ``DeleteItem``.
+
+    Args:
+        table: Table name.
+        key: Primary key of the item to delete.
+    """
+    await _enqueue(_Write("delete", table, key, {}))
+
+
+async def update(table: str, key: Dict[str, Any], **params: Any) -> None:
+    """Queue an ``UpdateItem``.
+
+    Args:
+        table: Table name.
+        key: Primary key of the item to update.
+        **params: ``UpdateExpression`` and the other ``update_item``
+            arguments.  A queued update with the same expression for the
+            same key is replaced.
+    """
+    await _enqueue(_Write("update", table, key, params))
+
+
+def pending() -> int:
+    """Return the number of writes waiting to be flushed."""
+    return len(_pending)
+
+
+def _requeue(writes: List[_Write]) -> None:
+    with _lock:
+        for write in writes:
+            write.attempts += 1
+            slot = write.slot()
+            if slot in _pending:
+                continue
+            if write.attempts >= _MAX_ATTEMPTS:
+                print(f"Dropping write-behind {write.kind} on {write.table} {write.key}")
+                continue
+            _pending[slot] = write
+            _pending.move_to_end(slot, last=False)
+
+
+def _request(write: _Write) -> Dict[str, Any]:
+    if write.kind == "put":
+        return {"PutRequest": {"Item": write.params["Item"]}}
+    return {"DeleteRequest": {"Key": write.key}}
+
+
+async def _batch_write(writes: List[_Write]) -> List[_Write]:
+    """Write one chunk; return the writes that could not be applied."""
+    by_request: Dict[Tuple, _Write] = {}
+    request_items: Dict[str, List[Dict[str, Any]]] = {}
+    for write in writes:
+        request_items.setdefault(write.table, []).append(_request(write))
+        by_request[(write.table, tuple(sorted(write.key.items())))] = write
+
+    for attempt in range(_MAX_ATTEMPTS):
+        try:
+            response = await aiodb.batch_write_item(RequestItems=request_items)
+        except Exception as exc:
+            print(f"Write-behind batch failed: {exc!r}")
+            break
+        request_items = response.get("UnprocessedItems") or {}
+        if not request_items:
+            return []
+        await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+    failed = []
+    for table, entries in request_items.items():
+        for entry in entries:
+            if "DeleteRequest" in entry:
+                found = entry["DeleteRequest"]["Key"]
+            else:
+                found = entry["PutRequest"]["Item"]
+            for (write_table, key), write in by_request.items():
+                if write_table == table and all(found.get(a) == v for a, v in key):
+                    failed.append(write)
+                    break
+    return failed
+
+
+async def _apply_update(write: _Write, gate: asyncio.Semaphore) -> Optional[_Write]:
+    """Send one update; return it if it should be retried."""
+    async with gate:
+        try:
+            await aiodb.AsyncTable(write.table).update_item(Key=write.key, **write.params)
+        except aiodb.ConditionalCheckFailed:
+            return None
+        except Exception as exc:
+            print(f"Write-behind update failed on {write.table}: {exc!r}")
+            return write
+    return None
+
+
+async def flush() -> int:
+    """Write everything currently queued.
+
+    Returns:
+        The number of writes taken off the queue (including any that
+        failed and were re-queued).
+    """
+    with _lock:
+        writes = list(_pending.values())
+        _pending.clear()
+    if not writes:
+        return 0
+
+    item_writes = [w for w in writes if w.kind != "update"]
+    updates = [w for w in writes if w.kind == "update"]
+    failed: List[_Write] = []
+
+    for start in range(0, len(item_writes), _BATCH_SIZE):
+        failed.extend(await _batch_write(item_writes[start:start + _BATCH_SIZE]))
+
+    gate = asyncio.Semaphore(_UPDATE_CONCURRENCY)
+    results = await asyncio.gather(*(_apply_update(w, gate) for w in updates))
+    failed.extend(w for w in results if w is not None)
+
+    if failed:
+        _requeue(failed)
+    return len(writes)
+
+
+async def _run_periodically() -> None:
+    while True:
+        await asyncio.sleep(config.WRITE_BEHIND_FLUSH_SECONDS)
+        try:
+            await flush()
+        except Exception as exc:
+            print(f"Write-behind flush failed: {exc!r}")
+
+
+def start() -> None:
+    """Start the periodic flusher on the running event loop."""
+    global _task
+    loop = asyncio.get_running_loop()
+    if _task is not None and not _task.done() and _task.get_loop() is loop:
+        return
+    _task = loop.create_task(_run_periodically())
+
+
+async def stop() -> None:
+    """Stop the periodic flusher and drain the queue.
+
+    Writes that fail during the drain are retried here rather than left
+    for a later flush that may never come.  Each retry counts towards
+    ``_MAX_ATTEMPTS``, after which the write is dropped and logged.
+    """
+    global _task
+    task, _task = _task, None
+    if task is not None and not task.done():
+        # A task left behind on a previous, closed loop cannot be awaited.
+        with contextlib.suppress(RuntimeError):
+            task.cancel()
+            if task.get_loop() is asyncio.get_running_loop():
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+    await flush()
+    for attempt in range(_MAX_ATTEMPTS):
+        if not _pending:
+            return
+        await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+        await flush()
@@ -0,0 +1,104 @@
+"""Time admin template rendering: first render and steady state.
+
+Modes:
+
+* ``source``: a fresh ``FileSystemLoader`` environment, parse and compile
+  on first render (the previous behaviour).
+* ``compiled``: a fresh environment over the ``python -m app.templating``
+  bundle, loaded through ``ModuleLoader``.
+* ``cached``: ``app.templating.render_cached`` after its first call.
+
+Run from the repository root (builds the bundle into a temporary
+directory)::
+
+    python -m benchmarks.admin_templates --iterations 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from jinja2 import Environment, FileSystemLoader, ModuleLoader
+
+from app import templating
+
+CONTEXT = {"title": "Admin", "user_email": "admin@example.com"}
+RESULT_CONTEXT = dict(
+    CONTEXT,
+    summary="Registration successful",
+    fields={"email": "user@example.com", "client_id": "ClientCustomerC", "site_id": "SiteA"},
+)
+
+
+def _stats(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "mean_us": round(sum(samples) / len(samples), 1),
+        "p50_us": round(samples[len(samples) // 2], 1),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 1),
+    }
+
+
+def _time(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1e6
+
+
+def first_render(make_env: Callable[[], Environment], iterations: int) -> Dict[str, float]:
+    """Time loading and rendering every admin template in a new environment."""
+
+    def render_all() -> None:
+        env = make_env()
+        for name in templating.ADMIN_TEMPLATES[1:]:
+            env.get_template(name).render(RESULT_CONTEXT)
+
+    return _stats([_time(render_all) for _ in range(iterations)])
+
+
+def steady_render(env: Environment, name: str, iterations: int) -> Dict[str, float]:
+    """Time rendering an already-loaded template."""
+    template = env.get_template(name)
+    template.render(RESULT_CONTEXT)
+    return _stats([_time(lambda: template.render(RESULT_CONTEXT)) for _ in range(iterations)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    n = args.iterations
+
+    with tempfile.TemporaryDirectory() as bundle:
+        templating.build(bundle)
+
+        def source_env() -> Environment:
+            return Environment(loader=FileSystemLoader(str(templating.TEMPLATES_DIR)), autoescape=True)
+
+        def compiled_env() -> Environment:
+            return Environment(loader=ModuleLoader(bundle), autoescape=True)
+
+        results = {
+            "first_render/source": first_render(source_env, n),
+            "first_render/compiled": first_render(compiled_env, n),
+            "steady/users_form": steady_render(compiled_env(), "admin/users_form.html", n),
+            "steady/result": steady_render(compiled_env(), "admin/result.html", n),
+        }
+
+    templating.render_cached("admin/users_form.html", {"title": "Admin"})
+    results["cached/users_form"] = _stats([
+        _time(lambda: templating.render_cached(
+            "admin/users_form.html", {"title": "Admin"}
+        ))
+        for _ in range(n)
+    ])
+    for name, stats in results.items():
+        print(json.dumps({"case": name, **stats}))
+
+
+if __name__ == "__main__":
+    main()
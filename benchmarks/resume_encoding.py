@@ -0,0 +1,141 @@
+"""Compare resume response encoders on a large synthetic resume.
+
+Encoders:
+
+* ``fastapi``: what returning the raw item from a route costs,
+  ``jsonable_encoder`` followed by ``JSONResponse.render``.
+* ``model_dump_json``: what the resume cache does,
+  ``ResumeSchema.model_validate`` followed by ``model_dump_json``.
+* ``type_adapter``: the same through a prebuilt ``TypeAdapter``.  It
+  produces identical bytes and measured no faster than
+  ``model_dump_json``, so the cache does not use it; it stays here so
+  the comparison can be rerun.
+* ``dumps``: ``app.encoding.dumps`` on the raw item (orjson if installed),
+  without validation.
+
+Run from the repository root::
+
+    python -m benchmarks.resume_encoding --experience 40 --bullets 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.encoding import dumps, orjson
+from app.resume.resume import ResumeSchema
+
+
+def make_resume(experience: int, bullets: int, skills: int) -> dict:
+    """Build a resume item shaped like a DynamoDB read, Decimals included."""
+    text = "Designed and operated serverless services on AWS with Python. " * 3
+    return {
+        "pk": "USER#bench-personaldata",
+        "sk": "RESUME",
+        "entityType": "RESUME",
+        "id": "bench",
+        "name": "Bench Mark",
+        "location": "Remote",
+        "phone": Decimal("5550100"),
+        "email": "bench@example.com",
+        "title": "Software Engineer",
+        "professionalSummary": text * 4,
+        "sites": [
+            {"type": "site", "id": f"s{i}", "website": f"site{i}", "url": f"https://s{i}.example.com"}
+            for i in range(5)
+        ],
+        "skills": [
+            {"id": f"k{i}", "type": "skill", "label": f"Skill {i}", "text": text}
+            for i in range(skills)
+        ],
+        "experience": [
+            {
+                "id": f"e{i}",
+                "type": "job",
+                "title": "Engineer",
+                "company": f"Company {i}",
+                "dates": "2020 - 2024",
+                "summary": text,
+                "bullets": [{"label": f"B{j}", "text": text} for j in range(bullets)],
+            }
+            for i in range(experience)
+        ],
+        "education": [{"degree": "BSc", "detail": "Computer Science"}],
+        "infoSites": [
+            {"type": "info", "id": f"i{i}", "website": f"info{i}", "url": f"https://i{i}.example.com"}
+            for i in range(3)
+        ],
+        "certifications": [
+            {"id": f"c{i}", "name": f"Cert {i}", "issuer": "AWS", "date": "2023"}
+            for i in range(10)
+        ],
+    }
+
+
+def _fastapi_default(item: dict) -> bytes:
+    return JSONResponse(content=None).render(jsonable_encoder(item))
+
+
+def _model_dump_json(item: dict) -> bytes:
+    return ResumeSchema.model_validate(item).model_dump_json().encode()
+
+
+_adapter = TypeAdapter(ResumeSchema)
+
+
+def _type_adapter(item: dict) -> bytes:
+    return _adapter.dump_json(_adapter.validate_python(item))
+
+
+def bench(fn: Callable[[dict], bytes], item: dict, iterations: int) -> Dict[str, float]:
+    """Time ``fn(item)`` and return per-call statistics in microseconds."""
+    fn(item)
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "mean_us": sum(samples) / len(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--experience", type=int, default=40)
+    parser.add_argument("--bullets", type=int, default=8)
+    parser.add_argument("--skills", type=int, default=60)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    item = make_resume(args.experience, args.bullets, args.skills)
+    encoders = {
+        "fastapi": _fastapi_default,
+        "model_dump_json": _model_dump_json,
+        "type_adapter": _type_adapter,
+        "dumps": dumps,
+    }
+    if _type_adapter(item) != _model_dump_json(item):
+        raise SystemExit("type_adapter and model_dump_json disagree")
+    # Speedups are relative to the path the resume cache uses.
+    baseline = bench(_model_dump_json, item, args.iterations)["mean_us"]
+    print(f"payload: {len(_fastapi_default(item))} bytes, orjson: {orjson is not None}")
+    for name, fn in encoders.items():
+        stats = bench(fn, item, args.iterations)
+        print(json.dumps({"encoder": name, **{k: round(v, 1) for k, v in stats.items()},
+                          "speedup": round(baseline / stats["mean_us"], 2)}))
+
+
+if __name__ == "__main__":
+    main()
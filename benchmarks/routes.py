@@ -0,0 +1,329 @@
+"""Per-endpoint latency and throughput through the Lambda entrypoint.
+
+Each case sends Lambda Function URL (payload 2.0) events to
+``handler.handler``, so requests take the production path: Mangum, the
+lifespan, middleware, routing and the route itself.  DynamoDB is the
+in-process ``devtools.dynamodb.MemoryBackend`` with ``--latency-ms`` added to every call to
+stand in for the network round trip.  Requests run one at a time, as a
+Lambda container serves them, so ``rps`` is single-container throughput.
+
+Login attempt limits are disabled unless ``--rate-limit`` is given, since
+every login uses the same email and IP.  ``--scrypt-n`` sets the scrypt
+cost for the run (the production default is 16384).
+
+Results are written as JSON (default
+``benchmarks/results/routes-<commit>.json``); pass an earlier file as
+``--compare`` to print the change in p50 and p95 per case.
+
+Run from the repository root::
+
+    python -m benchmarks.routes --iterations 200 --latency-ms 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import subprocess
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+API_KEY = "site_a_key_abc123"
+CLIENT_ID = "ClientCustomerC"
+SITE_ID = "SiteA"
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password-1"
+RESUME_ID = "bench"
+
+
+class Context:
+    """Minimal stand-in for the Lambda context object."""
+
+    function_name = "bench"
+    memory_limit_in_mb = 1024
+    invoked_function_arn = "arn:aws:lambda:us-east-1:000000000000:function:bench"
+
+    def __init__(self):
+        self.aws_request_id = str(uuid.uuid4())
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 30000
+
+
+def function_url_event(
+    method: str,
+    path: str,
+    body: Optional[dict] = None,
+    headers: Optional[Dict[str, str]] = None,
+    query: str = "",
+) -> dict:
+    """Build a Lambda Function URL (payload format 2.0) event."""
+    now = datetime.now(timezone.utc)
+    all_headers = {
+        "host": "bench.lambda-url.us-east-1.on.aws",
+        "user-agent": "benchmarks.routes",
+        "x-api-key": API_KEY,
+        "x-forwarded-proto": "https",
+    }
+    if body is not None:
+        all_headers["content-type"] = "application/json"
+    all_headers.update(headers or {})
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": query,
+        "headers": all_headers,
+        "requestContext": {
+            "accountId": "anonymous",
+            "apiId": "bench",
+            "domainName": all_headers["host"],
+            "domainPrefix": "bench",
+            "http": {
+                "method": method,
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": "203.0.113.10",
+                "userAgent": all_headers["user-agent"],
+            },
+            "requestId": str(uuid.uuid4()),
+            "routeKey": "$default",
+            "stage": "$default",
+            "time": now.strftime("%d/%b/%Y:%H:%M:%S +0000"),
+            "timeEpoch": int(now.timestamp() * 1000),
+        },
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+def _configure_env(args: argparse.Namespace) -> None:
+    """Point the app at the in-memory backend before it is imported."""
+    os.environ["DYNAMODB_BACKEND"] = "memory"
+    os.environ["METRICS_SINK"] = "off"
+    os.environ["SCRYPT_N"] = str(args.scrypt_n)
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret-" + "x" * 32)
+    if not args.rate_limit:
+        os.environ["LOGIN_RATE_LIMIT_ENABLED"] = "false"
+
+
+def _body(response: dict) -> dict:
+    body = response.get("body") or ""
+    if response.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode()
+    return json.loads(body) if body else {}
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    index = min(len(samples) - 1, max(0, int(round(pct / 100 * len(samples))) - 1))
+    return round(samples[index], 3)
+
+
+class Bench:
+    """Runs cases against the entrypoint and collects their timings."""
+
+    def __init__(self, iterations: int, warmup: int):
+        import handler
+
+        self.invoke = handler.handler
+        self.iterations = iterations
+        self.warmup = warmup
+        self.results: Dict[str, Dict[str, float]] = {}
+
+    def call(self, event: dict) -> dict:
+        return self.invoke(event, Context())
+
+    def seed(self) -> Dict[str, str]:
+        """Create the benchmark user and resume; return auth headers."""
+        from app import aiodb
+
+        response = self.call(function_url_event(
+            "POST", "/auth/register", {"email": EMAIL, "password": PASSWORD, "name": "Bench"},
+        ))
+        if response["statusCode"] not in (200, 201, 409):
+            raise RuntimeError(f"register failed: {response}")
+        response = self.call(function_url_event(
+            "POST", "/auth/login", {"email": EMAIL, "password": PASSWORD},
+        ))
+        token = _body(response)["token"]
+
+        from benchmarks.resume_encoding import make_resume
+
+        resume = make_resume(experience=10, bullets=5, skills=20)
+        resume.update(pk=f"USER#{RESUME_ID}-personaldata", id=RESUME_ID)
+        # Not asyncio.run: it would clear the loop Mangum reuses.
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(aiodb.resume_table().put_item(Item=resume))
+        finally:
+            loop.close()
+        return {"authorization": f"Bearer {token}"}
+
+    def run(self, name: str, make_event: Callable[[int], dict], expect: int) -> None:
+        """Time ``iterations`` calls of one case after ``warmup`` untimed calls."""
+        for i in range(self.warmup):
+            self.call(make_event(-1 - i))
+        samples: List[float] = []
+        errors = 0
+        started = time.perf_counter()
+        for i in range(self.iterations):
+            event = make_event(i)
+            start = time.perf_counter()
+            response = self.call(event)
+            samples.append((time.perf_counter() - start) * 1000)
+            if response["statusCode"] != expect:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        samples.sort()
+        self.results[name] = {
+            "requests": self.iterations,
+            "errors": errors,
+            "rps": round(self.iterations / elapsed, 1),
+            "mean_ms": round(sum(samples) / len(samples), 3),
+            "p50_ms": _percentile(samples, 50),
+            "p95_ms": _percentile(samples, 95),
+            "p99_ms": _percentile(samples, 99),
+        }
+        print(json.dumps({"case": name, **self.results[name]}))
+
+
+def _refresh_token() -> str:
+    """Sign a token inside the refresh window, as a client about to refresh."""
+    from app import keyring
+
+    now = datetime.now(timezone.utc)
+    return keyring.encode({
+        "typ": "access",
+        "jti": str(uuid.uuid4()),
+        "user_id": f"{CLIENT_ID}#{SITE_ID}#{EMAIL}",
+        "email": EMAIL,
+        "client_id": CLIENT_ID,
+        "site_id": SITE_ID,
+        "exp": now + timedelta(minutes=30),
+        "iat": now,
+    })
+
+
+def cases(auth: Dict[str, str]) -> Tuple[Dict[str, tuple], Dict[str, str]]:
+    """Return ``name -> (event factory, expected status)`` and the ETag slot."""
+    run_id = uuid.uuid4().hex[:8]
+    resume_path = f"/resume/resume/{RESUME_ID}"
+    etag: Dict[str, str] = {}
+
+    def resume_304(_: int) -> dict:
+        return function_url_event("GET", resume_path, headers={"if-none-match": etag["value"]})
+
+    return {
+        "GET /health/ghp": (lambda i: function_url_event("GET", "/health/ghp"), 200),
+        "GET /health/mlm": (lambda i: function_url_event("GET", "/health/mlm"), 200),
+        "POST /auth/register": (
+            lambda i: function_url_event("POST", "/auth/register", {
+                "email": f"user-{run_id}-{i}@example.com", "password": PASSWORD, "name": "U",
+            }),
+            201,
+        ),
+        "POST /auth/login": (
+            lambda i: function_url_event("POST", "/auth/login", {"email": EMAIL, "password": PASSWORD}),
+            200,
+        ),
+        "POST /auth/token/refresh": (
+            lambda i: function_url_event(
+                "POST", "/auth/token/refresh", headers={"authorization": f"Bearer {_refresh_token()}"},
+            ),
+            200,
+        ),
+        "GET /user/user": (lambda i: function_url_event("GET", "/user/user", headers=auth), 200),
+        "GET /resume/resume/{id}": (lambda i: function_url_event("GET", resume_path), 200),
+        "GET /resume/resume/{id} (304)": (resume_304, 304),
+        "POST /resume/batch": (
+            lambda i: function_url_event("POST", "/resume/batch", {"user_ids": [RESUME_ID, "missing"]}),
+            200,
+        ),
+    }, etag
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print the p50/p95 change of every case present in both runs."""
+    for name, stats in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        deltas = {
+            key: f"{(stats[key] - before[key]) / before[key] * 100:+.1f}%"
+            for key in ("p50_ms", "p95_ms", "rps")
+            if before.get(key)
+        }
+        print(json.dumps({"case": name, "vs": baseline["meta"]["commit"], **deltas}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="latency added to every DynamoDB call")
+    parser.add_argument("--scrypt-n", type=int, default=16384)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep login attempt limits enabled")
+    parser.add_argument("--only", action="append", default=[],
+                        help="run cases whose name contains this text (repeatable)")
+    parser.add_argument("--output", help="result file (default benchmarks/results/routes-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    _configure_env(args)
+    from app import aiodb
+    from devtools.dynamodb import MemoryBackend
+
+    aiodb.set_backend(MemoryBackend.for_app(latency=args.latency_ms / 1000))
+    bench = Bench(args.iterations, args.warmup)
+    auth = bench.seed()
+    selected, etag = cases(auth)
+    etag["value"] = bench.call(
+        function_url_event("GET", f"/resume/resume/{RESUME_ID}")
+    )["headers"]["etag"]
+    for name, (make_event, expect) in selected.items():
+        if args.only and not any(text in name for text in args.only):
+            continue
+        bench.run(name, make_event, expect)
+
+    commit = _commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "iterations": args.iterations,
+            "latency_ms": args.latency_ms,
+            "scrypt_n": args.scrypt_n,
+        },
+        "results": bench.results,
+    }
+    output = Path(args.output or ROOT / "benchmarks" / "results" / f"routes-{commit}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Wrote {output}")
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Development-only helpers that are not deployed with the function."""
@@ -0,0 +1,687 @@
+"""In-process DynamoDB stand-in for tests, benchmarks and local runs.
+
+``MemoryBackend`` plugs into ``app.aiodb`` in place of ``HttpBackend``.
+It implements the expression syntax the app uses (conditions,
+``SET``/``REMOVE``/``ADD`` updates, projections, GSI queries, paginated
+and segmented scans, batch reads and writes) and can inject a fixed
+latency per call.  It lives outside ``app`` so it is not part of the
+deployed function; ``DYNAMODB_BACKEND=memory`` imports it on first use.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import re
+import threading
+import zlib
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app import config
+from app.aiodb import Backend, ConditionalCheckFailed, DynamoDBError
+
+_MISSING = object()
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:(?P<num>\d+)|(?P<name>#[A-Za-z0-9_]+)|(?P<value>:[A-Za-z0-9_]+)"
+    r"|(?P<op><>|<=|>=|=|<|>|\(|\)|,|\[|\]|\.|\+|-)|(?P<ident>[A-Za-z_][A-Za-z0-9_]*))"
+)
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if match is None or match.end() == pos:
+            raise DynamoDBError("ValidationException", f"Invalid expression: {expression}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+def _normalize(value: Any) -> Any:
+    """Convert Python values to the types boto3 returns (numbers as Decimal)."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return {_normalize(item) for item in value}
+    return value
+
+
+class _Parser:
+    """Recursive-descent parser for DynamoDB expressions.
+
+    Parsed expressions are returned as closures over an item dict.
+    """
+
+    def __init__(self, expression: str, names: Dict[str, str], values: Dict[str, Any]):
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    # -- token helpers --------------------------------------------------
+    def peek(self, offset: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token[0] is None:
+            raise DynamoDBError("ValidationException", "Unexpected end of expression")
+        self.pos += 1
+        return token
+
+    def expect(self, text: str) -> None:
+        kind, value = self.take()
+        if value != text and (kind != "ident" or value.upper() != text):
+            raise DynamoDBError("ValidationException", f"Expected {text!r}, got {value!r}")
+
+    def at_keyword(self, *words: str) -> bool:
+        kind, value = self.peek()
+        return kind == "ident" and value.upper() in words
+
+    def done(self) -> bool:
+        return self.pos >= len(self.tokens)
+
+    # -- paths and operands ---------------------------------------------
+    def _path_part(self) -> str:
+        kind, value = self.take()
+        if kind == "name":
+            if value not in self.names:
+                raise DynamoDBError("ValidationException", f"Undefined name {value}")
+            return self.names[value]
+        if kind == "ident":
+            return value
+        raise DynamoDBError("ValidationException", f"Expected attribute, got {value!r}")
+
+    def path(self) -> List[Any]:
+        parts: List[Any] = [self._path_part()]
+        while True:
+            _, value = self.peek()
+            if value == ".":
+                self.take()
+                parts.append(self._path_part())
+            elif value == "[":
+                self.take()
+                kind, number = self.take()
+                if kind != "num":
+                    raise DynamoDBError("ValidationException", "Expected list index")
+                self.expect("]")
+                parts.append(int(number))
+            else:
+                return parts
+
+    def operand(self) -> Callable[[dict], Any]:
+        kind, value = self.peek()
+        if kind == "value":
+            self.take()
+            if value not in self.values:
+                raise DynamoDBError("ValidationException", f"Undefined value {value}")
+            literal = _normalize(self.values[value])
+            return lambda item: literal
+        if kind == "ident" and value.lower() == "size" and self.peek(1)[1] == "(":
+            self.take()
+            self.expect("(")
+            path = self.path()
+            self.expect(")")
+
+            def size(item):
+                found = _get_path(item, path)
+                return _MISSING if found is _MISSING else Decimal(len(found))
+
+            return size
+        path = self.path()
+        return lambda item: _get_path(item, path)
+
+    # -- conditions -----------------------------------------------------
+    def condition(self) -> Callable[[dict], bool]:
+        left = self._and()
+        while self.at_keyword("OR"):
+            self.take()
+            right = self._and()
+            left = (lambda a, b: lambda item: a(item) or b(item))(left, right)
+        return left
+
+    def _and(self) -> Callable[[dict], bool]:
+        left = self._not()
+        while self.at_keyword("AND"):
+            self.take()
+            right = self._not()
+            left = (lambda a, b: lambda item: a(item) and b(item))(left, right)
+        return left
+
+    def _not(self) -> Callable[[dict], bool]:
+        if self.at_keyword("NOT"):
+            self.take()
+            inner = self._not()
+            return lambda item: not inner(item)
+        return self._primary()
+
+    def _primary(self) -> Callable[[dict], bool]:
+        kind, value = self.peek()
+        if value == "(":
+            self.take()
+            inner = self.condition()
+            self.expect(")")
+            return inner
+        if kind == "ident" and self.peek(1)[1] == "(" and value.lower() != "size":
+            return self._function()
+
+        left = self.operand()
+        if self.at_keyword("BETWEEN"):
+            self.take()
+            low = self.operand()
+            self.expect("AND")
+            high = self.operand()
+            return lambda item: _compare(low(item), "<=", left(item)) and _compare(
+                left(item), "<=", high(item)
+            )
+        if self.at_keyword("IN"):
+            self.take()
+            self.expect("(")
+            options = [self.operand()]
+            while self.peek()[1] == ",":
+                self.take()
+                options.append(self.operand())
+            self.expect(")")
+            return lambda item: any(_compare(left(item), "=", o(item)) for o in options)
+
+        _, op = self.take()
+        if op not in ("=", "<>", "<", "<=", ">", ">="):
+            raise DynamoDBError("ValidationException", f"Unsupported operator {op!r}")
+        right = self.operand()
+        return lambda item: _compare(left(item), op, right(item))
+
+    def _function(self) -> Callable[[dict], bool]:
+        _, name = self.take()
+        name = name.lower()
+        self.expect("(")
+        if name in ("attribute_exists", "attribute_not_exists"):
+            path = self.path()
+            self.expect(")")
+            exists = name == "attribute_exists"
+            return lambda item: (_get_path(item, path) is not _MISSING) == exists
+        if name in ("begins_with", "contains"):
+            target = self.operand()
+            self.expect(",")
+            arg = self.operand()
+            self.expect(")")
+            if name == "begins_with":
+                return lambda item: isinstance(target(item), str) and target(item).startswith(
+                    arg(item)
+                )
+
+            def contains(item):
+                found = target(item)
+                return found is not _MISSING and arg(item) in found
+
+            return contains
+        raise DynamoDBError("ValidationException", f"Unsupported function {name}")
+
+    # -- update expressions ---------------------------------------------
+    def _update_value(self) -> Callable[[dict], Any]:
+        kind, value = self.peek()
+        if kind == "ident" and self.peek(1)[1] == "(":
+            self.take()
+            self.expect("(")
+            if value.lower() == "if_not_exists":
+                path = self.path()
+                self.expect(",")
+                default = self._update_value()
+                self.expect(")")
+
+                def if_not_exists(item):
+                    found = _get_path(item, path)
+                    return default(item) if found is _MISSING else found
+
+                first = if_not_exists
+            elif value.lower() == "list_append":
+                a = self._update_value()
+                self.expect(",")
+                b = self._update_value()
+                self.expect(")")
+                first = lambda item: list(a(item)) + list(b(item))  # noqa: E731
+            else:
+                raise DynamoDBError("ValidationException", f"Unsupported function {value}")
+        else:
+            first = self.operand()
+
+        _, op = self.peek()
+        if op in ("+", "-"):
+            self.take()
+            second = self.operand()
+            sign = 1 if op == "+" else -1
+            return lambda item: first(item) + sign * second(item)
+        return first
+
+    def update(self) -> List[Callable[[dict], None]]:
+        actions: List[Callable[[dict], None]] = []
+        while not self.done():
+            _, clause = self.take()
+            clause = clause.upper()
+            while True:
+                if clause == "SET":
+                    path = self.path()
+                    self.expect("=")
+                    value = self._update_value()
+                    actions.append(
+                        (lambda p, v: lambda item: _set_path(item, p, v(item)))(path, value)
+                    )
+                elif clause == "REMOVE":
+                    path = self.path()
+                    actions.append((lambda p: lambda item: _remove_path(item, p))(path))
+                elif clause in ("ADD", "DELETE"):
+                    path = self.path()
+                    value = self.operand()
+                    actions.append(
+                        (lambda p, v, c: lambda item: _add_path(item, p, v(item), c))(
+                            path, value, clause
+                        )
+                    )
+                else:
+                    raise DynamoDBError("ValidationException", f"Unknown clause {clause}")
+                if self.peek()[1] != ",":
+                    break
+                self.take()
+        return actions
+
+    def projection(self) -> List[List[Any]]:
+        paths = [self.path()]
+        while self.peek()[1] == ",":
+            self.take()
+            paths.append(self.path())
+        return paths
+
+
+def _compare(left: Any, op: str, right: Any) -> bool:
+    if left is _MISSING or right is _MISSING:
+        return op == "<>" and not (left is _MISSING and right is _MISSING)
+    if op == "=":
+        return left == right
+    if op == "<>":
+        return left != right
+    try:
+        if op == "<":
+            return left < right
+        if op == "<=":
+            return left <= right
+        if op == ">":
+            return left > right
+        return left >= right
+    except TypeError:
+        return False
+
+
+def _get_path(item: Any, path: List[Any]) -> Any:
+    current = item
+    for part in path:
+        if isinstance(part, int):
+            if not isinstance(current, list) or part >= len(current):
+                return _MISSING
+        elif not isinstance(current, dict) or part not in current:
+            return _MISSING
+        current = current[part]
+    return current
+
+
+def _parent(item: dict, path: List[Any]) -> Any:
+    parent = _get_path(item, path[:-1]) if len(path) > 1 else item
+    if parent is _MISSING:
+        raise DynamoDBError(
+            "ValidationException", "The document path provided in the update expression is invalid"
+        )
+    return parent
+
+
+def _set_path(item: dict, path: List[Any], value: Any) -> None:
+    parent = _parent(item, path)
+    if isinstance(path[-1], int) and path[-1] >= len(parent):
+        parent.append(value)
+    else:
+        parent[path[-1]] = value
+
+
+def _remove_path(item: dict, path: List[Any]) -> None:
+    parent = _get_path(item, path[:-1]) if len(path) > 1 else item
+    if isinstance(parent, dict):
+        parent.pop(path[-1], None)
+    elif isinstance(parent, list) and isinstance(path[-1], int) and path[-1] < len(parent):
+        parent.pop(path[-1])
+
+
+def _add_path(item: dict, path: List[Any], value: Any, clause: str) -> None:
+    current = _get_path(item, path)
+    if clause == "DELETE":
+        if isinstance(current, set):
+            current.difference_update(value)
+        return
+    if current is _MISSING:
+        _set_path(item, path, copy.deepcopy(value))
+    elif isinstance(current, set):
+        current.update(value)
+    else:
+        _set_path(item, path, current + value)
+
+
+def _project(item: dict, paths: List[List[Any]]) -> dict:
+    """Keep the top-level attributes named by ``paths`` (nested paths keep the whole attribute)."""
+    out = {path[0]: item[path[0]] for path in paths if path[0] in item}
+    return copy.deepcopy(out)
+
+
+def _sort_key(value: Any) -> Tuple[str, Any]:
+    return (type(value).__name__, value)
+
+
+class _MemoryTable:
+    def __init__(self, hash_key: str, range_key: Optional[str], indexes: Dict[str, Tuple]):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = indexes
+        self.items: Dict[Tuple, dict] = {}
+
+    def key_attrs(self) -> List[str]:
+        return [self.hash_key] + ([self.range_key] if self.range_key else [])
+
+    def key_of(self, key: Dict[str, Any]) -> Tuple:
+        try:
+            return tuple(_normalize(key[attr]) for attr in self.key_attrs())
+        except KeyError as exc:
+            raise DynamoDBError("ValidationException", f"Missing key attribute {exc}") from None
+
+    def key_dict(self, item: dict, extra: Tuple[str, ...] = ()) -> Dict[str, Any]:
+        attrs = list(self.key_attrs()) + [a for a in extra if a]
+        return {attr: item[attr] for attr in attrs if attr in item}
+
+
+class MemoryBackend(Backend):
+    """In-process DynamoDB stand-in.
+
+    Tables must be created with ``create_table`` (``for_app`` creates the
+    app's tables).  Every call optionally sleeps for ``latency`` seconds
+    to model network round trips.  ``ReturnConsumedCapacity`` is honoured
+    with an approximate unit count (0.5 per item read, 1 per item write).
+
+    Args:
+        latency: Seconds to sleep per call.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._tables: Dict[str, _MemoryTable] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def for_app(cls, latency: float = 0.0) -> "MemoryBackend":
+        """Return a backend with every table defined in ``template.yaml``."""
+        backend = cls(latency=latency)
+        backend.create_table(
+            config.USERS_TABLE,
+            "user_id",
+            indexes={"email-index": ("email", None), "client-index": ("client_id", "user_id")},
+        )
+        backend.create_table(
+            config.BLACKLIST_TABLE,
+            "token_jti",
+            indexes={"revoked-hour-index": ("revoked_hour", "blacklisted_at")},
+        )
+        backend.create_table(config.PASSWORD_RESET_TABLE, "reset_token")
+        backend.create_table(config.LOGIN_ATTEMPTS_TABLE, "identifier")
+        backend.create_table(config.RESUME_TABLE, "pk", "sk")
+        backend.create_table(config.API_KEYS_TABLE, "key_hash")
+        return backend
+
+    def create_table(
+        self,
+        name: str,
+        hash_key: str,
+        range_key: Optional[str] = None,
+        indexes: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+    ) -> None:
+        """Define a table and its global secondary indexes.
+
+        Args:
+            name: Table name.
+            hash_key: Partition key attribute.
+            range_key: Optional sort key attribute.
+            indexes: Mapping of index name to ``(hash_key, range_key)``.
+        """
+        with self._lock:
+            self._tables[name] = _MemoryTable(hash_key, range_key, indexes or {})
+
+    def _table(self, name: str) -> _MemoryTable:
+        table = self._tables.get(name)
+        if table is None:
+            raise DynamoDBError("ResourceNotFoundException", f"Table {name} not found")
+        return table
+
+    async def call(self, operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        handler = getattr(self, "_op_" + operation, None)
+        if handler is None:
+            raise DynamoDBError("UnknownOperationException", operation)
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            response = handler(params)
+        units = response.pop("_units", None)
+        if params.get("ReturnConsumedCapacity") in ("TOTAL", "INDEXES") and units is not None:
+            if "RequestItems" in params:
+                # Batch calls report a list; the units are split evenly.
+                tables = list(params["RequestItems"])
+                response["ConsumedCapacity"] = [
+                    {"TableName": name, "CapacityUnits": units / len(tables)}
+                    for name in tables
+                ]
+            else:
+                response["ConsumedCapacity"] = {
+                    "TableName": params.get("TableName"),
+                    "CapacityUnits": units,
+                }
+        return response
+
+    @staticmethod
+    def _parser(params: Dict[str, Any], field: str) -> Optional[_Parser]:
+        expression = params.get(field)
+        if not expression:
+            return None
+        return _Parser(
+            expression,
+            params.get("ExpressionAttributeNames", {}),
+            params.get("ExpressionAttributeValues", {}),
+        )
+
+    def _check_condition(self, params: Dict[str, Any], item: Optional[dict]) -> None:
+        parser = self._parser(params, "ConditionExpression")
+        if parser is not None and not parser.condition()(item or {}):
+            raise ConditionalCheckFailed()
+
+    def _projected(self, params: Dict[str, Any], item: dict) -> dict:
+        parser = self._parser(params, "ProjectionExpression")
+        if parser is None:
+            return copy.deepcopy(item)
+        return _project(item, parser.projection())
+
+    def _op_GetItem(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(params["TableName"])
+        item = table.items.get(table.key_of(params["Key"]))
+        if item is None:
+            return {"_units": 0.5}
+        return {"Item": self._projected(params, item), "_units": 0.5}
+
+    def _op_PutItem(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(params["TableName"])
+        item = _normalize(params["Item"])
+        key = table.key_of(item)
+        old = table.items.get(key)
+        self._check_condition(params, old)
+        table.items[key] = item
+        response: Dict[str, Any] = {"_units": 1.0}
+        if params.get("ReturnValues") == "ALL_OLD" and old is not None:
+            response["Attributes"] = copy.deepcopy(old)
+        return response
+
+    def _op_DeleteItem(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(params["TableName"])
+        key = table.key_of(params["Key"])
+        old = table.items.get(key)
+        self._check_condition(params, old)
+        table.items.pop(key, None)
+        response: Dict[str, Any] = {"_units": 1.0}
+        if params.get("ReturnValues") == "ALL_OLD" and old is not None:
+            response["Attributes"] = old
+        return response
+
+    def _op_UpdateItem(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(params["TableName"])
+        key = table.key_of(params["Key"])
+        old = table.items.get(key)
+        self._check_condition(params, old)
+
+        item = copy.deepcopy(old) if old is not None else _normalize(dict(params["Key"]))
+        parser = self._parser(params, "UpdateExpression")
+        if parser is not None:
+            for action in parser.update():
+                action(item)
+        table.items[key] = item
+
+        response: Dict[str, Any] = {"_units": 1.0}
+        mode = params.get("ReturnValues", "NONE")
+        if mode == "ALL_NEW":
+            response["Attributes"] = copy.deepcopy(item)
+        elif mode == "ALL_OLD" and old is not None:
+            response["Attributes"] = copy.deepcopy(old)
+        elif mode in ("UPDATED_NEW", "UPDATED_OLD"):
+            source = item if mode == "UPDATED_NEW" else (old or {})
+            before = old or {}
+            changed = {k for k in set(item) | set(before) if item.get(k) != before.get(k)}
+            response["Attributes"] = {
+                k: copy.deepcopy(source[k]) for k in changed if k in source
+            }
+        return response
+
+    def _page(
+        self,
+        params: Dict[str, Any],
+        table: _MemoryTable,
+        candidates: List[dict],
+        order_attrs: List[str],
+    ) -> Dict[str, Any]:
+        """Apply start key, limit, filter and projection to sorted candidates."""
+        start = params.get("ExclusiveStartKey")
+        if start is not None:
+            start_key = tuple(_sort_key(_normalize(start.get(a))) for a in order_attrs)
+            forward = params.get("ScanIndexForward", True) is not False
+            candidates = [
+                item
+                for item in candidates
+                if (tuple(_sort_key(item.get(a)) for a in order_attrs) > start_key) == forward
+                and tuple(_sort_key(item.get(a)) for a in order_attrs) != start_key
+            ]
+
+        limit = params.get("Limit")
+        evaluated = candidates[:limit] if limit else candidates
+        filter_parser = self._parser(params, "FilterExpression")
+        matches = filter_parser.condition() if filter_parser else None
+        items = [item for item in evaluated if matches is None or matches(item)]
+
+        response: Dict[str, Any] = {
+            "Items": [self._projected(params, item) for item in items],
+            "Count": len(items),
+            "ScannedCount": len(evaluated),
+            "_units": max(0.5, 0.5 * len(evaluated)),
+        }
+        if limit and len(candidates) > limit:
+            last = evaluated[-1]
+            response["LastEvaluatedKey"] = copy.deepcopy(
+                {attr: last[attr] for attr in order_attrs if attr in last}
+            )
+        return response
+
+    def _op_Query(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(params["TableName"])
+        index = params.get("IndexName")
+        if index:
+            if index not in table.indexes:
+                raise DynamoDBError("ValidationException", f"Index {index} not found")
+            hash_key, range_key = table.indexes[index]
+        else:
+            hash_key, range_key = table.hash_key, table.range_key
+
+        parser = self._parser(params, "KeyConditionExpression")
+        if parser is None:
+            raise DynamoDBError("ValidationException", "KeyConditionExpression is required")
+        key_condition = parser.condition()
+        candidates = [
+            item
+            for item in table.items.values()
+            if hash_key in item and (range_key is None or range_key in item) and key_condition(item)
+        ]
+        order_attrs = [a for a in (hash_key, range_key) if a] + [
+            a for a in table.key_attrs() if a not in (hash_key, range_key)
+        ]
+        candidates.sort(
+            key=lambda item: tuple(_sort_key(item.get(a)) for a in order_attrs),
+            reverse=params.get("ScanIndexForward", True) is False,
+        )
+        return self._page(params, table, candidates, order_attrs)
+
+    def _op_Scan(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(params["TableName"])
+        candidates = list(table.items.values())
+        total = params.get("TotalSegments")
+        if total:
+            segment = params.get("Segment", 0)
+            candidates = [
+                item
+                for item in candidates
+                if zlib.crc32(repr(item[table.hash_key]).encode()) % total == segment
+            ]
+        order_attrs = table.key_attrs()
+        candidates.sort(key=lambda item: tuple(_sort_key(item.get(a)) for a in order_attrs))
+        return self._page(params, table, candidates, order_attrs)
+
+    def _op_BatchGetItem(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        requests = params["RequestItems"]
+        if sum(len(r["Keys"]) for r in requests.values()) > 100:
+            raise DynamoDBError("ValidationException", "Too many items requested")
+        responses: Dict[str, List[dict]] = {}
+        units = 0.0
+        for name, request in requests.items():
+            table = self._table(name)
+            found = []
+            for key in request["Keys"]:
+                item = table.items.get(table.key_of(key))
+                units += 0.5
+                if item is not None:
+                    found.append(self._projected(request, item))
+            responses[name] = found
+        return {"Responses": responses, "UnprocessedKeys": {}, "_units": units}
+
+    def _op_BatchWriteItem(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        requests = params["RequestItems"]
+        if sum(len(entries) for entries in requests.values()) > 25:
+            raise DynamoDBError("ValidationException", "Too many items in batch write")
+        units = 0.0
+        for name, entries in requests.items():
+            table = self._table(name)
+            for entry in entries:
+                units += 1.0
+                if "PutRequest" in entry:
+                    item = _normalize(entry["PutRequest"]["Item"])
+                    table.items[table.key_of(item)] = item
+                else:
+                    table.items.pop(table.key_of(entry["DeleteRequest"]["Key"]), None)
+        return {"UnprocessedItems": {}, "_units": units}
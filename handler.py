@@ -1,7 +1,32 @@
 """Lambda entrypoint wrapper"""
 
+# Imported first so the cold-start clock covers every other import.
+from app import coldstart
+
 from mangum import Mangum
 
+from app import profiling
 from app.app import app
 
-handler = Mangum(app)
+asgi_handler = Mangum(app)
+coldstart.mark_ready()
+
+
+def handler(event, context):
+    """Run one invocation, profiling it when ``app.profiling`` says so.
+
+    Batches from the mail queue go to ``app.mail.handle_sqs_event``;
+    everything else is an HTTP event for the ASGI app.
+    """
+    if isinstance(event, dict) and "Records" in event:
+        from app import mail
+
+        if mail.is_sqs_event(event):
+            return mail.handle_sqs_event(event)
+    session = profiling.begin(event, context)
+    if session is None:
+        return asgi_handler(event, context)
+    try:
+        return asgi_handler(event, context)
+    finally:
+        session.stop()
@@ -0,0 +1,31 @@
+"""Shared fixtures: run the app against the in-memory DynamoDB backend."""
+
+import os
+
+os.environ.setdefault("DYNAMODB_BACKEND", "memory")
+os.environ.setdefault("JWT_SECRET", "unit-test-secret-" + "x" * 32)
+os.environ.setdefault("METRICS_SINK", "off")
+os.environ.setdefault("MAIL_TRANSPORT", "memory")
+os.environ.setdefault("SCRYPT_N", "1024")
+os.environ.setdefault("PASSWORD_RESET_MIN_SECONDS", "0")
+
+import pytest
+
+from app import aiodb, keyring
+from devtools.dynamodb import MemoryBackend
+
+
+@pytest.fixture
+def backend():
+    """A fresh in-memory backend with every app table."""
+    memory = MemoryBackend.for_app()
+    aiodb.set_backend(memory)
+    yield memory
+    aiodb.set_backend(None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_keyring():
+    keyring.reset()
+    yield
+    keyring.reset()
@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import hmac
+import json
+
+import httpx
+import pytest
+
+from app import aiodb
+from devtools.dynamodb import MemoryBackend
+
+
+# ---------------------------------------------------------------------------
+# HttpBackend
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def http_backend(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIDEXAMPLE")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY")
+    monkeypatch.delenv("AWS_SESSION_TOKEN", raising=False)
+    return aiodb.HttpBackend(
+        region="eu-west-1", endpoint_url="https://dynamodb.eu-west-1.amazonaws.com/", max_retries=2
+    )
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def test_sign_produces_a_valid_sigv4_signature(http_backend):
+    body = b'{"TableName":"Users"}'
+    headers = http_backend._sign("GetItem", body)
+
+    algorithm, _, rest = headers["Authorization"].partition(" ")
+    fields = dict(part.split("=", 1) for part in rest.split(", "))
+    assert algorithm == "AWS4-HMAC-SHA256"
+    key_id, date, region, service, terminator = fields["Credential"].split("/")
+    assert (key_id, region, service, terminator) == (
+        "AKIDEXAMPLE", "eu-west-1", "dynamodb", "aws4_request"
+    )
+    assert headers["X-Amz-Date"].startswith(date)
+
+    signed = fields["SignedHeaders"].split(";")
+    assert {"host", "x-amz-date", "x-amz-target"} <= set(signed)
+    values = {k.lower(): v for k, v in headers.items()}
+    values["host"] = "dynamodb.eu-west-1.amazonaws.com"
+    canonical = "\n".join([
+        "POST",
+        "/",
+        "",
+        "".join(f"{name}:{values[name].strip()}\n" for name in signed),
+        fields["SignedHeaders"],
+        hashlib.sha256(body).hexdigest(),
+    ])
+    scope = f"{date}/eu-west-1/dynamodb/aws4_request"
+    to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        headers["X-Amz-Date"],
+        scope,
+        hashlib.sha256(canonical.encode()).hexdigest(),
+    ])
+    key = ("AWS4" + "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY").encode()
+    for part in (date, "eu-west-1", "dynamodb", "aws4_request"):
+        key = _hmac(key, part)
+    assert fields["Signature"] == hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+
+
+def _run_with(backend, responses, operation="GetItem", params=None):
+    """Call ``backend`` with a transport that plays ``responses`` in order."""
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        response = responses[len(seen) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def run():
+        backend._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        backend._client_loop = asyncio.get_running_loop()
+        try:
+            return await backend.call(operation, params or {"TableName": "Users"})
+        finally:
+            await backend.aclose()
+
+    return asyncio.run(run()), seen
+
+
+async def _pool(backend):
+    return backend._http()
+
+
+def test_pool_of_a_finished_loop_is_closed(http_backend):
+    first = asyncio.run(_pool(http_backend))
+    assert first.is_closed
+    second = asyncio.run(_pool(http_backend))
+    assert second is not first and second.is_closed
+
+
+def test_pool_replaced_while_its_loop_is_open_is_closed(http_backend):
+    old_loop = asyncio.new_event_loop()
+    try:
+        first = old_loop.run_until_complete(_pool(http_backend))
+        second = asyncio.run(_pool(http_backend))
+        assert second is not first
+        assert not first.is_closed
+        # The close was scheduled on the old loop; let it run there.
+        for _ in range(3):
+            old_loop.run_until_complete(asyncio.sleep(0))
+        assert first.is_closed
+    finally:
+        old_loop.close()
+
+
+def test_call_deserializes_items(http_backend):
+    ok = httpx.Response(200, json={"Item": {"user_id": {"S": "u1"}, "n": {"N": "3"}}})
+    result, _ = _run_with(http_backend, [ok])
+    assert result["Item"] == {"user_id": "u1", "n": 3}
+
+
+def test_non_json_gateway_error_is_retried(http_backend):
+    responses = [
+        httpx.Response(502, text="<html>Bad Gateway</html>"),
+        httpx.Response(200, json={}),
+    ]
+    result, seen = _run_with(http_backend, responses)
+    assert result == {}
+    assert len(seen) == 2
+
+
+def test_transport_errors_are_retried(http_backend):
+    responses = [httpx.ConnectError("refused"), httpx.ReadTimeout("slow"), httpx.Response(200, json={})]
+    result, seen = _run_with(http_backend, responses)
+    assert result == {}
+    assert len(seen) == 3
+
+
+def test_transport_errors_raise_after_retries(http_backend):
+    with pytest.raises(aiodb.DynamoDBError) as info:
+        _run_with(http_backend, [httpx.ConnectError("refused")] * 3)
+    assert info.value.code == "ConnectError"
+
+
+def test_client_errors_are_not_retried(http_backend):
+    conditional = httpx.Response(400, json={
+        "__type": "com.amazonaws.dynamodb.v20120810#ConditionalCheckFailedException",
+        "message": "The conditional request failed",
+    })
+    with pytest.raises(aiodb.ConditionalCheckFailed):
+        _run_with(http_backend, [conditional])
+
+
+def test_request_body_is_serialized(http_backend):
+    _, seen = _run_with(
+        http_backend,
+        [httpx.Response(200, json={})],
+        "PutItem",
+        {"TableName": "Users", "Item": {"user_id": "u1", "n": 3}},
+    )
+    assert json.loads(seen[0].content)["Item"] == {"user_id": {"S": "u1"}, "n": {"N": "3"}}
+    assert seen[0].headers["X-Amz-Target"] == "DynamoDB_20120810.PutItem"
+
+
+# ---------------------------------------------------------------------------
+# MemoryBackend expressions
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def table():
+    memory = MemoryBackend()
+    memory.create_table("t", "pk", "sk", indexes={"by-g": ("g", "sk")})
+    return aiodb.AsyncTable("t", memory)
+
+
+def test_conditions(table):
+    async def run():
+        await table.put_item(Item={"pk": "a", "sk": 1, "name": "alpha", "n": 5})
+        with pytest.raises(aiodb.ConditionalCheckFailed):
+            await table.put_item(
+                Item={"pk": "a", "sk": 1}, ConditionExpression="attribute_not_exists(pk)"
+            )
+        await table.update_item(
+            Key={"pk": "a", "sk": 1},
+            UpdateExpression="SET n = n + :one",
+            ConditionExpression=(
+                "begins_with(#name, :prefix) AND (n BETWEEN :low AND :high OR n IN (:one)) "
+                "AND NOT attribute_exists(missing) AND size(#name) > :one"
+            ),
+            ExpressionAttributeNames={"#name": "name"},
+            ExpressionAttributeValues={":prefix": "al", ":low": 1, ":high": 9, ":one": 1},
+        )
+        return (await table.get_item(Key={"pk": "a", "sk": 1}))["Item"]
+
+    assert asyncio.run(run())["n"] == 6
+
+
+def test_update_clauses(table):
+    async def run():
+        await table.put_item(Item={"pk": "a", "sk": 1, "drop": True, "m": {"x": 1}})
+        return await table.update_item(
+            Key={"pk": "a", "sk": 1},
+            UpdateExpression=(
+                "SET m.#y = :two, c = if_not_exists(c, :zero) + :one, "
+                "l = list_append(if_not_exists(l, :empty), :items) "
+                "REMOVE #drop ADD counter :one, tags :tags"
+            ),
+            ExpressionAttributeNames={"#y": "y", "#drop": "drop"},
+            ExpressionAttributeValues={
+                ":two": 2, ":zero": 0, ":one": 1, ":empty": [], ":items": ["i"], ":tags": {"t"},
+            },
+            ReturnValues="ALL_NEW",
+        )
+
+    item = asyncio.run(run())["Attributes"]
+    assert item["m"] == {"x": 1, "y": 2}
+    assert item["c"] == 1 and item["counter"] == 1
+    assert item["l"] == ["i"] and item["tags"] == {"t"}
+    assert "drop" not in item
+
+
+def test_query_index_with_pagination(table):
+    async def run():
+        for sk in range(5):
+            await table.put_item(Item={"pk": f"p{sk}", "sk": sk, "g": "grp"})
+        await table.put_item(Item={"pk": "other", "sk": 9, "g": "other"})
+        pages, start = [], None
+        while True:
+            kwargs = {"ExclusiveStartKey": start} if start else {}
+            page = await table.query(
+                IndexName="by-g",
+                KeyConditionExpression="g = :g AND sk >= :low",
+                ExpressionAttributeValues={":g": "grp", ":low": 1},
+                ProjectionExpression="pk",
+                Limit=2,
+                **kwargs,
+            )
+            pages.append(page["Items"])
+            start = page.get("LastEvaluatedKey")
+            if not start:
+                return pages
+
+    pages = asyncio.run(run())
+    assert [item["pk"] for page in pages for item in page] == ["p1", "p2", "p3", "p4"]
+    assert all(set(item) == {"pk"} for page in pages for item in page)
+
+
+def test_segmented_scan_covers_every_item_once(table):
+    async def run():
+        for i in range(20):
+            await table.put_item(Item={"pk": f"p{i}", "sk": i})
+        seen = []
+        for segment in range(3):
+            page = await table.scan(Segment=segment, TotalSegments=3)
+            seen.extend(item["pk"] for item in page["Items"])
+        return seen
+
+    seen = asyncio.run(run())
+    assert sorted(seen) == sorted(f"p{i}" for i in range(20))
+
+
+def test_invalid_expression_is_a_validation_error(table):
+    with pytest.raises(aiodb.DynamoDBError) as info:
+        asyncio.run(table.put_item(Item={"pk": "a", "sk": 1}, ConditionExpression="pk ~ :x"))
+    assert info.value.code == "ValidationException"
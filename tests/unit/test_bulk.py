@@ -0,0 +1,47 @@
+import json
+
+from app import bulk
+
+
+class FakeTable:
+    """A boto3-like table with two scan pages and recorded updates."""
+
+    name = "Users"
+
+    def __init__(self):
+        self.updates = []
+
+    def scan(self, **params):
+        if "ExclusiveStartKey" not in params:
+            return {"Items": [{"user_id": "C#S#a"}], "LastEvaluatedKey": {"user_id": "C#S#a"}}
+        return {"Items": [{"user_id": "C#S#b"}]}
+
+    def update_item(self, **params):
+        self.updates.append(params["Key"]["user_id"])
+        return {}
+
+
+def _job(table):
+    return bulk.Job("backfill-tenant", lambda: table, bulk._backfill_tenant)
+
+
+def test_dry_run_leaves_the_checkpoint_for_the_real_run(tmp_path):
+    path = str(tmp_path / "job.json")
+    table = FakeTable()
+
+    stats = bulk.run(_job(table), segments=1, checkpoint=path, dry_run=True)
+    assert stats["matched"] == 2 and table.updates == []
+    assert not (tmp_path / "job.json").exists()
+
+    stats = bulk.run(_job(table), segments=1, checkpoint=path)
+    assert table.updates == ["C#S#a", "C#S#b"]
+    with open(path) as fh:
+        assert json.load(fh)["positions"] == {"0": "done"}
+
+
+def test_finished_segments_are_skipped_on_rerun(tmp_path):
+    path = str(tmp_path / "job.json")
+    table = FakeTable()
+    bulk.run(_job(table), segments=1, checkpoint=path)
+    bulk.run(_job(table), segments=1, checkpoint=path)
+    assert table.updates == ["C#S#a", "C#S#b"]
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app import config
+from app.auth import cookie_session, dependencies, revocation_filter, sessions, token_cache
+
+USER = {"user_id": "ClientA#SiteA#a@example.com"}
+
+
+@pytest.fixture(autouse=True)
+def clean_state(backend):
+    token_cache.clear()
+    revocation_filter.reset()
+    sessions.reset()
+    yield
+    token_cache.clear()
+    revocation_filter.reset()
+    sessions.reset()
+
+
+def _request(cookie=None):
+    headers = []
+    if cookie is not None:
+        headers.append((b"cookie", f"{config.ADMIN_SESSION_COOKIE}={cookie}".encode()))
+    return Request({"type": "http", "method": "POST", "path": "/admin/x", "headers": headers})
+
+
+def _form_user(cookie, csrf_token, authorization=None):
+    return asyncio.run(
+        dependencies.get_admin_form_user(_request(cookie), csrf_token, authorization)
+    )
+
+
+def test_session_expands_to_user_fields():
+    user = asyncio.run(dependencies.get_admin_user(_request(cookie_session.issue(USER)), None))
+    assert user["client_id"] == "ClientA"
+    assert user["site_id"] == "SiteA"
+    assert user["email"] == "a@example.com"
+
+
+def test_form_post_needs_the_matching_csrf_token():
+    cookie = cookie_session.issue(USER)
+    csrf = asyncio.run(dependencies.get_admin_user(_request(cookie), None))["csrf"]
+    assert _form_user(cookie, csrf)["user_id"] == USER["user_id"]
+
+    other_csrf = asyncio.run(
+        dependencies.get_admin_user(_request(cookie_session.issue(USER)), None)
+    )["csrf"]
+    for submitted in (None, "", other_csrf):
+        with pytest.raises(HTTPException) as info:
+            _form_user(cookie, submitted)
+        assert info.value.status_code == 403
+
+
+def test_session_token_is_not_a_bearer_token():
+    cookie = cookie_session.issue(USER)
+    with pytest.raises(HTTPException) as info:
+        asyncio.run(dependencies.get_current_user(f"Bearer {cookie}"))
+    assert info.value.status_code == 401
+
+
+def test_stale_epoch_session_is_rejected():
+    cookie = cookie_session.issue(USER, epoch=0)
+    sessions.remember_epoch(USER["user_id"], 1)
+    with pytest.raises(HTTPException) as info:
+        asyncio.run(dependencies.get_admin_user(_request(cookie), None))
+    assert info.value.status_code == 401
+
+
+def test_csrf_matches_is_strict():
+    assert cookie_session.csrf_matches({"csrf": "abc"}, "abc")
+    assert not cookie_session.csrf_matches({"csrf": "abc"}, "abd")
+    assert not cookie_session.csrf_matches({}, "abc")
+    assert not cookie_session.csrf_matches({"csrf": "abc"}, "ébc")
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import aiodb, config
+from app.admin.export import router
+from app.auth import revocation_filter, sessions, token_cache
+
+SITE_A_KEY = "site_a_key_abc123"
+SITE_B_KEY = "site_b_key_xyz789"
+ADMIN = "ClientCustomerC#SiteA#admin@example.com"
+
+
+@pytest.fixture
+def client(backend):
+    token_cache.clear()
+    revocation_filter.reset()
+    users = backend._tables[config.USERS_TABLE].items
+    for client_id, site_id, count in (("ClientCustomerC", "SiteA", 7), ("ClientCustomerA", "SiteB", 5)):
+        for i in range(count):
+            user_id = f"{client_id}#{site_id}#u{i}@example.com"
+            users[(user_id,)] = {
+                "user_id": user_id,
+                "email": f"u{i}@example.com",
+                "client_id": client_id,
+                "site_id": site_id,
+                "password_hash": "secret",
+            }
+    users[(ADMIN,)] = {
+        "user_id": ADMIN,
+        "email": "admin@example.com",
+        "client_id": "ClientCustomerC",
+        "site_id": "SiteA",
+        "role": "admin",
+    }
+    app = FastAPI()
+    app.include_router(router, prefix="/admin")
+    token = asyncio.run(sessions.start(
+        dict(users[(ADMIN,)]), {"client_id": "ClientCustomerC", "site_id": "SiteA"}
+    ))["token"]
+    yield TestClient(app), users, token, backend
+    token_cache.clear()
+    revocation_filter.reset()
+
+
+class Recorder(aiodb.Backend):
+    """Records ``(operation, table)`` for every call."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.seen = []
+
+    async def call(self, operation, params):
+        self.seen.append((operation, params.get("TableName")))
+        return await self.inner.call(operation, params)
+
+
+def _export(http, token, key=SITE_A_KEY, **params):
+    return http.get(
+        "/admin/users/export",
+        params=params,
+        headers={"Authorization": f"Bearer {token}", "x-api-key": key},
+    )
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_admin_exports_only_their_tenant_with_a_query(client):
+    http, _, token, backend = client
+    recorder = Recorder(backend)
+    aiodb.set_backend(recorder)
+    response = _export(http, token)
+    assert response.status_code == 200
+    ids = [line["user_id"] for line in _lines(response)]
+    assert len(ids) == 8 and all(i.startswith("ClientCustomerC#SiteA#") for i in ids)
+    assert all("password_hash" not in line for line in _lines(response))
+    assert ("Query", config.USERS_TABLE) in recorder.seen
+    assert ("Scan", config.USERS_TABLE) not in recorder.seen
+
+
+def test_other_tenants_key_is_refused(client):
+    http, _, token, _ = client
+    response = _export(http, token, key=SITE_B_KEY)
+    assert response.status_code == 403
+    assert "SiteB" not in response.text
+
+
+def test_non_admin_is_refused(client):
+    http, users, token, _ = client
+    users[(ADMIN,)].pop("role")
+    assert _export(http, token).status_code == 403
+
+
+def test_pagination_resumes_after_the_cursor(client):
+    http, _, token, _ = client
+    first = _lines(_export(http, token, limit=3))
+    assert list(first[-1]) == ["next"]
+    rest = _lines(_export(http, token, after=first[-1]["next"]))
+    ids = [line["user_id"] for line in first[:-1] + rest]
+    assert len(ids) == len(set(ids)) == 8
+
+
+def test_email_export(client):
+    http, _, token, _ = client
+    lines = _lines(_export(http, token, email="U1@example.com"))
+    assert [line["user_id"] for line in lines] == ["ClientCustomerC#SiteA#u1@example.com"]
@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+from app import config, keyring
+
+
+def _decode(token):
+    return asyncio.run(keyring.decode(token))
+
+
+def _pem(key):
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def test_round_trip_with_kid_header():
+    token = keyring.encode({"sub": "u1"})
+    kid, _ = keyring.signing_key()
+    assert jwt.get_unverified_header(token)["kid"] == kid
+    assert _decode(token) == {"sub": "u1"}
+
+
+def test_previous_secret_still_verifies_after_rotation(monkeypatch):
+    old_token = keyring.encode({"sub": "u1"})
+    old_secret = keyring.signing_key()[1]
+
+    monkeypatch.setenv("JWT_SECRET", "rotated-secret-" + "y" * 32)
+    monkeypatch.setenv("JWT_SECRET_KID", "env-next")
+    monkeypatch.setenv("JWT_SECRET_PREVIOUS_KID", "env-current")
+    monkeypatch.setenv("JWT_SECRET_PREVIOUS", old_secret)
+    keyring.reset()
+
+    assert _decode(old_token) == {"sub": "u1"}
+    new_token = keyring.encode({"sub": "u2"})
+    assert jwt.get_unverified_header(new_token)["kid"] != jwt.get_unverified_header(old_token)["kid"]
+
+
+def test_unknown_kid_is_rejected():
+    token = jwt.encode({"sub": "u1"}, "some-other-secret-" + "z" * 32, headers={"kid": "nope"})
+    with pytest.raises(jwt.InvalidTokenError):
+        _decode(token)
+
+
+def test_kid_less_token_is_tried_against_known_secrets():
+    secret = keyring.signing_key()[1]
+    assert _decode(jwt.encode({"sub": "u1"}, secret, algorithm="HS256")) == {"sub": "u1"}
+
+
+def test_expired_token_is_rejected():
+    with pytest.raises(jwt.ExpiredSignatureError):
+        _decode(keyring.encode({"sub": "u1", "exp": 1}))
+
+
+def test_hs256_mode_publishes_no_keys():
+    body, _ = keyring.jwks()
+    assert json.loads(body) == {"keys": []}
+
+
+@pytest.fixture
+def eddsa(monkeypatch):
+    key = ed25519.Ed25519PrivateKey.generate()
+    monkeypatch.setattr(config, "JWT_ALGORITHM", "EdDSA")
+    monkeypatch.setenv("JWT_PRIVATE_KEY", _pem(key))
+    keyring.reset()
+    return key
+
+
+def test_eddsa_tokens_verify_with_published_key(eddsa):
+    token = keyring.encode({"sub": "u1"})
+    header = jwt.get_unverified_header(token)
+    assert header["alg"] == "EdDSA"
+
+    body, etag = keyring.jwks()
+    jwk = json.loads(body)["keys"][0]
+    assert jwk["kid"] == header["kid"] and etag
+    public = jwt.PyJWK(jwk).key
+    assert jwt.decode(token, public, algorithms=["EdDSA"]) == {"sub": "u1"}
+    assert _decode(token) == {"sub": "u1"}
+
+
+def test_asymmetric_kid_cannot_be_used_with_hmac(eddsa):
+    # Signing with the public key bytes as an HMAC secret must not verify.
+    public_kid = jwt.get_unverified_header(keyring.encode({})).get("kid")
+    raw = eddsa.public_key().public_bytes(
+        serialization.Encoding.Raw, serialization.PublicFormat.Raw
+    )
+    forged = jwt.encode({"sub": "admin"}, raw, algorithm="HS256", headers={"kid": public_kid})
+    with pytest.raises(jwt.InvalidTokenError):
+        _decode(forged)
+
+
+def test_kid_reveals_nothing_about_the_secret(monkeypatch):
+    monkeypatch.setenv("JWT_SECRET_KID", "dev-7")
+    keyring.reset()
+    assert keyring.signing_key()[0] == "dev-7"
+    assert jwt.get_unverified_header(keyring.encode({}))["kid"] == "dev-7"
+
+
+def test_tokens_with_the_old_digest_kid_still_verify():
+    secret = keyring.signing_key()[1]
+    token = jwt.encode({"sub": "u1"}, secret, headers={"kid": keyring._legacy_kid(secret)})
+    assert _decode(token) == {"sub": "u1"}
+
+
+def test_import_does_not_load_jwt():
+    import subprocess
+    import sys
+
+    code = "import sys, app.keyring; print('jwt' in sys.modules, 'cryptography' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["False", "False"]
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app import aiodb, config, mail
+from app.auth import pw_reset
+from app.auth.models import PasswordResetRequest
+
+TENANT = {"client_id": "ClientCustomerC", "site_id": "SiteA"}
+
+
+class FakeSqs:
+    def __init__(self):
+        self.bodies = []
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self.bodies.extend(entry["MessageBody"] for entry in Entries)
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries]}
+
+
+class FailingWrites(aiodb.Backend):
+    """Fails every write with a non-conditional error."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def call(self, operation, params):
+        if operation in ("PutItem", "UpdateItem"):
+            raise aiodb.DynamoDBError("InternalServerError", "injected")
+        return await self.inner.call(operation, params)
+
+
+class FailingTransport(mail.Transport):
+    async def send(self, batch):
+        return list(batch)
+
+
+@pytest.fixture
+def memory_mail():
+    mail.set_transport(mail.MemoryTransport(), mail.MemoryTransport())
+    mail.outbox.clear()
+    yield
+    mail.outbox.clear()
+    mail._pending.clear()
+    mail.set_transport(None)
+
+
+def _reset(email):
+    started = time.monotonic()
+    body = PasswordResetRequest(email=email)
+    response = asyncio.run(pw_reset.password_reset(body, TENANT))
+    return response, time.monotonic() - started
+
+
+def test_password_reset_pads_known_and_unknown_emails(backend, memory_mail, monkeypatch):
+    monkeypatch.setattr(config, "PASSWORD_RESET_MIN_SECONDS", 0.2)
+    monkeypatch.setattr(config, "RESET_TOKEN_MODE", "table")
+    user_id = "ClientCustomerC#SiteA#known@example.com"
+    backend._tables[config.USERS_TABLE].items[(user_id,)] = {"user_id": user_id}
+
+    unknown, unknown_elapsed = _reset("nobody@example.com")
+    known, known_elapsed = _reset("known@example.com")
+
+    assert unknown == known == pw_reset.GENERIC_RESPONSE
+    assert unknown_elapsed >= 0.2 and known_elapsed >= 0.2
+    # Handed off inside the request, not left for the lifespan drain.
+    assert [message["To"] for message in mail.outbox] == ["known@example.com"]
+    assert mail.pending() == 0
+
+
+@pytest.mark.parametrize("mode", ["signed", "table"])
+def test_password_reset_hides_write_failures_for_known_emails(backend, memory_mail, monkeypatch, mode):
+    monkeypatch.setattr(config, "RESET_TOKEN_MODE", mode)
+    user_id = "ClientCustomerC#SiteA#known@example.com"
+    backend._tables[config.USERS_TABLE].items[(user_id,)] = {
+        "user_id": user_id, "password_hash": "scrypt$stored",
+    }
+    aiodb.set_backend(FailingWrites(backend))
+
+    response, _ = _reset("known@example.com")
+    assert response == pw_reset.GENERIC_RESPONSE
+    assert mail.outbox == []
+
+
+def test_sqs_handoff_is_delivered_by_the_consumer(memory_mail):
+    sqs = mail.SqsTransport("https://sqs.example/mail")
+    sqs._client = FakeSqs()
+    message = mail.Message("a@example.com", "Hi", "password_reset", {
+        "email": "a@example.com", "reset_link": "https://x/r?token=t", "expires_minutes": 60,
+    })
+    assert asyncio.run(sqs.send([message])) == []
+
+    records = [{"messageId": "m1", "eventSource": "aws:sqs", "body": sqs._client.bodies[0]}]
+    event = {"Records": records}
+    assert mail.is_sqs_event(event)
+    assert mail.handle_sqs_event(event) == {"batchItemFailures": []}
+    assert mail.outbox[0]["To"] == "a@example.com"
+    assert "https://x/r?token=t" in mail.outbox[0].get_body(("plain",)).get_content()
+
+
+def test_consumer_reports_failed_records(memory_mail):
+    mail.set_transport(mail.MemoryTransport(), FailingTransport())
+    body = mail.Message("a@example.com", "Hi", "password_reset", {}).to_json()
+    event = {"Records": [
+        {"messageId": "m1", "eventSource": "aws:sqs", "body": body},
+        {"messageId": "bad", "eventSource": "aws:sqs", "body": "not json"},
+    ]}
+    assert mail.handle_sqs_event(event) == {"batchItemFailures": [{"itemIdentifier": "m1"}]}
+
+
+def test_importing_the_app_does_not_load_mail():
+    import subprocess
+    import sys
+
+    code = "import sys, app.app; print('app.mail' in sys.modules, 'jinja2' in sys.modules)"
+    env = {**os.environ, "LAZY_ROUTERS": "1"}
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+    assert out.stdout.split() == ["False", "False"]
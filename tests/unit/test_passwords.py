@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app import config
+from app.auth import login, passwords, user_store
+
+
+@pytest.fixture(autouse=True)
+def pinned_params():
+    previous = passwords.current_params()
+    passwords.set_params(1024, 8, 1)
+    yield
+    passwords.set_params(*previous)
+
+
+def test_hash_round_trip():
+    stored = passwords.hash_password("correct horse")
+    assert passwords.verify_password("correct horse", stored)
+    assert not passwords.verify_password("wrong horse", stored)
+
+
+def test_weaker_hash_needs_rehash():
+    assert passwords.needs_rehash(passwords.hash_password("pw", (512, 8, 1)))
+    assert passwords.needs_rehash(passwords.hash_password("pw", (1024, 4, 1)))
+
+
+def test_current_or_stronger_hash_is_kept():
+    assert not passwords.needs_rehash(passwords.hash_password("pw"))
+    assert not passwords.needs_rehash(passwords.hash_password("pw", (2048, 8, 1)))
+
+
+def test_mixed_parameters_are_not_downgraded():
+    assert not passwords.needs_rehash(passwords.hash_password("pw", (512, 16, 1)))
+
+
+def test_unparseable_hash_is_left_alone():
+    assert not passwords.needs_rehash("bcrypt$whatever")
+
+
+def test_rehash_keeps_password_fingerprint(backend):
+    old_hash = passwords.hash_password("pw", (512, 8, 1))
+    user_id = "client#site#a@example.com"
+    backend._tables[config.USERS_TABLE].items[(user_id,)] = {
+        "user_id": user_id,
+        "password_hash": old_hash,
+        "password_fp": user_store.password_fingerprint(old_hash),
+    }
+
+    asyncio.run(login._upgrade_password_hash(user_id, "pw", old_hash))
+
+    item = backend._tables[config.USERS_TABLE].items[(user_id,)]
+    assert item["password_hash"] != old_hash
+    assert passwords.verify_password("pw", item["password_hash"])
+    assert item["password_fp"] == user_store.password_fingerprint(old_hash)
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app import aiodb, config
+from app.auth import pw_reset_confirm
+from app.auth.models import PasswordResetConfirm
+
+
+class FailingUpdates(aiodb.Backend):
+    """Fails ``UpdateItem`` on one table."""
+
+    def __init__(self, inner, table):
+        self.inner = inner
+        self.table = table
+
+    async def call(self, operation, params):
+        if operation == "UpdateItem" and params.get("TableName") == self.table:
+            raise aiodb.DynamoDBError("InternalServerError", "injected")
+        return await self.inner.call(operation, params)
+
+
+@pytest.fixture
+def opaque_token(backend):
+    backend._tables[config.PASSWORD_RESET_TABLE].items[("tok",)] = {
+        "reset_token": "tok",
+        "user_id": "u1",
+        "ttl": int(time.time()) + 600,
+        "used": False,
+    }
+    return "tok"
+
+
+def _confirm(token):
+    body = PasswordResetConfirm(token=token, new_password="new password 1")
+    return asyncio.run(pw_reset_confirm.password_reset_confirm(body))
+
+
+def test_token_is_released_when_the_user_update_fails(backend, opaque_token):
+    aiodb.set_backend(FailingUpdates(backend, config.USERS_TABLE))
+    with pytest.raises(aiodb.DynamoDBError):
+        _confirm(opaque_token)
+    assert backend._tables[config.PASSWORD_RESET_TABLE].items[("tok",)]["used"] is False
+
+    aiodb.set_backend(backend)
+    assert _confirm(opaque_token) == {"message": "Password reset successful"}
+    with pytest.raises(HTTPException):
+        _confirm(opaque_token)
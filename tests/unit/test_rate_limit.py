@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app import aiodb, config
+from app.auth import rate_limit
+
+TENANT = {"client_id": "ClientA", "site_id": "SiteA"}
+WINDOW = 100.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class Counter(aiodb.Backend):
+    """Counts the operations it forwards; optionally fails them."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = []
+        self.fail = False
+
+    async def call(self, operation, params):
+        self.calls.append(operation)
+        if self.fail:
+            raise aiodb.DynamoDBError("ServiceUnavailable", "injected")
+        return await self.inner.call(operation, params)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(time=fake.time))
+    monkeypatch.setattr(config, "LOGIN_RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(config, "LOGIN_RATE_WINDOW_SECONDS", WINDOW)
+    monkeypatch.setattr(config, "LOGIN_RATE_LIMIT_PER_EMAIL", 10)
+    monkeypatch.setattr(config, "LOGIN_RATE_LIMIT_PER_IP", 20)
+    rate_limit.reset()
+    yield fake
+    rate_limit.reset()
+
+
+@pytest.fixture
+def counter(backend, clock):
+    wrapped = Counter(backend)
+    aiodb.set_backend(wrapped)
+    return wrapped
+
+
+def _attempt(email="a@example.com", ip=None):
+    asyncio.run(rate_limit.check_login_attempt(TENANT, email, ip))
+
+
+def _attempts_until_rejected(limit=100, **kwargs):
+    for allowed in range(limit):
+        try:
+            _attempt(**kwargs)
+        except HTTPException as exc:
+            return allowed, exc
+    raise AssertionError("never rejected")
+
+
+def test_estimate_weights_the_previous_window_by_its_overlap():
+    assert rate_limit._estimate(10, 2, 1000.0, WINDOW) == 12
+    assert rate_limit._estimate(10, 2, 1025.0, WINDOW) == 9.5
+    assert rate_limit._estimate(10, 2, 1099.0, WINDOW) == pytest.approx(2.1)
+
+
+def test_attempts_over_the_limit_get_429_with_retry_after(counter, clock):
+    clock.now = 1030.0
+    allowed, exc = _attempts_until_rejected()
+    assert allowed == 10
+    assert exc.status_code == 429
+    assert exc.headers["Retry-After"] == "70"
+
+
+def test_previous_window_still_counts_while_it_overlaps(counter, clock):
+    for _ in range(10):
+        _attempt()
+    clock.now = 1150.0  # half of the previous window still overlaps
+    allowed, _ = _attempts_until_rejected()
+    assert allowed == 5
+    clock.now = 1200.0  # window 11 now overlaps fully; it stored 5 attempts
+    allowed, _ = _attempts_until_rejected()
+    assert allowed == 5
+
+
+def test_known_offender_is_rejected_without_a_dynamodb_call(counter):
+    _attempts_until_rejected()
+    calls = len(counter.calls)
+    with pytest.raises(HTTPException):
+        _attempt()
+    assert len(counter.calls) == calls
+
+
+def test_email_and_ip_are_limited_separately(counter):
+    for i in range(20):
+        _attempt(email=f"user{i}@example.com", ip="203.0.113.9")
+    with pytest.raises(HTTPException):
+        _attempt(email="fresh@example.com", ip="203.0.113.9")
+    _attempt(email="fresh@example.com", ip="198.51.100.1")
+
+
+def test_fails_open_on_local_counts_when_dynamodb_is_down(counter):
+    counter.fail = True
+    allowed, exc = _attempts_until_rejected()
+    assert allowed == 10
+    assert exc.status_code == 429
+
+
+def test_disabled_limiter_counts_nothing(counter, monkeypatch):
+    monkeypatch.setattr(config, "LOGIN_RATE_LIMIT_ENABLED", False)
+    for _ in range(20):
+        _attempt()
+    assert counter.calls == []
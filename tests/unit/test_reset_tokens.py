@@ -0,0 +1,32 @@
+import time
+
+from app.auth import reset_tokens
+
+
+def test_round_trip():
+    token = reset_tokens.issue("client#site#a@example.com", "fp-1")
+    claims = reset_tokens.verify(token)
+    assert reset_tokens.is_signed(token)
+    assert claims["user_id"] == "client#site#a@example.com"
+    assert claims["password_fp"] == "fp-1"
+    assert claims["expires_at"] > time.time()
+
+
+def test_tampered_payload_is_rejected():
+    token = reset_tokens.issue("client#site#a@example.com", "fp-1")
+    other = reset_tokens.issue("client#site#b@example.com", "fp-1")
+    forged = other.split(".")[0] + "." + token.split(".")[1]
+    assert reset_tokens.verify(forged) is None
+
+
+def test_expired_token_is_rejected():
+    assert reset_tokens.verify(reset_tokens.issue("u", "fp", ttl=-1)) is None
+
+
+def test_garbage_is_rejected():
+    for token in ("", ".", "abc.def", "!!!.???", "e30.e30"):
+        assert reset_tokens.verify(token) is None
+
+
+def test_opaque_tokens_are_not_signed():
+    assert not reset_tokens.is_signed("Zm9vYmFyX2Jhei1xdXV4")
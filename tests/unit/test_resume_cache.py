@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+
+from app import aiodb, config
+from app.resume import cache
+from app.resume.routes import router
+
+RESUME = {
+    "pk": "USER#alice-personaldata",
+    "sk": "RESUME",
+    "entityType": "RESUME",
+    "id": "alice",
+    "name": "Alice",
+    "location": "Remote",
+    "phone": "5550100",
+    "email": "alice@example.com",
+    "title": "Engineer",
+    "professionalSummary": "Builds things.",
+    "sites": [],
+    "skills": [],
+    "experience": [],
+    "education": [],
+    "infoSites": [],
+    "certifications": [],
+}
+
+
+class Counter(aiodb.Backend):
+    """Counts the operations it forwards."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = []
+
+    async def call(self, operation, params):
+        self.calls.append(operation)
+        return await self.inner.call(operation, params)
+
+
+@pytest.fixture
+def reads(backend):
+    cache.clear()
+    counter = Counter(backend)
+    aiodb.set_backend(counter)
+    yield counter, backend._tables[config.RESUME_TABLE].items
+    cache.clear()
+
+
+@pytest.fixture
+def client(reads):
+    app = FastAPI()
+    app.include_router(router, prefix="/resume")
+    return TestClient(app)
+
+
+def test_resume_has_an_etag_and_is_read_once(client, reads):
+    counter, items = reads
+    items[(RESUME["pk"], "RESUME")] = dict(RESUME)
+
+    first = client.get("/resume/resume/alice")
+    second = client.get("/resume/resume/alice")
+    assert first.status_code == second.status_code == 200
+    assert first.json()["name"] == "Alice"
+    assert first.headers["etag"] == second.headers["etag"]
+    assert counter.calls == ["GetItem"]
+
+
+def test_matching_if_none_match_gets_304(client, reads):
+    reads[1][(RESUME["pk"], "RESUME")] = dict(RESUME)
+    etag = client.get("/resume/resume/alice").headers["etag"]
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/resume/resume/alice", headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+    assert client.get("/resume/resume/alice", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_missing_resume_is_a_cached_404(client, reads):
+    counter, _ = reads
+    assert client.get("/resume/resume/nobody").status_code == 404
+    assert client.get("/resume/resume/nobody").status_code == 404
+    assert counter.calls == ["GetItem"]
+
+
+def test_invalid_resume_is_a_cached_500(client, reads):
+    counter, items = reads
+    items[(RESUME["pk"], "RESUME")] = {"pk": RESUME["pk"], "sk": "RESUME", "name": "Alice"}
+    assert client.get("/resume/resume/alice").status_code == 500
+    assert client.get("/resume/resume/alice").status_code == 500
+    assert counter.calls == ["GetItem"]
+
+
+def test_batch_reports_and_caches_invalid_and_missing(client, reads):
+    counter, items = reads
+    items[(RESUME["pk"], "RESUME")] = {"pk": RESUME["pk"], "sk": "RESUME"}
+    first = client.post("/resume/batch", json={"user_ids": ["alice", "nobody"]}).text
+    second = client.post("/resume/batch", json={"user_ids": ["alice", "nobody"]}).text
+    assert sorted(first.splitlines()) == sorted(second.splitlines()) == [
+        '{"user_id":"alice","error":"invalid"}',
+        '{"user_id":"nobody","error":"not_found"}',
+    ]
+    assert counter.calls == ["BatchGetItem"]
+
+
+def test_stale_entry_is_served_while_it_is_revalidated(reads):
+    counter, items = reads
+    items[(RESUME["pk"], "RESUME")] = dict(RESUME)
+    first = asyncio.run(cache.get("alice", BackgroundTasks()))
+
+    items[(RESUME["pk"], "RESUME")] = dict(RESUME, name="Alice B")
+    first.fetched_at -= config.RESUME_CACHE_TTL_SECONDS + 1
+    tasks = BackgroundTasks()
+    stale = asyncio.run(cache.get("alice", tasks))
+    assert stale is first
+    assert len(tasks.tasks) == 1
+    # A second stale hit does not schedule another read.
+    again = BackgroundTasks()
+    asyncio.run(cache.get("alice", again))
+    assert again.tasks == []
+
+    asyncio.run(tasks())
+    fresh = asyncio.run(cache.get("alice", BackgroundTasks()))
+    assert b"Alice B" in fresh.body and fresh.etag != first.etag
+    assert counter.calls == ["GetItem", "GetItem"]
+
+
+def test_entry_past_the_stale_window_is_read_inline(reads):
+    counter, items = reads
+    items[(RESUME["pk"], "RESUME")] = dict(RESUME)
+    first = asyncio.run(cache.get("alice", BackgroundTasks()))
+    first.fetched_at -= config.RESUME_CACHE_TTL_SECONDS + config.RESUME_CACHE_STALE_SECONDS + 1
+    tasks = BackgroundTasks()
+    assert asyncio.run(cache.get("alice", tasks)) is not first
+    assert tasks.tasks == []
+    assert counter.calls == ["GetItem", "GetItem"]
+
+
+def test_least_recently_used_entry_is_evicted(reads, monkeypatch):
+    monkeypatch.setattr(config, "RESUME_CACHE_MAX_ENTRIES", 2)
+    for user_id in ("a", "b"):
+        asyncio.run(cache.get(user_id, BackgroundTasks()))
+    asyncio.run(cache.get("a", BackgroundTasks()))
+    asyncio.run(cache.get("c", BackgroundTasks()))
+    assert cache.peek("a") is not None and cache.peek("c") is not None
+    assert cache.peek("b") is None
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import aiodb, config
+from app.auth import revocation_filter
+
+
+@pytest.fixture(autouse=True)
+def fresh_filter():
+    revocation_filter.reset()
+    yield
+    revocation_filter.reset()
+
+
+async def _blacklist(jti: str, when: datetime) -> None:
+    await aiodb.blacklist_table().put_item(Item={
+        "token_jti": jti,
+        "ttl": int(time.time()) + 3600,
+        "blacklisted_at": when.isoformat(),
+        "revoked_hour": revocation_filter.hour_bucket(when),
+    })
+
+
+async def _settle() -> None:
+    task = revocation_filter._task
+    if task is not None:
+        await asyncio.wait([task])
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = revocation_filter.BloomFilter(1000, 0.01)
+    values = [f"jti-{i}" for i in range(1000)]
+    for value in values:
+        bloom.add(value)
+    assert all(value in bloom for value in values)
+    assert bloom.count <= 1000
+
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = revocation_filter.BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"in-{i}")
+    false_positives = sum(f"out-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_cold_filter_falls_back_then_answers_locally(backend):
+    async def scenario():
+        await _blacklist("revoked", datetime.now(timezone.utc))
+        assert await revocation_filter.might_be_revoked("other") is True
+        await _settle()
+        assert await revocation_filter.might_be_revoked("other") is False
+        assert await revocation_filter.might_be_revoked("revoked") is True
+
+    asyncio.run(scenario())
+
+
+def test_sync_queries_only_new_entries(backend, monkeypatch):
+    async def scenario():
+        await revocation_filter.might_be_revoked("warm-up")
+        await _settle()
+        await _blacklist("late", datetime.now(timezone.utc))
+        monkeypatch.setattr(config, "REVOCATION_FILTER_REFRESH_SECONDS", 0)
+        scans = backend.calls.get("Scan", 0)
+        await revocation_filter.might_be_revoked("late")
+        await _settle()
+        assert backend.calls.get("Scan", 0) == scans
+        assert await revocation_filter.might_be_revoked("late") is True
+
+    asyncio.run(scenario())
+
+
+def test_query_spans_hour_buckets(backend):
+    async def scenario():
+        earlier = datetime.now(timezone.utc) - timedelta(hours=1, minutes=5)
+        await _blacklist("previous-hour", earlier)
+        jtis = await revocation_filter._query_jtis(earlier - timedelta(minutes=1))
+        assert jtis == ["previous-hour"]
+
+    asyncio.run(scenario())
+
+
+def test_stale_filter_is_not_trusted(backend, monkeypatch):
+    async def scenario():
+        await revocation_filter.might_be_revoked("warm-up")
+        await _settle()
+        monkeypatch.setattr(config, "REVOCATION_FILTER_MAX_STALENESS_SECONDS", 0)
+        assert await revocation_filter.might_be_revoked("anything") is True
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_refresh_does_not_wedge_the_filter(backend):
+    async def scenario():
+        await revocation_filter.might_be_revoked("x")
+        revocation_filter._task.cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert revocation_filter._refreshing is False
+
+    asyncio.run(scenario())
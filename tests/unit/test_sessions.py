@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app import aiodb, config, keyring
+from app.auth import cookie_session, sessions, token_cache
+from app.auth.dependencies import verify_token
+
+USER = {
+    "user_id": "ClientA#SiteA#a@example.com",
+    "email": "a@example.com",
+    "client_id": "ClientA",
+    "site_id": "SiteA",
+}
+TENANT = {"client_id": "ClientA", "site_id": "SiteA"}
+
+
+@pytest.fixture(autouse=True)
+def user(backend):
+    sessions.reset()
+    backend._tables[config.USERS_TABLE].items[(USER["user_id"],)] = dict(USER)
+    yield
+    sessions.reset()
+
+
+def _stored():
+    result = asyncio.run(aiodb.users_table().get_item(Key={"user_id": USER["user_id"]}))
+    return result["Item"]
+
+
+def _rotate(token):
+    return asyncio.run(sessions.rotate(token))
+
+
+def test_rotation_bumps_the_generation():
+    first = asyncio.run(sessions.start(dict(USER), TENANT))
+    second = _rotate(first["refresh_token"])
+    assert second["refresh_token"] != first["refresh_token"]
+    assert list(_stored()["refresh_families"].values()) == [1]
+    _rotate(second["refresh_token"])
+
+
+def test_reuse_revokes_the_family():
+    first = asyncio.run(sessions.start(dict(USER), TENANT))
+    second = _rotate(first["refresh_token"])
+
+    with pytest.raises(sessions.RefreshError):
+        _rotate(first["refresh_token"])
+    assert _stored()["refresh_families"] == {}
+    with pytest.raises(sessions.RefreshError):
+        _rotate(second["refresh_token"])
+
+
+def test_other_families_survive_a_reuse():
+    stolen = asyncio.run(sessions.start(dict(USER), TENANT))
+    other = asyncio.run(sessions.start(_stored(), TENANT))
+    _rotate(stolen["refresh_token"])
+    with pytest.raises(sessions.RefreshError):
+        _rotate(stolen["refresh_token"])
+    _rotate(other["refresh_token"])
+
+
+def test_revoke_all_rejects_every_session():
+    first = asyncio.run(sessions.start(dict(USER), TENANT))
+    second = asyncio.run(sessions.start(_stored(), TENANT))
+    assert asyncio.run(sessions.revoke_all(USER["user_id"])) == 1
+
+    for pair in (first, second):
+        with pytest.raises(sessions.RefreshError):
+            _rotate(pair["refresh_token"])
+    assert sessions.is_stale({"user_id": USER["user_id"], "ep": 0})
+
+
+def test_revoke_all_is_enforced_without_the_cached_epoch():
+    pair = asyncio.run(sessions.start(dict(USER), TENANT))
+    asyncio.run(sessions.revoke_all(USER["user_id"]))
+    sessions.reset()
+    with pytest.raises(sessions.RefreshError):
+        _rotate(pair["refresh_token"])
+
+
+def test_access_token_cannot_refresh():
+    pair = asyncio.run(sessions.start(dict(USER), TENANT))
+    with pytest.raises(sessions.RefreshError):
+        _rotate(pair["token"])
+
+
+def test_oldest_family_is_pruned(monkeypatch):
+    monkeypatch.setattr(config, "REFRESH_FAMILIES_MAX", 2)
+    first = asyncio.run(sessions.start(dict(USER), TENANT))
+    # Family IDs sort by creation second; force a later one.
+    families = iter(["ffffffff00000001", "ffffffff00000002"])
+    monkeypatch.setattr(sessions, "_new_family", lambda: next(families))
+    asyncio.run(sessions.start(_stored(), TENANT))
+    asyncio.run(sessions.start(_stored(), TENANT))
+    assert sorted(_stored()["refresh_families"]) == ["ffffffff00000001", "ffffffff00000002"]
+    with pytest.raises(sessions.RefreshError):
+        _rotate(first["refresh_token"])
+
+
+def _verify(token):
+    return asyncio.run(verify_token(token))
+
+
+def test_only_access_tokens_pass_as_access_tokens():
+    token_cache.clear()
+    pair = asyncio.run(sessions.start(dict(USER), TENANT))
+    assert _verify(pair["token"])["typ"] == sessions.ACCESS_TYPE
+    for other in (pair["refresh_token"], cookie_session.issue(USER)):
+        with pytest.raises(HTTPException):
+            _verify(other)
+    # Issued before the claim existed.
+    untyped = keyring.encode({"jti": "legacy", "user_id": USER["user_id"], "exp": 4102444800})
+    assert _verify(untyped)["user_id"] == USER["user_id"]
@@ -0,0 +1,49 @@
+import shutil
+
+import pytest
+
+from app import config, templating
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    source_dir = tmp_path / "templates"
+    shutil.copytree(templating.TEMPLATES_DIR, source_dir)
+    compiled_dir = tmp_path / "compiled"
+    monkeypatch.setattr(templating, "TEMPLATES_DIR", source_dir)
+    monkeypatch.setattr(config, "ADMIN_TEMPLATES_COMPILED_DIR", str(compiled_dir))
+    templating.build(str(compiled_dir))
+    return source_dir, compiled_dir
+
+
+def _render():
+    return templating.environment().get_template("admin/login.html").render(title="T")
+
+
+def test_current_bundle_is_used(sources):
+    _, compiled_dir = sources
+    env = templating.environment()
+    assert any(
+        type(loader).__name__ == "ModuleLoader" for loader in env.loader.loaders
+    )
+    assert (compiled_dir / templating.MANIFEST).exists()
+
+
+def test_edited_template_is_not_shadowed_by_stale_bundle(sources):
+    source_dir, _ = sources
+    before = _render()
+    page = source_dir / "admin" / "login.html"
+    page.write_text(page.read_text().replace("Sign in</button>", "Log in</button>"))
+
+    env = templating.environment()
+    assert [type(loader).__name__ for loader in env.loader.loaders] == ["FileSystemLoader"]
+    after = _render()
+    assert after != before
+    assert "Log in</button>" in after
+
+
+def test_bundle_without_manifest_is_ignored(sources):
+    _, compiled_dir = sources
+    (compiled_dir / templating.MANIFEST).unlink()
+    env = templating.environment()
+    assert [type(loader).__name__ for loader in env.loader.loaders] == ["FileSystemLoader"]
@@ -0,0 +1,147 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app import aiodb, config, tenants
+
+SITE_A = {"client_id": "ClientCustomerC", "site_id": "SiteA"}
+SITE_B = {"client_id": "ClientCustomerA", "site_id": "SiteB"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class Counter(aiodb.Backend):
+    """Counts the operations it forwards; optionally fails them."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = []
+        self.fail = False
+
+    async def call(self, operation, params):
+        self.calls.append(operation)
+        if self.fail:
+            raise aiodb.DynamoDBError("InternalServerError", "injected")
+        return await self.inner.call(operation, params)
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    tenants.reset()
+    fake = Clock()
+    monkeypatch.setattr(tenants, "time", SimpleNamespace(monotonic=fake.monotonic))
+    yield fake
+    tenants.reset()
+
+
+@pytest.fixture
+def registry_file(tmp_path, monkeypatch):
+    path = tmp_path / "tenants.json"
+
+    def write(records):
+        path.write_text(json.dumps(records))
+
+    write([
+        dict(SITE_A, key_hash=tenants.hash_key("key-a")),
+        dict(SITE_B, key_hash=tenants.hash_key("key-b"), disabled=True),
+    ])
+    monkeypatch.setattr(config, "TENANT_REGISTRY_SOURCE", "file")
+    monkeypatch.setattr(config, "TENANT_REGISTRY_FILE", str(path))
+    return write
+
+
+@pytest.fixture
+def api_keys(backend, monkeypatch):
+    monkeypatch.setattr(config, "TENANT_REGISTRY_SOURCE", "dynamodb")
+    counter = Counter(backend)
+    aiodb.set_backend(counter)
+    return counter, backend._tables[config.API_KEYS_TABLE].items
+
+
+def _lookup(api_key):
+    return asyncio.run(tenants.lookup(api_key))
+
+
+def test_file_records_are_found_by_key_hash(registry_file):
+    assert _lookup("key-a") == SITE_A
+    assert _lookup("key-unknown") is None
+    assert tenants.hash_key("key-a") in tenants._index
+    assert "key-a" not in tenants._index
+
+
+def test_disabled_records_are_unknown(registry_file):
+    assert _lookup("key-b") is None
+
+
+def test_refresh_picks_up_new_records(registry_file, clock):
+    assert _lookup("key-c") is None
+    registry_file([dict(SITE_B, key_hash=tenants.hash_key("key-c"))])
+    assert _lookup("key-c") is None
+    clock.now += config.TENANT_REGISTRY_REFRESH_SECONDS
+    assert _lookup("key-c") == SITE_B
+    assert _lookup("key-a") is None
+
+
+def test_failed_refresh_keeps_the_loaded_index(registry_file, clock, monkeypatch):
+    assert _lookup("key-a") == SITE_A
+    monkeypatch.setattr(config, "TENANT_REGISTRY_FILE", "/nonexistent/tenants.json")
+    clock.now += config.TENANT_REGISTRY_REFRESH_SECONDS
+    assert _lookup("key-a") == SITE_A
+
+
+def test_first_load_failure_raises(monkeypatch):
+    monkeypatch.setattr(config, "TENANT_REGISTRY_SOURCE", "file")
+    monkeypatch.setattr(config, "TENANT_REGISTRY_FILE", "/nonexistent/tenants.json")
+    with pytest.raises(OSError):
+        _lookup("key-a")
+
+
+def test_key_added_after_the_scan_is_fetched_once(api_keys):
+    counter, items = api_keys
+    asyncio.run(tenants._ensure_fresh())
+    items[(tenants.hash_key("key-a"),)] = dict(SITE_A, key_hash=tenants.hash_key("key-a"))
+    assert _lookup("key-a") == SITE_A
+    assert _lookup("key-a") == SITE_A
+    assert counter.calls == ["Scan", "GetItem"]
+
+
+def test_unknown_key_is_negatively_cached(api_keys):
+    counter, items = api_keys
+    assert _lookup("key-a") is None
+    items[(tenants.hash_key("key-a"),)] = dict(SITE_A, key_hash=tenants.hash_key("key-a"))
+    assert _lookup("key-a") is None
+    assert counter.calls == ["Scan", "GetItem"]
+
+
+def test_unknown_key_is_fetched_again_after_the_negative_ttl(api_keys, clock):
+    counter, items = api_keys
+    assert _lookup("key-a") is None
+    items[(tenants.hash_key("key-a"),)] = dict(SITE_A, key_hash=tenants.hash_key("key-a"))
+    clock.now += config.TENANT_NEGATIVE_CACHE_SECONDS
+    assert _lookup("key-a") == SITE_A
+    assert _lookup("key-a") == SITE_A
+    assert counter.calls == ["Scan", "GetItem", "GetItem"]
+
+
+def test_disabled_table_record_is_unknown(api_keys):
+    _, items = api_keys
+    items[(tenants.hash_key("key-a"),)] = dict(SITE_A, key_hash=tenants.hash_key("key-a"), disabled=True)
+    assert _lookup("key-a") is None
+
+
+def test_failed_get_item_is_not_cached_as_unknown(api_keys):
+    counter, items = api_keys
+    asyncio.run(tenants._ensure_fresh())
+    counter.fail = True
+    assert _lookup("key-a") is None
+    counter.fail = False
+    items[(tenants.hash_key("key-a"),)] = dict(SITE_A, key_hash=tenants.hash_key("key-a"))
+    assert _lookup("key-a") == SITE_A
@@ -0,0 +1,86 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import config
+from app.auth import token_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def _payload(jti, ttl=3600):
+    return {"jti": jti, "user_id": "u1", "exp": int(time.time()) + ttl}
+
+
+def test_hit_returns_the_payload_and_counts():
+    digest = token_cache.token_digest("token-1")
+    assert token_cache.get(digest) is None
+    token_cache.put(digest, _payload("j1"))
+    assert token_cache.get(digest)["jti"] == "j1"
+    stats = token_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_callers_cannot_change_the_cached_payload():
+    digest = token_cache.token_digest("token-1")
+    stored = _payload("j1")
+    token_cache.put(digest, stored)
+    stored["user_id"] = "changed-after-put"
+    first = token_cache.get(digest)
+    first["user_id"] = "changed-by-caller"
+    assert token_cache.get(digest)["user_id"] == "u1"
+
+
+def test_entry_lives_until_the_token_expires(monkeypatch):
+    digest = token_cache.token_digest("token-1")
+    payload = _payload("j1", ttl=60)
+    token_cache.put(digest, payload)
+    monkeypatch.setattr(token_cache, "time", SimpleNamespace(time=lambda: payload["exp"] + 0.5))
+    assert token_cache.get(digest) is None
+    assert token_cache.stats()["size"] == 0
+
+
+def test_expired_tokens_are_not_stored():
+    digest = token_cache.token_digest("token-1")
+    token_cache.put(digest, _payload("j1", ttl=-1))
+    assert token_cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    monkeypatch.setattr(config, "TOKEN_CACHE_MAX_ENTRIES", 2)
+    a, b, c = (token_cache.token_digest(t) for t in ("a", "b", "c"))
+    token_cache.put(a, _payload("a"))
+    token_cache.put(b, _payload("b"))
+    token_cache.get(a)
+    token_cache.put(c, _payload("c"))
+    assert token_cache.get(b) is None
+    assert token_cache.get(a) is not None and token_cache.get(c) is not None
+    assert token_cache.stats()["evictions"] == 1
+
+
+def test_negative_verdict_expires_after_the_revocation_ttl(monkeypatch):
+    digest = token_cache.token_digest("token-1")
+    token_cache.put(digest, _payload("j1"))
+    assert token_cache.revocation_verdict(digest) is None
+    token_cache.record_revocation_verdict(digest, False)
+    assert token_cache.revocation_verdict(digest) is False
+    later = time.time() + config.TOKEN_CACHE_REVOCATION_TTL_SECONDS + 1
+    monkeypatch.setattr(token_cache, "time", SimpleNamespace(time=lambda: later))
+    assert token_cache.revocation_verdict(digest) is None
+
+
+def test_revoke_jti_marks_every_cached_copy():
+    first, second = token_cache.token_digest("t1"), token_cache.token_digest("t2")
+    token_cache.put(first, _payload("same"))
+    token_cache.put(second, _payload("same"))
+    token_cache.put(token_cache.token_digest("t3"), _payload("other"))
+    token_cache.revoke_jti("same")
+    assert token_cache.revocation_verdict(first) is True
+    assert token_cache.revocation_verdict(second) is True
+    assert token_cache.revocation_verdict(token_cache.token_digest("t3")) is None
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from app import aiodb, config
+from app.auth import cookie_session, revocation_filter, sessions, token_cache, token_refresh
+
+USER = {
+    "user_id": "ClientA#SiteA#a@example.com",
+    "email": "a@example.com",
+    "client_id": "ClientA",
+    "site_id": "SiteA",
+}
+TENANT = {"client_id": "ClientA", "site_id": "SiteA"}
+
+
+@pytest.fixture(autouse=True)
+def user(backend, monkeypatch):
+    # Short enough that a fresh token is already inside the refresh window.
+    monkeypatch.setattr(config, "ACCESS_TOKEN_MINUTES", 60)
+    monkeypatch.setattr(token_refresh, "ACCESS_TOKEN_MINUTES", 60)
+    sessions.reset()
+    token_cache.clear()
+    revocation_filter.reset()
+    backend._tables[config.USERS_TABLE].items[(USER["user_id"],)] = dict(USER)
+    yield
+    sessions.reset()
+    token_cache.clear()
+    revocation_filter.reset()
+
+
+def _login():
+    return asyncio.run(sessions.start(dict(USER), TENANT))["token"]
+
+
+def _refresh(token):
+    return asyncio.run(token_refresh.refresh_token(None, f"Bearer {token}"))["token"]
+
+
+def _claims(token):
+    return jwt.decode(token, options={"verify_signature": False})
+
+
+def test_refresh_keeps_epoch_and_family():
+    token = _login()
+    renewed = _claims(_refresh(token))
+    assert renewed["ep"] == _claims(token)["ep"] == 0
+    assert renewed["fam"] == _claims(token)["fam"]
+    remaining = renewed["exp"] - datetime.now(timezone.utc).timestamp()
+    assert 59 * 60 < remaining <= 60 * 60
+
+
+def test_refresh_after_logout_all_is_rejected_without_the_cached_epoch():
+    token = _login()
+    asyncio.run(sessions.revoke_all(USER["user_id"]))
+    sessions.reset()
+    with pytest.raises(HTTPException) as exc:
+        _refresh(token)
+    assert exc.value.status_code == 401
+    assert sessions.known_epoch(USER["user_id"]) == 1
+
+
+def test_refreshed_token_is_still_revocable():
+    renewed = _refresh(_login())
+    asyncio.run(sessions.revoke_all(USER["user_id"]))
+    assert sessions.is_stale(_claims(renewed))
+
+
+def test_refresh_of_a_logged_out_session_is_rejected():
+    token = _login()
+    asyncio.run(sessions.revoke_family(USER["user_id"], _claims(token)["fam"]))
+    with pytest.raises(HTTPException) as exc:
+        _refresh(token)
+    assert exc.value.status_code == 401
+
+
+def test_refresh_of_a_blacklisted_token_is_rejected():
+    token = _login()
+    asyncio.run(aiodb.blacklist_table().put_item(Item={
+        "token_jti": _claims(token)["jti"],
+        "ttl": int(time.time()) + 3600,
+    }))
+    with pytest.raises(HTTPException) as exc:
+        _refresh(token)
+    assert exc.value.status_code == 401
+
+
+def test_refresh_issues_access_tokens_only_from_access_tokens():
+    assert _claims(_refresh(_login()))["typ"] == sessions.ACCESS_TYPE
+    with pytest.raises(HTTPException) as exc:
+        _refresh(cookie_session.issue(USER))
+    assert exc.value.status_code == 401
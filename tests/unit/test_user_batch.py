@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import config
+from app.auth import revocation_filter, sessions, token_cache
+from app.users.routes import router
+
+TENANT = {"client_id": "ClientA", "site_id": "SiteA"}
+CALLER = "ClientA#SiteA#caller@example.com"
+OTHER = "ClientA#SiteA#other@example.com"
+
+
+@pytest.fixture
+def client(backend):
+    token_cache.clear()
+    revocation_filter.reset()
+    users = backend._tables[config.USERS_TABLE].items
+    for user_id in (CALLER, OTHER):
+        users[(user_id,)] = {"user_id": user_id, "email": user_id.rsplit("#", 1)[1], **TENANT}
+    app = FastAPI()
+    app.include_router(router, prefix="/user")
+    yield TestClient(app), users
+    token_cache.clear()
+    revocation_filter.reset()
+
+
+def _token(users):
+    return asyncio.run(sessions.start(dict(users[(CALLER,)]), TENANT))["token"]
+
+
+def _batch(client, token):
+    return client.post(
+        "/user/batch", json={"user_ids": [OTHER]}, headers={"Authorization": f"Bearer {token}"}
+    )
+
+
+def test_batch_is_forbidden_for_ordinary_users(client):
+    http, users = client
+    response = _batch(http, _token(users))
+    assert response.status_code == 403
+    assert "other@example.com" not in response.text
+
+
+def test_batch_is_allowed_for_tenant_admins(client):
+    http, users = client
+    users[(CALLER,)]["role"] = "admin"
+    response = _batch(http, _token(users))
+    assert response.status_code == 200
+    assert '"email":"other@example.com"' in response.text
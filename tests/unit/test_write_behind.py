@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app import aiodb, config, write_behind
+
+
+class FlakyBackend(aiodb.Backend):
+    """Fails the first ``failures`` calls of ``operation``."""
+
+    def __init__(self, inner, operation, failures):
+        self.inner = inner
+        self.operation = operation
+        self.failures = failures
+
+    async def call(self, operation, params):
+        if operation == self.operation and self.failures > 0:
+            self.failures -= 1
+            raise aiodb.DynamoDBError("InternalServerError", "injected")
+        return await self.inner.call(operation, params)
+
+
+@pytest.fixture(autouse=True)
+def empty_queue():
+    write_behind._pending.clear()
+    yield
+    write_behind._pending.clear()
+
+
+def _users(backend):
+    return backend._tables[config.USERS_TABLE].items
+
+
+def test_updates_to_one_key_are_coalesced(backend):
+    _users(backend)[("u1",)] = {"user_id": "u1"}
+
+    async def run():
+        for value in ("a", "b", "c"):
+            await write_behind.update(
+                config.USERS_TABLE,
+                {"user_id": "u1"},
+                UpdateExpression="SET last_login = :v",
+                ExpressionAttributeValues={":v": value},
+            )
+        assert write_behind.pending() == 1
+        await write_behind.stop()
+
+    asyncio.run(run())
+    assert _users(backend)[("u1",)]["last_login"] == "c"
+    assert backend.calls["UpdateItem"] == 1
+
+
+def test_stop_retries_failed_writes(backend):
+    aiodb.set_backend(FlakyBackend(backend, "BatchWriteItem", failures=2))
+    asyncio.run(write_behind.put(config.USERS_TABLE, {"user_id": "u2"}, {"user_id": "u2"}))
+    asyncio.run(write_behind.stop())
+    assert write_behind.pending() == 0
+    assert ("u2",) in _users(backend)
+
+
+def test_stop_gives_up_after_max_attempts(backend):
+    flaky = FlakyBackend(backend, "UpdateItem", failures=100)
+    aiodb.set_backend(flaky)
+    asyncio.run(write_behind.update(
+        config.USERS_TABLE, {"user_id": "u3"}, UpdateExpression="SET a = :a",
+        ExpressionAttributeValues={":a": 1},
+    ))
+    asyncio.run(write_behind.stop())
+    assert write_behind.pending() == 0
+    assert flaky.failures == 100 - write_behind._MAX_ATTEMPTS